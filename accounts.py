@@ -0,0 +1,116 @@
+# accounts.py - Exclusão de contas em massa, sem carregar linhas no ORM
+#
+# Apagar um User pelo ORM (session.delete + cascade) carrega todos os
+# pedidos, avaliações e o perfil antes de apagá-los, um objeto por linha.
+# Aqui tudo é feito com DELETEs por conjunto (WHERE ... IN (subconsulta)),
+# dos filhos para os pais, na transação da sessão:
+#
+#   avaliações -> pedidos -> índice de texto -> dados do perfil (portfólio,
+#   serviços, tags, disponibilidade) -> perfis profissionais -> usuários
+#
+# e então os destaques (rankings.py) das categorias envolvidas são refeitos.
+#
+# A ordem explícita funciona em qualquer banco; as FKs com ON DELETE CASCADE
+# (models.py, migração 0005) garantem o mesmo para exclusões feitas direto no
+# banco - no SQLite, pelas conexões da aplicação (PRAGMA foreign_keys em
+# database.py) e só em bancos criados já com o ON DELETE (o SQLite não altera
+# FKs de tabelas existentes). Como DELETE em massa não dispara os eventos do ORM, os agregados de
+# avaliação dos profissionais que perdem avaliações são recalculados e as
+# versões de cache dos models envolvidos são incrementadas aqui. Não faz commit.
+from sqlalchemy import delete, or_, select
+
+from cache import bump_session_versions, versions_for
+from database import db
+from models import PROFILE_CHILDREN, Professional, Review, ServiceRequest, User, reconcile_ratings
+import rankings
+import search_index
+
+# ids por DELETE: abaixo do limite de parâmetros do SQLite (999 nas versões antigas)
+CHUNK = 500
+
+
+def chunks(ids, size=CHUNK):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _delete_profile_children(connection, prof_ids):
+    for model in PROFILE_CHILDREN:
+        connection.execute(delete(model.__table__).where(model.__table__.c.professional_id.in_(prof_ids)))
+
+
+def _delete_chunk(session, user_ids, prof_ids, counts):
+    u, p, r, s = (User.__table__.c, Professional.__table__.c,
+                  Review.__table__.c, ServiceRequest.__table__.c)
+    connection = session.connection()
+
+    # profissionais (que continuam) avaliados pelos usuários apagados
+    affected = set(connection.execute(
+        select(r.professional_id).where(r.client_id.in_(user_ids)).distinct()
+    ).scalars()) - set(prof_ids)
+
+    requests = or_(s.client_id.in_(user_ids), s.professional_id.in_(prof_ids))
+    counts['reviews'] += connection.execute(delete(Review.__table__).where(or_(
+        r.client_id.in_(user_ids),
+        r.professional_id.in_(prof_ids),
+        r.request_id.in_(select(s.id).where(requests)),
+    ))).rowcount
+    counts['requests'] += connection.execute(delete(ServiceRequest.__table__).where(requests)).rowcount
+    search_index.remove_professionals(connection, prof_ids)
+    _delete_profile_children(connection, prof_ids)
+    counts['professionals'] += connection.execute(
+        delete(Professional.__table__).where(p.id.in_(prof_ids))
+    ).rowcount
+    counts['users'] += connection.execute(delete(User.__table__).where(u.id.in_(user_ids))).rowcount
+    return affected
+
+
+def delete_accounts(user_ids, session=None):
+    """Apaga os usuários e tudo que depende deles. Retorna as contagens por tabela."""
+    session = session or db.session
+    counts = dict.fromkeys(('users', 'professionals', 'requests', 'reviews'), 0)
+    affected, categories = set(), set()
+    for chunk in chunks(set(user_ids)):
+        profiles = session.execute(
+            select(Professional.id, Professional.category_id).where(Professional.user_id.in_(chunk))
+        ).all()
+        categories.update(category_id for _, category_id in profiles)
+        affected |= _delete_chunk(session, chunk, [prof_id for prof_id, _ in profiles], counts)
+
+    if counts['users']:
+        # os de chunks anteriores já foram apagados: o UPDATE não os encontra
+        reconcile_ratings(affected)
+        connection = session.connection()
+        rankings.refresh_categories(connection, categories | rankings.categories_of(connection, affected))
+        bump_session_versions(session, versions_for(User, Professional, ServiceRequest, Review, *PROFILE_CHILDREN))
+        # objetos dessas contas que a sessão ainda tenha não existem mais
+        session.expire_all()
+    return counts
+
+
+def delete_professional_profile(professional_id, session=None):
+    """Apaga só o perfil profissional (pedidos e avaliações dele), mantendo o usuário."""
+    session = session or db.session
+    p, r, s = Professional.__table__.c, Review.__table__.c, ServiceRequest.__table__.c
+    connection = session.connection()
+    categories = rankings.categories_of(connection, [professional_id])
+    counts = {
+        'reviews': connection.execute(delete(Review.__table__).where(or_(
+            r.professional_id == professional_id,
+            r.request_id.in_(select(s.id).where(s.professional_id == professional_id)),
+        ))).rowcount,
+        'requests': connection.execute(
+            delete(ServiceRequest.__table__).where(s.professional_id == professional_id)
+        ).rowcount,
+    }
+    search_index.remove_professionals(connection, [professional_id])
+    _delete_profile_children(connection, [professional_id])
+    counts['professionals'] = connection.execute(
+        delete(Professional.__table__).where(p.id == professional_id)
+    ).rowcount
+    if counts['professionals']:
+        rankings.refresh_categories(connection, categories)
+        bump_session_versions(session, versions_for(Professional, ServiceRequest, Review, *PROFILE_CHILDREN))
+        session.expire_all()
+    return counts
@@ -1,63 +1,204 @@
 # app.py - Versão revisada completa (CRUD categorias + front + proteções)
 import os
 import re
+import time
 from datetime import datetime
 
-import requests
 from flask import (
-    Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session
+    Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session, send_file
 )
 from flask_login import (
     LoginManager, login_user, logout_user, login_required, current_user
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from validate_docbr import CPF
-from sqlalchemy import or_
+from sqlalchemy import func, or_
 from functools import wraps
 import base64
+import io
+import click
 # ---------- Config do Flask ----------
 app = Flask(__name__)
 # Em produção - use variável de ambiente para SECRET_KEY
 app.secret_key = os.environ.get("SECRET_KEY", "uma_chave_muito_secreta")
 
+# Atrás do proxy do Replit: nº de proxies confiáveis na frente do app. Com
+# ele, remote_addr/esquema/host vêm de X-Forwarded-* (o limite por IP depende
+# disso). Use 0 só quando o app recebe as conexões dos clientes direto.
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+app.config["PROXY_FIX_X_FOR"] = int(os.environ.get("PROXY_FIX_X_FOR", "1"))
+if app.config["PROXY_FIX_X_FOR"]:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app,
+        x_for=app.config["PROXY_FIX_X_FOR"], x_proto=1, x_host=1,
+    )
+
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
     "DATABASE_URL", "sqlite:///database.db"
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# CEP: upstream e faixas offline (ver cep.py)
+app.config["VIACEP_URL"] = os.environ.get("VIACEP_URL", "https://viacep.com.br/ws")
+app.config["CEP_RANGES_FILE"] = os.environ.get(
+    "CEP_RANGES_FILE", os.path.join(app.root_path, "data", "cep_garanhuns.csv")
+)
+
+# Uploads: arquivos no blob store em disco (ver blobstore.py)
+app.config["MEDIA_ROOT"] = os.environ.get("MEDIA_ROOT", os.path.join(app.instance_path, "media"))
+app.config["MAX_CONTENT_LENGTH"] = 8 * 1024 * 1024
+
 # ---------- Inicializar DB ----------
 try:
-    from database import db
+    from database import db, init_app as init_database
 except Exception as e:
     raise RuntimeError(
         "Erro ao importar 'db' de database.py. Verifique se existe database.py e contém 'db = SQLAlchemy()'."
     ) from e
 
-db.init_app(app)
+init_database(app, os.environ)  # perfil da engine: DB_PROFILE (ver database.py)
 
 # ---------- Importar models ----------
 try:
-    from models import User, Professional, ServiceCategory, ServiceRequest, Review
+    from models import (
+        User, Professional, ProfessionalService, ProfessionalTag, ServiceCategory, ServiceRequest, Review,
+        reconcile_ratings,
+    )
 except Exception as e:
     raise RuntimeError(
         "Erro ao importar models. Verifique models.py e ajuste nomes/classes: User, Professional, ServiceCategory, ServiceRequest, Review."
     ) from e
 
+import queries
+import facets
+import autocomplete
+import rankings
+import profile_data
+import search_index
+import migrations
+import accounts
+from pagination import Page, decode_token, encode_token, paginate_keyset
+
+SEARCH_PER_PAGE = 12
+ADMIN_PER_PAGE = 20
+
 # ---------- Login manager ----------
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"
 
-@login_manager.user_loader
-def load_user(user_id):
-    try:
-        return User.query.get(int(user_id))
-    except Exception:
-        return None
+# Usuário logado: cache curto + identity map da sessão (ver identity.py)
+import identity
+identity.configure(ttl=int(os.environ.get("USER_CACHE_TTL", "30")))
+login_manager.user_loader(identity.load_user)
 
 # ---------- CPF validator ----------
 cpf_validator = CPF()
 
+# ---------- Blob store ----------
+from blobstore import BlobError, LocalBlobStore, is_valid_hash
+
+blob_store = LocalBlobStore(app.config["MEDIA_ROOT"], max_size=app.config["MAX_CONTENT_LENGTH"])
+
+# ---------- Derivados de imagem ----------
+import images
+
+image_pipeline = images.ImagePipeline(app, blob_store, workers=int(os.environ.get("IMAGE_WORKERS", 2)))
+
+
+@app.template_filter('media_url')
+def media_url_filter(value):
+    """Hash do blob store -> URL /media/<hash>; outros valores passam direto."""
+    if is_valid_hash(value):
+        return url_for('media', blob_hash=value)
+    return value
+
+
+@app.template_filter('media_srcset')
+def media_srcset_filter(variants):
+    return ', '.join(
+        f"{url_for('media', blob_hash=h)} {width}w" for h, width in images.srcset_entries(variants)
+    )
+
+# ---------- Cache de páginas ----------
+from cache import bump_session_versions, track_versions, versions_for
+from page_cache import DATA_VERSION, PageCache
+
+app.config["PAGE_CACHE_BACKEND"] = os.environ.get("PAGE_CACHE_BACKEND", "memory")
+app.config["PAGE_CACHE_DIR"] = os.environ.get("PAGE_CACHE_DIR", os.path.join(app.instance_path, "page_cache"))
+app.config["PAGE_CACHE_URL"] = os.environ.get("PAGE_CACHE_URL", "redis://localhost:6379/0")
+
+# o que aparece nos cards/listas públicas; gravar em qualquer um invalida as páginas
+for _model in (Professional, Review, ServiceCategory, ProfessionalService, ProfessionalTag):
+    track_versions(_model, DATA_VERSION)
+# de User, só o que os cards, as contagens e a busca por proximidade leem: um
+# cadastro novo ou o rehash da senha no login não esvaziam os caches
+track_versions(User, DATA_VERSION, inserts=False,
+               columns=('name', 'neighborhood', 'city', 'state', 'latitude', 'longitude', 'geohash'))
+
+page_cache = PageCache(app)
+
+# ---------- Instrumentação por requisição (Server-Timing, /metrics) ----------
+import http_client
+from profiling import RequestProfiler, span
+
+profiler = RequestProfiler(app, http_clients=[http_client.default_client])
+
+# ---------- Hash de senha (custo configurável, pools fora da thread da requisição) ----------
+from concurrent.futures import TimeoutError as FutureTimeout
+from workers import BoundedExecutor, Overloaded
+import passwords
+
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", passwords.DEFAULT_METHOD)
+app.config["HASH_WORKERS"] = int(os.environ.get("HASH_WORKERS", min(4, os.cpu_count() or 1)))
+app.config["HASH_QUEUE"] = int(os.environ.get("HASH_QUEUE", "32"))
+app.config["HASH_TIMEOUT"] = float(os.environ.get("HASH_TIMEOUT", "10"))
+# login tem pool próprio: uma rajada de tentativas não ocupa o do cadastro
+app.config["LOGIN_WORKERS"] = int(os.environ.get("LOGIN_WORKERS", min(2, os.cpu_count() or 1)))
+app.config["LOGIN_QUEUE"] = int(os.environ.get("LOGIN_QUEUE", "16"))
+
+passwords.configure(app.config["PASSWORD_HASH_METHOD"])
+hash_pool = BoundedExecutor(app.config["HASH_WORKERS"], app.config["HASH_QUEUE"], name='hash')
+login_pool = BoundedExecutor(app.config["LOGIN_WORKERS"], app.config["LOGIN_QUEUE"], name='login')
+profiler.metric_sources.append(lambda: hash_pool.prometheus_lines('app_hash_pool'))
+profiler.metric_sources.append(lambda: login_pool.prometheus_lines('app_login_pool'))
+
+# ---------- Limite de requisições (login e API de CEP) ----------
+from ratelimit import RateLimiter, SlidingWindow, TokenBucket, client_ip, form_cpf
+
+app.config["RATELIMIT_BACKEND"] = os.environ.get("RATELIMIT_BACKEND", "memory")
+app.config["RATELIMIT_URL"] = os.environ.get("RATELIMIT_URL", app.config["PAGE_CACHE_URL"])
+
+limiter = RateLimiter(app)
+profiler.metric_sources.append(limiter.prometheus_lines)
+
+# por IP: rajada de 10, depois 10 por minuto; por CPF: 10 tentativas em 15 min
+LOGIN_LIMITS = (
+    TokenBucket('login-ip', rate=10 / 60, burst=10, key=client_ip),
+    SlidingWindow('login-cpf', limit=10, window=15 * 60, key=form_cpf),
+)
+# o formulário consulta o CEP ao sair do campo: rajada de 20, depois 30 por minuto
+CEP_API_LIMITS = (TokenBucket('cep-ip', rate=30 / 60, burst=20, key=client_ip),)
+
+def login_limited():
+    flash('Muitas tentativas de login. Aguarde alguns minutos e tente novamente.', 'danger')
+    return render_template('login.html')
+
+# ---------- CEP resolver ----------
+from cep import CepRanges, CepResolver, ViaCepUpstream, import_ceps, normalize_cep
+
+cep_resolver = CepResolver(
+    upstream=ViaCepUpstream(app.config["VIACEP_URL"]),
+    ranges=CepRanges.load(app.config["CEP_RANGES_FILE"]),
+)
+
+# ---------- Localização (centróides de CEP/bairro, busca por proximidade) ----------
+import geo
+
+app.config["GEO_CENTROIDS_FILE"] = os.environ.get("GEO_CENTROIDS_FILE", geo.DEFAULT_CENTROIDS_FILE)
+centroids = geo.Centroids.load(app.config["GEO_CENTROIDS_FILE"])
+NEAR_LIMIT = 24
+
 # --------------------------
 # ADMIN DECORATOR
 # --------------------------
@@ -87,43 +228,50 @@ def normalize_cpf_masked(cpf_masked: str) -> str:
     return f"{digits[0:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:11]}"
 
 def validate_cep_garanhuns(cep: str):
-    """Valida via ViaCEP e garante Garanhuns/PE. Retorna dict ou None."""
-    if not cep:
-        return None
-    cep_digits = re.sub(r'\D', '', cep)
-    if len(cep_digits) != 8:
-        return None
-    try:
-        r = requests.get(f"https://viacep.com.br/ws/{cep_digits}/json/", timeout=5)
-        if not r.ok:
-            return None
-        data = r.json()
-        if 'erro' in data:
-            return None
-        # garante cidade/UF
-        if data.get('localidade') != 'Garanhuns' or data.get('uf') != 'PE':
-            return None
-        return {
-            'cep': cep_digits,
-            'address': data.get('logradouro', '') or '',
-            'neighborhood': data.get('bairro', '') or '',
-            'city': data.get('localidade', '') or '',
-            'state': data.get('uf', '') or ''
-        }
-    except Exception:
+    """Valida o CEP (ver cep.py) e garante Garanhuns/PE. Retorna dict ou None."""
+    data = cep_resolver.resolve(cep)
+    # garante cidade/UF
+    if not data or data['city'] != 'Garanhuns' or data['state'] != 'PE':
         return None
+    return data
+
+PREFETCHED_CEPS = 3
+
+def remember_cep(data):
+    """Guarda na sessão (assinada) o CEP que o formulário acabou de validar."""
+    prefetched = [c for c in session.get('cep_prefetch', []) if c['cep'] != data['cep']]
+    session['cep_prefetch'] = [data, *prefetched][:PREFETCHED_CEPS]
+
+def prefetched_cep(cep: str):
+    """CEP já validado por /api/validar-cep nesta sessão, ou None."""
+    digits = normalize_cep(cep)
+    for data in session.get('cep_prefetch', []):
+        if digits and normalize_cep(data['cep']) == digits:
+            return data
+    return None
 
 # --------------------------
 # ROTAS PÚBLICAS / FRONT
 # --------------------------
 
 @app.route('/')
+@page_cache.cached
 def index():
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
-    professionals = Professional.query.order_by(Professional.created_at.desc()).limit(6).all()
+    categories = queries.all_categories()
+    professionals = queries.top_professionals(limit=6)
     return render_template('index.html', categories=categories, professionals=professionals)
 
 
+@app.route('/categorias/<int:category_id>')
+@page_cache.cached
+def category_page(category_id):
+    category = next((c for c in queries.all_categories() if c.id == category_id), None)
+    if category is None:
+        abort(404)
+    professionals = queries.top_professionals(category_id, rankings.TOP_N)
+    return render_template('category.html', category=category, professionals=professionals)
+
+
 # --------------------------
 # REGISTRO
 # --------------------------
@@ -147,26 +295,42 @@ def register():
             flash('Nome, email e senha são obrigatórios.', 'danger')
             return render_template('register.html')
 
+        # validações baratas antes do hash: cadastro inválido ou repetido não
+        # gasta o pool de hash (nem empurra os válidos para o 503)
         digits_only_cpf = re.sub(r'\D', '', cpf_mask)
         if not cpf_mask or not cpf_validator.validate(digits_only_cpf):
             flash('CPF inválido.', 'danger')
             return render_template('register.html')
-
-        cep_data = validate_cep_garanhuns(cep_raw)
-        if not cep_data:
-            flash('CEP inválido ou fora de Garanhuns-PE.', 'danger')
-            return render_template('register.html')
-
         # verifica duplicidade
         if User.query.filter(or_(User.cpf == cpf_mask, User.email == email)).first():
             flash('CPF ou email já cadastrado.', 'danger')
             return render_template('register.html')
 
+        # o hash (caro, solta o GIL) roda no pool enquanto o CEP é resolvido
+        try:
+            hashing = hash_pool.submit(passwords.hash_password, password)
+        except Overloaded:
+            flash('Muitos cadastros no momento. Tente novamente em instantes.', 'warning')
+            return render_template('register.html'), 503, {'Retry-After': '5'}
+
+        # o formulário já validou o CEP em /api/validar-cep ao sair do campo
+        cep_data = prefetched_cep(cep_raw) or validate_cep_garanhuns(cep_raw)
+        if not cep_data:
+            hashing.cancel()
+            flash('CEP inválido ou fora de Garanhuns-PE.', 'danger')
+            return render_template('register.html')
+
+        try:
+            with span('hash'):
+                password_hash = hashing.result(timeout=app.config["HASH_TIMEOUT"])
+        except FutureTimeout:
+            flash('Muitos cadastros no momento. Tente novamente em instantes.', 'warning')
+            return render_template('register.html'), 503, {'Retry-After': '5'}
         user = User(
             name=name,
             email=email,
             cpf=cpf_mask,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
             user_type=user_type,
             phone=phone,
             cep=cep_data['cep'],
@@ -174,6 +338,7 @@ def register():
             neighborhood=cep_data['neighborhood'],
             city=cep_data['city'],
             state=cep_data['state'],
+            **centroids.coordinates(cep_data['cep'], cep_data['neighborhood'], cep_data['city'], cep_data['state']),
             created_at=datetime.utcnow()
         )
         db.session.add(user)
@@ -192,6 +357,7 @@ def register():
 # LOGIN
 # --------------------------
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit(*LOGIN_LIMITS, methods=('POST',), on_limit=login_limited)
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
@@ -202,7 +368,18 @@ def login():
         password = request.form.get('password') or ""
 
         user = User.query.filter_by(cpf=cpf_mask).first()
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            checking = login_pool.submit(passwords.check_password, user.password_hash if user else None, password)
+            with span('hash'):
+                valid, new_hash = checking.result(timeout=app.config["HASH_TIMEOUT"])
+        except (Overloaded, FutureTimeout):
+            flash('Muitas tentativas de login no momento. Tente novamente em instantes.', 'warning')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        if valid:
+            if new_hash:
+                # hash com custo/método antigo: regrava no método atual
+                user.password_hash = new_hash
+                db.session.commit()
             login_user(user)
             return redirect(url_for('dashboard'))
         flash('CPF ou senha incorretos.', 'danger')
@@ -222,37 +399,82 @@ def logout():
 # SEARCH
 # --------------------------
 @app.route('/search')
+@page_cache.cached
 def search():
-    name = (request.args.get('name') or '').strip()
-    category_id = request.args.get('category', '')
-    neighborhood = (request.args.get('neighborhood') or '').strip()
-    min_price = (request.args.get('min_price') or '').strip()
-    max_price = (request.args.get('max_price') or '').strip()
-
-    # junção segura (Professional tem relationship user via backref)
-    query = Professional.query.join(User)
-
-    if name:
-        query = query.filter(User.name.ilike(f"%{name}%"))
-
-    if category_id and category_id.isdigit():
-        query = query.filter(Professional.category_id == int(category_id))
-
-    if neighborhood:
-        query = query.filter(User.neighborhood.ilike(f"%{neighborhood}%"))
-
-    try:
-        if min_price:
-            query = query.filter(Professional.starting_price >= float(min_price))
-        if max_price:
-            query = query.filter(Professional.starting_price <= float(max_price))
-    except ValueError:
-        # se preço inválido, ignora o filtro
-        pass
-
-    professionals = query.all()
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
-    return render_template('search.html', professionals=professionals, categories=categories)
+    # o token de página carrega filtros + ordenação + última chave vista;
+    # sem token, os filtros vêm dos parâmetros do formulário
+    token = decode_token(request.args.get('page'), salt='search-page')
+    if token:
+        filters = token.get('filters') or {}
+        sort = token.get('sort')
+        after = token.get('after')
+    else:
+        filters = queries.parse_search_filters(request.args)
+        sort = request.args.get('sort')
+        after = None
+    if sort not in queries.SEARCH_SORTS:
+        sort = queries.DEFAULT_SEARCH_SORT
+
+    categories = queries.all_categories()
+    if filters.get('near'):
+        return search_nearby(filters, sort, categories)
+
+    # user e category carregados no mesmo SELECT; texto via índice (ver queries.py)
+    query, keys = queries.search_query(filters, sort)
+
+    professionals, last = paginate_keyset(query, keys, after=after, per_page=SEARCH_PER_PAGE)
+    next_token = None
+    if last is not None:
+        next_token = encode_token({'filters': filters, 'sort': sort, 'after': last}, salt='search-page')
+
+    # total e contagens por categoria/bairro/preço numa só consulta agrupada, em cache
+    facet_counts = facets.facet_counts(filters)
+    first_page_url = url_for(
+        'search', sort=sort, **{k: v for k, v in filters.items() if v not in (None, '')}
+    )
+    return render_template(
+        'search.html',
+        professionals=Page(professionals, next_token),
+        categories=categories,
+        filters=filters,
+        sort=sort,
+        total=facet_counts['total'],
+        facets=facet_counts,
+        facet_args={k: v for k, v in filters.items() if v not in (None, '')},
+        first_page_url=first_page_url,
+    )
+
+def near_origin(near):
+    """(lat, lon) de onde medir: o usuário logado ('me') ou um CEP; None se não localizar."""
+    if near == 'me':
+        if current_user.is_authenticated and current_user.latitude is not None:
+            return current_user.latitude, current_user.longitude
+        return None
+    data = validate_cep_garanhuns(near)
+    if not data:
+        return None
+    return centroids.locate(data['cep'], data['neighborhood'], data['city'], data['state'])
+
+def search_nearby(filters, sort, categories):
+    """Busca "perto de mim": os NEAR_LIMIT mais próximos no raio, por distância."""
+    origin = near_origin(filters['near'])
+    results = []
+    if origin is not None:
+        results = queries.nearby_professionals(filters, origin, filters['radius'], NEAR_LIMIT)
+    return render_template(
+        'search.html',
+        professionals=Page([prof for prof, _ in results], None),
+        distances={prof.id: km for prof, km in results},
+        near_error=None if origin is not None else (
+            'Faça login com um CEP cadastrado para buscar perto de você.' if filters['near'] == 'me'
+            else 'CEP não localizado em Garanhuns-PE.'
+        ),
+        categories=categories,
+        filters=filters,
+        sort=sort,
+        total=len(results),
+        first_page_url=url_for('search', **{k: v for k, v in filters.items() if v not in (None, '')}),
+    )
 
 # --------------------------
 # COMPLETAR PERFIL PROFISSIONAL
@@ -264,7 +486,7 @@ def complete_professional_profile():
         return redirect(url_for('index'))
 
     # se já existe perfil, redireciona
-    if Professional.query.filter_by(user_id=current_user.id).first():
+    if current_user.professional_profile:
         return redirect(url_for('dashboard'))
 
     if request.method == 'POST':
@@ -287,7 +509,7 @@ def complete_professional_profile():
         flash('Perfil profissional criado com sucesso!', 'success')
         return redirect(url_for('dashboard'))
 
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
+    categories = queries.all_categories()
     return render_template('complete_profile.html', categories=categories)
 
 # --------------------------
@@ -297,13 +519,13 @@ def complete_professional_profile():
 @login_required
 def dashboard():
     if getattr(current_user, 'user_type', None) == 'professional':
-        prof = Professional.query.filter_by(user_id=current_user.id).first()
+        prof = current_user.professional_profile  # já carregado com a categoria
         if not prof:
             return redirect(url_for('complete_professional_profile'))
-        requests_list = ServiceRequest.query.filter_by(professional_id=prof.id).order_by(ServiceRequest.created_at.desc()).all()
+        requests_list = queries.professional_dashboard_requests(prof.id).all()
         return render_template('dashboard_professional.html', professional=prof, requests=requests_list)
     else:
-        requests_list = ServiceRequest.query.filter_by(client_id=current_user.id).order_by(ServiceRequest.created_at.desc()).all()
+        requests_list = queries.client_dashboard_requests(current_user.id).all()
         return render_template('dashboard_client.html', requests=requests_list)
 
 # --------------------------
@@ -312,8 +534,8 @@ def dashboard():
 @app.route('/perfil')
 @login_required
 def perfil():
-    user = User.query.get_or_404(current_user.id)
-    prof = Professional.query.filter_by(user_id=user.id).first()
+    user = User.query.get_or_404(current_user.id)  # identity map, sem SQL
+    prof = user.professional_profile
     return render_template("perfil.html", user=user, prof=prof)
 
 
@@ -324,7 +546,7 @@ def perfil():
 @login_required
 def profissional_solicitar():
     user = User.query.get_or_404(current_user.id)
-    prof = Professional.query.filter_by(user_id=user.id).first()
+    prof = user.professional_profile
     return render_template("professional_solicitar.html", user=user, professional=prof)
 
 
@@ -335,48 +557,66 @@ def profissional_solicitar():
 @app.route('/excluir_proprio_usuario', methods=['POST'])
 @login_required
 def excluir_proprio_usuario():
-    user = User.query.get(int(current_user.id))
-    if not user:
-        flash("Usuário não encontrado.", "danger")
-        return redirect(url_for('dashboard'))
-
-    user_id = user.id
+    user_id = int(current_user.id)
 
     # Logout antes de apagar
     logout_user()
 
-    # Excluir requests onde ele é cliente
-    ServiceRequest.query.filter(ServiceRequest.client_id == user_id).delete(synchronize_session=False)
-
-    # Se for profissional, excluir requests onde profissional é o perfil do usuário
-    prof = Professional.query.filter_by(user_id=user_id).first()
-    if prof:
-        ServiceRequest.query.filter(ServiceRequest.professional_id == prof.id).delete(synchronize_session=False)
-        # excluir reviews relacionadas ao profissional
-        Review.query.filter_by(professional_id=prof.id).delete(synchronize_session=False)
-        # remover perfil profissional
-        db.session.delete(prof)
-
-    # excluir reviews onde foi cliente
-    Review.query.filter_by(client_id=user_id).delete(synchronize_session=False)
-
-    # excluir usuário
-    db.session.delete(user)
+    # pedidos, avaliações e perfil profissional saem junto, em DELETEs por conjunto
+    if not accounts.delete_accounts([user_id])['users']:
+        flash("Usuário não encontrado.", "danger")
+        return redirect(url_for('index'))
     db.session.commit()
 
     flash("Conta excluída com sucesso!", "success")
     return redirect(url_for('index'))
 
+# --------------------------
+# MÍDIA (blob store)
+# --------------------------
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+
+@app.route('/media/<string:blob_hash>')
+def media(blob_hash):
+    # o hash é o conteúdo: ETag = hash e cache imutável; send_file trata Range/304
+    if not blob_store.exists(blob_hash):
+        abort(404)
+    response = send_file(
+        blob_store.path(blob_hash),
+        mimetype=blob_store.content_type(blob_hash),
+        conditional=True,
+        etag=blob_hash,
+        max_age=MEDIA_MAX_AGE,
+    )
+    response.headers['Cache-Control'] = f'public, max-age={MEDIA_MAX_AGE}, immutable'
+    return response
+
 # --------------------------
 # API – validar CEP
 # --------------------------
 @app.route('/api/validar-cep/<string:cep>')
+@limiter.limit(*CEP_API_LIMITS)
 def api_validate_cep(cep):
     data = validate_cep_garanhuns(cep)
     if data:
+        remember_cep(data)
         return jsonify(data)
     return jsonify({'error': 'CEP inválido ou fora de Garanhuns–PE'}), 400
 
+# --------------------------
+# API – sugestões da busca (índice em memória, ver autocomplete.py)
+# --------------------------
+@app.route('/api/autocomplete')
+def api_autocomplete():
+    kinds = [k for k in request.args.getlist('kind') if k in autocomplete.KINDS]
+    limit = request.args.get('limit', autocomplete.DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+    suggestions = autocomplete.suggest(request.args.get('q', '')[:100], kinds, limit)
+    response = jsonify({'suggestions': suggestions})
+    response.headers['Cache-Control'] = 'public, max-age=30'
+    return response
+
 # --------------------------
 # CATEGORIAS CRUD (PROTEGIDAS PELO ADMIN)
 # --------------------------
@@ -407,18 +647,28 @@ def logout_admin():
     
 @app.route('/admin/categorias/listar')
 def listar_categorias():
-    categorias = ServiceCategory.query.all()
-    return render_template('admin/categorias/listar.html', categorias=categorias)
+    token = decode_token(request.args.get('page'), salt='admin-categorias')
+    keys = [(ServiceCategory.name, False), (ServiceCategory.id, False)]
+    categorias, last = paginate_keyset(
+        ServiceCategory.query, keys,
+        after=token.get('after') if token else None, per_page=ADMIN_PER_PAGE
+    )
+    next_token = encode_token({'after': last}, salt='admin-categorias') if last else None
+    return render_template('admin/categorias/listar.html', categorias=Page(categorias, next_token))
 
 @app.route('/admin/categorias/criar', methods=['GET', 'POST'])
 def adicionar_categoria():
     if request.method == 'POST':
         imagem = request.files.get('Imagem')
-        imagem_base64 = None
+        image_hash = None
 
-        # Se uma imagem for enviada, converte para base64
+        # Se uma imagem for enviada, grava em blocos no blob store
         if imagem and imagem.filename != "":
-            imagem_base64 = base64.b64encode(imagem.read()).decode('utf-8')
+            try:
+                image_hash = blob_store.save(imagem.stream)
+            except BlobError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('adicionar_categoria'))
 
         nome = (request.form.get('name') or '').strip()
         descricao = (request.form.get('description') or '').strip()
@@ -434,8 +684,8 @@ def adicionar_categoria():
         cat = ServiceCategory(
             name=nome,
             description=descricao,
+            image_hash=image_hash,
             created_at=datetime.utcnow()
-            # image=imagem_base64  ← se tiver esse campo no seu model
         )
 
         db.session.add(cat)
@@ -456,8 +706,12 @@ def editar_categoria(id):
 
         # Atualiza a imagem somente se uma nova for enviada
         if imagem and imagem.filename != "":
-            imagem_base64 = base64.b64encode(imagem.read()).decode('utf-8')
-            # categoria.image = imagem_base64  ← se tiver o campo
+            try:
+                categoria.image_hash = blob_store.save(imagem.stream)
+                categoria.image = None
+            except BlobError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('editar_categoria', id=id))
 
         categoria.name = (request.form.get('name') or categoria.name).strip()
         categoria.description = (request.form.get('description') or categoria.description).strip()
@@ -495,12 +749,18 @@ def deletar_categoria(id):
 # --------------------------
 @app.route('/admin/profissoes')
 def listar_profissoes():
-    profs = Professional.query.order_by(Professional.created_at.desc()).all()
-    return render_template('admin/profissoes/listar.html', profissoes=profs)
+    token = decode_token(request.args.get('page'), salt='admin-profissoes')
+    keys = [(func.coalesce(Professional.created_at, datetime(1970, 1, 1)), True), (Professional.id, True)]
+    profs, last = paginate_keyset(
+        Professional.query, keys,
+        after=token.get('after') if token else None, per_page=ADMIN_PER_PAGE
+    )
+    next_token = encode_token({'after': last}, salt='admin-profissoes') if last else None
+    return render_template('admin/profissoes/listar.html', profissoes=Page(profs, next_token))
 
 @app.route('/admin/profissoes/criar', methods=['GET', 'POST'])
 def adicionar_profissao():
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
+    categories = queries.all_categories()
     if request.method == 'POST':
         try:
             category_id = int(request.form.get('category_id')) if request.form.get('category_id') else None
@@ -527,7 +787,7 @@ def editar_profissao(id):
     if prof.user_id != current_user.id:
         flash('Acesso negado.', 'danger')
         return redirect(url_for('dashboard'))
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
+    categories = queries.all_categories()
     if request.method == 'POST':
         prof.category_id = int(request.form.get('category_id')) if request.form.get('category_id') else None
         prof.bio = (request.form.get('bio') or prof.bio).strip()
@@ -545,9 +805,8 @@ def deletar_profissao(id):
     if prof.user_id != current_user.id:
         flash('Acesso negado.', 'danger')
         return redirect(url_for('listar_profissoes'))
-    # Remove reviews associados ao profissional
-    Review.query.filter_by(professional_id=prof.id).delete(synchronize_session=False)
-    db.session.delete(prof)
+    # remove pedidos e avaliações do profissional junto com o perfil
+    accounts.delete_professional_profile(prof.id)
     db.session.commit()
     flash('Perfil profissional excluído.', 'success')
     return redirect(url_for('admin/profissoes/excluir.html'))
@@ -559,8 +818,8 @@ def deletar_profissao(id):
 @login_required
 def editar_perfil():
     user = User.query.get_or_404(current_user.id)
-    prof = Professional.query.filter_by(user_id=user.id).first()
-    categories = ServiceCategory.query.order_by(ServiceCategory.name).all()
+    prof = user.professional_profile
+    categories = queries.all_categories()
 
     if request.method == 'POST':
         user.name = (request.form.get('name') or user.name).strip()
@@ -568,9 +827,41 @@ def editar_perfil():
         user.phone = (request.form.get('phone') or user.phone).strip()
         senha = (request.form.get('password') or '').strip()
         if senha:
-            user.password_hash = generate_password_hash(senha)
+            with span('hash'):
+                user.password_hash = passwords.hash_password(senha)
         # opcional: atualizar endereço/cep – fazer validação se necessário
+
+        # fotos: só o original é gravado aqui; os derivados saem em segundo plano
+        new_profile_photo = None
+        new_portfolio = []
+        if prof:
+            try:
+                foto = request.files.get('profile_photo')
+                if foto and foto.filename:
+                    new_profile_photo = blob_store.save(foto.stream)
+                    prof.profile_photo = new_profile_photo
+                    prof.profile_photo_variants = None
+                for foto in request.files.getlist('portfolio_photos'):
+                    if foto and foto.filename:
+                        new_portfolio.append(blob_store.save(foto.stream))
+            except BlobError as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
+                return redirect(url_for('editar_perfil'))
+            if new_portfolio:
+                profile_data.add_portfolio_photos(prof, new_portfolio)
+            availability = request.form.get('availability')
+            if availability is not None and availability.strip() != prof.availability:
+                if not profile_data.set_availability(prof, availability.strip()):
+                    flash('Disponibilidade salva como texto: não reconhecemos dias e horários nela.', 'warning')
+
         db.session.commit()
+
+        if new_profile_photo:
+            image_pipeline.submit_profile_photo(prof.id, new_profile_photo)
+        for h in new_portfolio:
+            image_pipeline.submit_portfolio_photo(prof.id, h)
+
         flash('Perfil atualizado com sucesso!', 'success')
         return redirect(url_for('perfil'))
 
@@ -579,15 +870,144 @@ def editar_perfil():
 # --------------------------
 # UTILITÁRIOS (startup)
 # --------------------------
+@app.cli.command('reconcile-ratings')
+def reconcile_ratings_command():
+    """Recalcula nota média/contagem/histograma de todos os profissionais."""
+    updated = reconcile_ratings()
+    db.session.commit()
+    print(f"{updated} profissionais atualizados.")
+
+
+@app.cli.command('purge-users')
+@click.argument('ids', nargs=-1, type=int)
+@click.option('--file', 'path', type=click.File(), help='ids ou CPFs, um por linha')
+@click.option('--batch-size', type=int, default=1000, help='usuários por transação')
+@click.option('--dry-run', is_flag=True, help='só mostra quantos usuários seriam apagados')
+def purge_users_command(ids, path, batch_size, dry_run):
+    """Apaga contas em massa (com pedidos, avaliações e perfis), em DELETEs por conjunto."""
+    user_ids = set(ids)
+    cpfs = []
+    for line in (path or ()):
+        value = line.strip()
+        if value.isdigit() and len(value) != 11:
+            user_ids.add(int(value))
+        elif value:
+            cpfs.append(normalize_cpf_masked(value))
+    requested = len(user_ids) + len(cpfs)
+    for chunk in accounts.chunks(cpfs):
+        user_ids.update(id_ for (id_,) in db.session.query(User.id).filter(User.cpf.in_(chunk)))
+    existing = set()
+    for chunk in accounts.chunks(user_ids):
+        existing.update(id_ for (id_,) in db.session.query(User.id).filter(User.id.in_(chunk)))
+    print(f"{len(existing)} usuários encontrados ({requested - len(existing)} não encontrados).")
+    if dry_run or not existing:
+        return
+
+    started = time.perf_counter()
+    totals = dict.fromkeys(('users', 'professionals', 'requests', 'reviews'), 0)
+    for batch in accounts.chunks(sorted(existing), batch_size):
+        counts = accounts.delete_accounts(batch)
+        db.session.commit()
+        for name, value in counts.items():
+            totals[name] += value
+    print(', '.join(f"{value} {name}" for name, value in totals.items())
+          + f" apagados em {time.perf_counter() - started:.2f}s.")
+
+
+@app.cli.command('geocode-users')
+@click.option('--missing-only', is_flag=True, help='só usuários ainda sem coordenadas')
+def geocode_users_command(missing_only):
+    """Recalcula latitude/longitude/geohash dos usuários pelos centróides (GEO_CENTROIDS_FILE)."""
+    updated = geo.geocode_users(db.session.connection(), centroids, only_missing=missing_only)
+    bump_session_versions(db.session, versions_for(User))
+    db.session.commit()
+    print(f"{updated} usuários atualizados.")
+
+
+@app.cli.command('refresh-rankings')
+def refresh_rankings_command():
+    """Recalcula os destaques por categoria (agendar diariamente: o bônus de recência envelhece)."""
+    categories = rankings.refresh_all(db.session.connection())
+    bump_session_versions(db.session, {DATA_VERSION})
+    db.session.commit()
+    print(f"Destaques recalculados para {categories} categorias.")
+
+
+@app.cli.command('import-ceps')
+@click.argument('path')
+def import_ceps_command(path):
+    """Importa CEPs resolvidos (CSV cep,address,neighborhood,city,state) para o cache."""
+    imported = import_ceps(path)
+    db.session.commit()
+    print(f"{imported} CEPs importados.")
+
+
+@app.cli.command('migrate-category-images')
+def migrate_category_images_command():
+    """Move imagens base64 de service_categories.image para o blob store."""
+    migrated = 0
+    pending = ServiceCategory.query.filter(
+        ServiceCategory.image.isnot(None), ServiceCategory.image_hash.is_(None)
+    )
+    for categoria in pending:
+        try:
+            raw = base64.b64decode(categoria.image)
+            categoria.image_hash = blob_store.save(io.BytesIO(raw))
+        except (ValueError, BlobError) as e:
+            print(f"Categoria {categoria.id}: imagem ignorada ({e}).")
+            continue
+        categoria.image = None
+        migrated += 1
+    db.session.commit()
+    print(f"{migrated} imagens migradas.")
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Aplica as migrações de esquema pendentes (ver migrations.py)."""
+    def report(migration_id, counts):
+        print(f"{migration_id}: " + ', '.join(f"{value} {name}" for name, value in counts.items()))
+
+    applied = migrations.upgrade(report=report)
+    print(f"{len(applied)} migrações aplicadas: {', '.join(applied) or '-'}")
+
+
+@app.cli.command('db-status')
+def db_status_command():
+    """Lista as migrações de esquema e quando foram aplicadas."""
+    for migration_id, description, applied_at in migrations.status():
+        print(f"{migration_id}  {applied_at or 'pendente':26}  {description}")
+
+
+@app.cli.command('calibrate-password-hash')
+@click.option('--target-ms', type=float, default=250, help='tempo desejado por hash')
+@click.option('--algorithm', type=click.Choice(['scrypt', 'pbkdf2']), default='scrypt')
+def calibrate_password_hash_command(target_ms, algorithm):
+    """Mede o custo do hash de senha nesta máquina e sugere PASSWORD_HASH_METHOD."""
+    measured, chosen = passwords.calibrate(target_ms / 1000, algorithm)
+    for method, seconds in measured:
+        print(f"{method:28} {seconds * 1000:8.1f} ms")
+    print(f"atual:    {passwords.current_method()}  ({passwords.time_method(passwords.current_method()) * 1000:.1f} ms)")
+    print(f"sugerido: PASSWORD_HASH_METHOD={chosen}")
+    if passwords.below_minimum(chosen):
+        print("atenção: custo abaixo do mínimo recomendado; prefira mais workers a um hash mais barato.")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Cria (se preciso) e repopula o índice de texto dos profissionais."""
+    indexed = search_index.rebuild(db.session.connection())
+    db.session.commit()
+    print(f"{indexed} profissionais indexados.")
 
 
 # --------------------------
 # execução
 # --------------------------
 if __name__ == '__main__':
-    # Cria tabelas se necessário
+    # Cria tabelas / aplica migrações pendentes
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
         # Opcional: criar admin se definir variáveis de ambiente DEFAULT_ADMIN_EMAIL/PASSWORD
         # create_app_admin_if_missing()
 
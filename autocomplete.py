@@ -0,0 +1,375 @@
+# autocomplete.py - Sugestões da busca (nomes, bairros, categorias, tags)
+#
+# Índice de prefixos em memória, por processo: uma lista ordenada de
+# (sufixo a partir de cada palavra, tipo, texto dobrado) consultada com
+# bisect, então "sil" encontra "João Silva" e "conc" encontra "Boa
+# Conceição". Só entram profissionais (nome, bairro, categoria, tags e
+# serviços do perfil) - nomes de clientes nunca são sugeridos. Cada sugestão guarda
+# quantos profissionais a geraram, usado na ordenação.
+#
+# Atualização:
+# - gravações de Professional/User/tags/serviços pelo ORM marcam os perfis;
+#   antes do commit só esses perfis são relidos, na mesma transação, e depois
+#   dele trocados no índice (incremental);
+# - a versão "autocomplete" (ver cache.track_versions) é relida no máximo a
+#   cada REFRESH_INTERVAL s: se mudou por outro processo, por gravação em
+#   massa (accounts.py, CLIs) ou em categorias, o índice é reconstruído numa
+#   thread, e as consultas seguem no índice anterior até a troca.
+#   Depois da troca incremental, o índice só adota a versão nova se ela for
+#   a anterior + os incrementos deste commit; se outro processo gravou no
+#   meio, a versão fica para trás e a próxima consulta reconstrói.
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.orm import Session, object_session
+
+from cache import committed_bumps, current_version, track_versions
+from models import CacheVersion, Professional, ProfessionalService, ProfessionalTag, ServiceCategory, User
+from search_index import fold
+
+log = logging.getLogger(__name__)
+
+VERSION = 'autocomplete'
+REFRESH_INTERVAL = 10.0
+# nomes são milhares e quase todos com contagem 1: a ordem alfabética dos
+# primeiros que casam basta; bairros, categorias e tags são varridos inteiros
+SCAN_LIMITS = {'professional': 64}
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+KINDS = ('professional', 'neighborhood', 'category', 'tag', 'service')
+
+# só as colunas que entram no índice (ver _profile_rows)
+track_versions(User, VERSION, inserts=False, columns=('name', 'neighborhood'))
+track_versions(Professional, VERSION, columns=('category_id', 'user_id'))
+for _model in (ProfessionalTag, ProfessionalService, ServiceCategory):
+    track_versions(_model, VERSION)
+
+_WORD = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=16384)
+def _normalize(text):
+    return ' '.join(fold(text).split())
+
+
+class PrefixIndex:
+    """Sugestões contadas por (tipo, texto dobrado), buscadas por prefixo."""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.categories = {}        # id -> nome
+        self._entries = {}          # (tipo, dobrado) -> [rótulo, contagem, ref]
+        self._keys = {k: [] for k in KINDS}   # tipo -> [(sufixo, dobrado)], ordenada
+        self._profiles = {}         # id do profissional -> ((tipo, rótulo, ref), ...)
+        self._lock = threading.Lock()
+
+    # ---- manutenção ----
+    def _add(self, kind, label, ref, bulk=False):
+        folded = _normalize(label)
+        if not folded:
+            return
+        entry = self._entries.get((kind, folded))
+        if entry is None:
+            self._entries[(kind, folded)] = [label.strip(), 1, ref]
+            keys = self._keys[kind]
+            for match in _WORD.finditer(folded):
+                key = (folded[match.start():], folded)
+                # carga inicial: ordena uma vez no fim (ver load)
+                keys.append(key) if bulk else insort(keys, key)
+        else:
+            entry[1] += 1
+
+    def _remove(self, kind, label):
+        folded = _normalize(label)
+        entry = self._entries.get((kind, folded))
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del self._entries[(kind, folded)]
+        keys = self._keys[kind]
+        for match in _WORD.finditer(folded):
+            key = (folded[match.start():], folded)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def _terms(self, row):
+        terms = [('professional', row.name, None), ('neighborhood', row.neighborhood, None)]
+        if row.category_id in self.categories:
+            terms.append(('category', self.categories[row.category_id], row.category_id))
+        terms.extend(('tag', tag, None) for tag in row.tags)
+        terms.extend(('service', service, None) for service in row.services)
+        return tuple((kind, label, ref) for kind, label, ref in terms if label)
+
+    def load(self, rows):
+        with self._lock:
+            for row in rows:
+                terms = self._terms(row)
+                self._profiles[row.id] = terms
+                for kind, label, ref in terms:
+                    self._add(kind, label, ref, bulk=True)
+            for keys in self._keys.values():
+                keys.sort()
+
+    def update(self, professional_ids, rows):
+        """Troca as sugestões dos perfis: `rows` são os que ainda existem."""
+        with self._lock:
+            for prof_id in professional_ids:
+                for kind, label, _ in self._profiles.pop(prof_id, ()):
+                    self._remove(kind, label)
+            for row in rows:
+                for kind, label, _ in self._profiles.pop(row.id, ()):
+                    self._remove(kind, label)
+                terms = self._terms(row)
+                self._profiles[row.id] = terms
+                for kind, label, ref in terms:
+                    self._add(kind, label, ref)
+
+    # ---- consulta ----
+    def suggest(self, prefix, kinds=None, limit=DEFAULT_LIMIT):
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self._lock:
+            for kind in kinds or KINDS:
+                keys, entries = self._keys[kind], self._entries
+                i = bisect_left(keys, (prefix,))
+                end = min(len(keys), i + SCAN_LIMITS.get(kind, len(keys)))
+                while i < end and keys[i][0].startswith(prefix):
+                    folded = keys[i][1]
+                    i += 1
+                    label, count, ref = entries[(kind, folded)]
+                    # casar no começo do texto vale mais que no meio
+                    found[(kind, folded)] = (not folded.startswith(prefix), -count, folded, kind, label, count, ref)
+        suggestions = []
+        for _, _, _, kind, label, count, ref in sorted(found.values())[:limit]:
+            item = {'label': label, 'kind': kind, 'count': count}
+            if ref is not None:
+                item['id'] = ref
+            suggestions.append(item)
+        return suggestions
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --------------------------
+# CARGA
+# --------------------------
+ProfileTerms = namedtuple('ProfileTerms', 'id category_id name neighborhood tags services')
+
+
+def _profile_rows(connection, professional_ids=None, user_ids=None):
+    p, u = Professional.__table__.c, User.__table__.c
+    stmt = (
+        select(p.id, p.category_id, u.name, u.neighborhood)
+        .join_from(Professional.__table__, User.__table__, p.user_id == u.id)
+    )
+    if professional_ids is not None or user_ids is not None:
+        stmt = stmt.where(or_(p.id.in_(list(professional_ids or ())), p.user_id.in_(list(user_ids or ()))))
+    rows = connection.execute(stmt).all()
+    ids = None if professional_ids is None and user_ids is None else [r.id for r in rows]
+    items = {}
+    for kind, model, label in (('tags', ProfessionalTag, ProfessionalTag.label),
+                               ('services', ProfessionalService, ProfessionalService.name)):
+        stmt = select(model.professional_id, label)
+        if ids is not None:
+            stmt = stmt.where(model.professional_id.in_(ids))
+        for prof_id, value in connection.execute(stmt):
+            items.setdefault((kind, prof_id), []).append(value)
+    return [
+        ProfileTerms(r.id, r.category_id, r.name, r.neighborhood,
+                     items.get(('tags', r.id), ()), items.get(('services', r.id), ()))
+        for r in rows
+    ]
+
+
+def build(connection):
+    index = PrefixIndex(_read_version(connection))
+    c = ServiceCategory.__table__.c
+    index.categories = dict(connection.execute(select(c.id, c.name)).all())
+    index.load(_profile_rows(connection))
+    return index
+
+
+def _read_version(connection):
+    try:
+        return connection.execute(
+            select(CacheVersion.version).where(CacheVersion.name == VERSION)
+        ).scalar() or 0
+    except Exception:
+        return None
+
+
+_index = None
+_build_lock = threading.Lock()
+_building = False
+
+
+def get_index(engine=None):
+    """Índice atual. Se a versão mudou fora deste processo, reconstrói em
+    segundo plano e segue servindo o índice anterior até a troca."""
+    global _index
+    version = current_version(VERSION, REFRESH_INTERVAL)
+    index = _index
+    if index is not None and (version is None or index.version == version):
+        return index
+    if engine is None:
+        from database import db
+        engine = db.engine
+    if index is not None:
+        _rebuild_in_background(engine)
+        return index
+    with _build_lock:
+        # primeira consulta do processo: não há índice antigo para servir
+        if _index is None:
+            with engine.connect() as connection:
+                _index = build(connection)
+        return _index
+
+
+def _rebuild_in_background(engine):
+    global _building
+    with _build_lock:
+        if _building:
+            return
+        _building = True
+    threading.Thread(target=_rebuild, args=(engine,), name='autocomplete-rebuild', daemon=True).start()
+
+
+def _rebuild(engine):
+    global _index, _building
+    try:
+        with engine.connect() as connection:
+            index = build(connection)
+        with _build_lock:
+            _index = index
+    except Exception:
+        log.exception("Falha ao reconstruir o índice de autocomplete")
+    finally:
+        with _build_lock:
+            _building = False
+
+
+def suggest(prefix, kinds=None, limit=DEFAULT_LIMIT):
+    """Sugestões para o texto digitado: [{label, kind, count[, id]}]."""
+    return get_index().suggest(prefix, kinds, limit)
+
+
+# --------------------------
+# ATUALIZAÇÃO INCREMENTAL
+# --------------------------
+# Só gravações nos campos abaixo (e em tags/serviços/categorias) mudam a
+# versão (track_versions com columns, no topo); são as mesmas que marcam a
+# sessão, então o commit troca os perfis e registra a nova versão sem
+# reconstruir o índice.
+PROFESSIONAL_FIELDS = ('user_id', 'category_id')
+USER_FIELDS = ('name', 'neighborhood')
+
+
+def _pending(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault('autocomplete_pending', {'professionals': set(), 'users': set()})
+
+
+def _changed(target, fields):
+    state = inspect(target)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+@event.listens_for(Professional, 'after_insert')
+@event.listens_for(Professional, 'after_delete')
+def _professional_written(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None:
+        pending['professionals'].add(target.id)
+
+
+@event.listens_for(Professional, 'after_update')
+def _professional_changed(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None and _changed(target, PROFESSIONAL_FIELDS):
+        pending['professionals'].add(target.id)
+
+
+@event.listens_for(ProfessionalTag, 'after_insert')
+@event.listens_for(ProfessionalTag, 'after_update')
+@event.listens_for(ProfessionalTag, 'after_delete')
+@event.listens_for(ProfessionalService, 'after_insert')
+@event.listens_for(ProfessionalService, 'after_update')
+@event.listens_for(ProfessionalService, 'after_delete')
+def _profile_item_written(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None:
+        pending['professionals'].add(target.professional_id)
+
+
+@event.listens_for(User, 'after_update')
+def _user_changed(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None and _changed(target, USER_FIELDS):
+        pending['users'].add(target.id)
+
+
+@event.listens_for(ServiceCategory, 'after_insert')
+@event.listens_for(ServiceCategory, 'after_update')
+@event.listens_for(ServiceCategory, 'after_delete')
+def _category_written(mapper, connection, target):
+    # nome de categoria aparece em vários perfis: reconstrói (raro)
+    pending = _pending(target)
+    if pending is not None:
+        pending['rebuild'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _read_pending(session):
+    # relê os perfis marcados na própria transação, já com tudo gravado: o
+    # after_commit só aplica, sem abrir outra conexão
+    if _index is None:
+        return
+    session.flush()
+    pending = session.info.get('autocomplete_pending')
+    if not pending or pending.get('rebuild'):
+        return
+    connection = session.connection()
+    rows = None
+    if pending['professionals'] or pending['users']:
+        rows = _profile_rows(connection, pending['professionals'], pending['users'])
+    # a linha da versão já foi incrementada por esta transação (e fica
+    # travada até o commit): o valor lido aqui é o que o commit publica
+    session.info['autocomplete_ready'] = (rows, _read_version(connection))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('autocomplete_pending', None)
+    ready = session.info.pop('autocomplete_ready', None)
+    index = _index
+    if not pending or ready is None or index is None:
+        # sem leitura: índice ainda não montado, ou categoria mudou (a versão
+        # já mudou e a próxima consulta reconstrói)
+        return
+    rows, version = ready
+    if rows is not None:
+        index.update(pending['professionals'], rows)
+    # só este commit mudou algo desde o índice -> adota a versão; senão outro
+    # processo também gravou e a próxima consulta reconstrói
+    previous = index.version
+    if previous is not None and version == previous + committed_bumps(session, VERSION):
+        index.version = version
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('autocomplete_pending', None)
+    session.info.pop('autocomplete_ready', None)
@@ -0,0 +1,144 @@
+# bench_delete.py - Tempo, memória e nº de SQL para apagar contas grandes
+#
+# Monta (uma vez) um SQLite com um profissional e um cliente "pesados":
+# cada um com --requests pedidos, quase todos avaliados. Depois apaga as
+# duas contas de cada jeito, sempre partindo de uma cópia do mesmo banco:
+#
+# - orm:  session.delete(user) + cascade dos relationships (carrega cada
+#         pedido/avaliação como objeto e apaga um por um)
+# - set:  accounts.delete_accounts (DELETEs por conjunto, uma transação)
+#
+# e, com --purge N, apaga N contas de clientes comuns de uma vez (set).
+#
+#   python bench_delete.py --requests 20000
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ARGS = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000, help='pedidos de cada conta grande')
+    parser.add_argument('--purge', type=int, default=1000, help='contas comuns na exclusão em massa')
+    return parser.parse_args()
+
+
+def seed(db, n_requests, n_clients):
+    from datetime import datetime
+    from models import Professional, Review, ServiceCategory, ServiceRequest, User
+
+    connection = db.session.connection()
+    connection.execute(ServiceCategory.__table__.insert(), [{'name': 'Carga'}])
+    category_id = connection.execute(ServiceCategory.__table__.select()).first().id
+    users = [{'name': f'Usuário {i}', 'cpf': f'u{i}', 'email': f'u{i}@example.com',
+              'password_hash': 'x', 'user_type': 'professional' if i < 50 else 'client'}
+             for i in range(50 + n_clients)]
+    connection.execute(User.__table__.insert(), users)
+    connection.execute(Professional.__table__.insert(), [
+        {'user_id': i + 1, 'category_id': category_id, 'starting_price': 100} for i in range(50)
+    ])
+    # conta grande 1: o profissional 1 (user 1) atende todos os clientes
+    # conta grande 2: o cliente (user 51) pede aos 50 profissionais
+    now = datetime.utcnow()
+    requests = [{'client_id': 51 + i % n_clients, 'professional_id': 1, 'title': 'Pedido',
+                 'status': 'concluido', 'created_at': now} for i in range(n_requests)]
+    requests += [{'client_id': 51, 'professional_id': 1 + i % 50, 'title': 'Pedido',
+                  'status': 'concluido', 'created_at': now} for i in range(n_requests)]
+    connection.execute(ServiceRequest.__table__.insert(), requests)
+    rows = connection.execute(ServiceRequest.__table__.select()).all()
+    connection.execute(Review.__table__.insert(), [
+        {'request_id': r.id, 'professional_id': r.professional_id, 'client_id': r.client_id,
+         'rating': 1 + r.id % 5, 'comment': 'Comentário ' * 10, 'created_at': now}
+        for r in rows if r.id % 10
+    ])
+    db.session.commit()
+    from models import reconcile_ratings
+    reconcile_ratings()
+    db.session.commit()
+
+
+def measure(label, fn, engine):
+    import queries
+    tracemalloc.start()
+    began = time.perf_counter()
+    with queries.count_queries(engine) as counter:
+        counts = fn()
+    elapsed = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  pico {peak / 1024:9.0f} KiB  "
+          f"{counter['count']:6} SQL  {counts}")
+
+
+def main():
+    global ARGS
+    ARGS = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench-delete-')
+    path = os.path.join(workdir, 'bench.db')
+    template = path + '.template'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['DB_PROFILE'] = 'none'  # sem WAL: o banco é um arquivo só, copiável
+    os.environ.setdefault('PAGE_CACHE_BACKEND', 'none')
+
+    from app import app, db
+    from models import Professional, Review, ServiceRequest, User
+    import accounts
+    import migrations
+
+    n_clients = max(ARGS.purge + 1, 100)
+    with app.app_context():
+        migrations.upgrade()
+        seed(db, ARGS.requests, n_clients)
+        engine = db.engine
+        engine.dispose()
+    shutil.copy(path, template)
+    print(f"{ARGS.requests} pedidos por conta grande, {n_clients} clientes, "
+          f"{os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+    def fresh():
+        engine.dispose()
+        shutil.copy(template, path)
+
+    def orm_delete(user_id):
+        def run():
+            user = db.session.get(User, user_id)
+            db.session.delete(user)
+            db.session.commit()
+            return 'ok'
+        return run
+
+    def set_delete(user_ids):
+        def run():
+            counts = accounts.delete_accounts(user_ids)
+            db.session.commit()
+            return counts
+        return run
+
+    with app.app_context():
+        for label, user_id in (('profissional grande', 1), ('cliente grande', 51)):
+            for mode, fn in (('orm', orm_delete(user_id)), ('set', set_delete([user_id]))):
+                fresh()
+                measure(f"{label} ({mode})", fn, engine)
+                db.session.remove()
+                # as duas formas precisam deixar o banco igual
+                remaining = (User.query.count(), Professional.query.count(),
+                             ServiceRequest.query.count(), Review.query.count())
+                print(f"{'':34} restam usuários/perfis/pedidos/avaliações: {remaining}")
+                db.session.remove()
+
+        fresh()
+        ids = list(range(52, 52 + ARGS.purge))
+        measure(f"{len(ids)} contas (set)", set_delete(ids), engine)
+        db.session.remove()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+# benchmark.py - Benchmark das rotas com baseline e limites de regressão
+#
+# Gera (ou usa) uma massa de dados, roda cada cenário N vezes e mede
+# latência p50/p95/p99, SQL por requisição e memória alocada por
+# requisição (pico do tracemalloc, numa passada separada para não
+# distorcer o tempo). Com --save-baseline grava o resultado em JSON; sem,
+# compara com o baseline e falha (exit code 1) se algum cenário piorar
+# além dos limites.
+#
+#   python benchmark.py --save-baseline           # grava benchmarks/baseline.json
+#   python benchmark.py                           # compara com o baseline
+#   python benchmark.py --server                  # via servidor WSGI local (HTTP de verdade)
+#   DATABASE_URL=postgresql://... python benchmark.py --no-generate
+#
+# Os templates de dashboard apontam para endpoints que ainda não existem
+# (professional_profile, review_professional, update_request_status); o
+# benchmark troca esses links por "#" para que a página renderize com os
+# pedidos de verdade.
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark das rotas com baseline em JSON.')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--only', action='append', help='roda só os cenários com este trecho no nome')
+    parser.add_argument('--server', action='store_true', help='mede via servidor WSGI local em vez do test client')
+    parser.add_argument('--page-cache', action='store_true', help='mantém o cache de páginas ligado')
+    # limites de regressão
+    parser.add_argument('--latency-threshold', type=float, default=0.25, help='piora relativa tolerada no p95')
+    parser.add_argument('--latency-floor-ms', type=float, default=2.0, help='piora absoluta mínima para contar')
+    parser.add_argument('--alloc-threshold', type=float, default=0.25, help='piora relativa tolerada na memória')
+    # massa de dados
+    parser.add_argument('--no-generate', action='store_true', help='usa o banco de DATABASE_URL como está')
+    parser.add_argument('--clients', type=int, default=5_000)
+    parser.add_argument('--professionals', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+if not ARGS.no_generate and 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')
+if not ARGS.page_cache:
+    os.environ['PAGE_CACHE_BACKEND'] = 'none'  # mede as views, não o cache
+os.environ['RATELIMIT_BACKEND'] = 'none'  # todas as requisições saem do mesmo IP
+
+from sqlalchemy import func  # noqa: E402
+from werkzeug.routing import BuildError  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as app_module  # noqa: E402
+from app import app, db  # noqa: E402
+from models import Professional, ServiceRequest, User  # noqa: E402
+import queries  # noqa: E402
+import seed_bulk  # noqa: E402
+
+PASSWORD = 'senha123'
+
+
+# --------------------------
+# AMBIENTE
+# --------------------------
+def _missing_endpoint_as_hash(error, endpoint, values):
+    if isinstance(error, BuildError) and endpoint in ('professional_profile', 'review_professional',
+                                                      'update_request_status'):
+        return '#'
+    raise error
+
+
+def stub_cep_upstream():
+    """ViaCEP falso: responde na hora com um endereço de Garanhuns."""
+    def upstream(digits):
+        return {'cep': digits, 'address': 'Rua do Sol', 'neighborhood': 'Centro',
+                'city': 'Garanhuns', 'state': 'PE'}
+    app_module.cep_resolver.upstream = upstream
+
+
+def busiest(column):
+    """Id do usuário com mais pedidos (pior caso do dashboard)."""
+    return db.session.query(column).group_by(column).order_by(func.count().desc(), column).limit(1).scalar()
+
+
+def pick_users():
+    client_id = busiest(ServiceRequest.client_id)
+    prof_id = busiest(ServiceRequest.professional_id)
+    prof_user_id = db.session.get(Professional, prof_id).user_id
+    client = db.session.get(User, client_id)
+    return {'client': client_id, 'professional': prof_user_id, 'login_cpf': client.cpf}
+
+
+# --------------------------
+# CENÁRIOS
+# --------------------------
+class Scenario:
+    def __init__(self, name, method, path, login=None, form=None, expect=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.login = login      # 'client' | 'professional' | None
+        self.form = form        # função(i) -> dict, para POST
+        self.expect = expect    # status esperado (POST com sucesso = redirect)
+
+
+def scenarios(users):
+    seq = {'n': 0}
+
+    def registration(i):
+        seq['n'] += 1
+        n = 700_000_000 - seq['n']  # longe dos ids da massa gerada
+        return {
+            'name': f'Bench {n}', 'email': f'bench{n}@example.com', 'cpf': seed_bulk.cpf_for(n),
+            'password': PASSWORD, 'user_type': 'client', 'phone': '(87) 99999-0000',
+            'cep': f'5529{seq["n"] % 10000:04d}',
+        }
+
+    def login(i):
+        return {'cpf': users['login_cpf'], 'password': PASSWORD}
+
+    return [
+        Scenario('GET /', 'GET', '/'),
+        Scenario('GET /search', 'GET', '/search'),
+        Scenario('GET /search?category', 'GET', '/search?category=1'),
+        Scenario('GET /search?category+price', 'GET', '/search?category=1&min_price=50&max_price=200&sort=price'),
+        Scenario('GET /search?name', 'GET', '/search?name=pintura'),
+        Scenario('GET /search?neighborhood', 'GET', '/search?neighborhood=Heliopolis'),
+        Scenario('GET /search?sort=rating', 'GET', '/search?sort=rating'),
+        Scenario('GET /dashboard (cliente)', 'GET', '/dashboard', login='client'),
+        Scenario('GET /dashboard (profissional)', 'GET', '/dashboard', login='professional'),
+        Scenario('POST /registro', 'POST', '/registro', form=registration, expect=302),
+        Scenario('POST /login', 'POST', '/login', form=login, expect=302),
+    ]
+
+
+# --------------------------
+# EXECUÇÃO
+# --------------------------
+class TestClientDriver:
+    def __init__(self, users):
+        self.users = users
+
+    def request(self, scenario, i):
+        client = app.test_client()
+        if scenario.login:
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(self.users[scenario.login])
+                sess['_fresh'] = True
+        if scenario.method == 'POST':
+            return client.post(scenario.path, data=scenario.form(i)).status_code
+        return client.get(scenario.path).status_code
+
+
+class ServerDriver:
+    """Servidor WSGI local (werkzeug, com threads) e HTTP com keep-alive."""
+
+    def __init__(self, users):
+        self.users = users
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+        serializer = app.session_interface.get_signing_serializer(app)
+        self.cookies = {
+            kind: f"{app.config['SESSION_COOKIE_NAME']}="
+                  f"{serializer.dumps({'_user_id': str(user_id), '_fresh': True})}"
+            for kind, user_id in users.items() if kind in ('client', 'professional')
+        }
+
+    def request(self, scenario, i):
+        from urllib.parse import urlencode
+        headers = {}
+        body = None
+        if scenario.login:
+            headers['Cookie'] = self.cookies[scenario.login]
+        if scenario.method == 'POST':
+            body = urlencode(scenario.form(i))
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.conn.request(scenario.method, scenario.path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def run_scenario(driver, scenario, iterations, warmup, engine):
+    for i in range(warmup):
+        driver.request(scenario, i)
+
+    latencies, query_counts, statuses = [], [], set()
+    for i in range(iterations):
+        with queries.count_queries(engine) as counter:
+            began = time.perf_counter()
+            statuses.add(driver.request(scenario, i))
+            latencies.append((time.perf_counter() - began) * 1000)
+        query_counts.append(counter['count'])
+
+    # memória: passada separada, com tracemalloc ligado
+    allocs = []
+    tracemalloc.start()
+    try:
+        for i in range(max(3, iterations // 10)):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            driver.request(scenario, i)
+            allocs.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    unexpected = sorted(s for s in statuses if s != scenario.expect)
+    return {
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries': statistics.median(query_counts),
+        'alloc_kb': round(statistics.median(allocs) / 1024, 1),
+        'unexpected_status': unexpected,
+    }
+
+
+def compare(name, current, base, args):
+    """Lista de regressões do cenário em relação ao baseline."""
+    problems = []
+    delta = current['p95_ms'] - base['p95_ms']
+    if delta > args.latency_floor_ms and current['p95_ms'] > base['p95_ms'] * (1 + args.latency_threshold):
+        problems.append(f"p95 {base['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+    if current['queries'] > base['queries']:
+        problems.append(f"queries {base['queries']} -> {current['queries']}")
+    if current['alloc_kb'] > base['alloc_kb'] * (1 + args.alloc_threshold):
+        problems.append(f"memória {base['alloc_kb']:.0f} -> {current['alloc_kb']:.0f} KiB")
+    return problems
+
+
+def main(args):
+    app.url_build_error_handlers.append(_missing_endpoint_as_hash)
+    stub_cep_upstream()
+
+    with app.app_context():
+        if not args.no_generate:
+            seed_bulk.generate(args.clients, args.professionals, args.requests,
+                               seed=args.seed, password=PASSWORD)
+        users = pick_users()
+        engine = db.engine
+        dataset = {
+            'users': db.session.query(func.count(User.id)).scalar(),
+            'professionals': db.session.query(func.count(Professional.id)).scalar(),
+            'requests': db.session.query(func.count(ServiceRequest.id)).scalar(),
+        }
+        db.session.remove()
+
+    driver = ServerDriver(users) if args.server else TestClientDriver(users)
+    results = {}
+    try:
+        for scenario in scenarios(users):
+            if args.only and not any(part in scenario.name for part in args.only):
+                continue
+            results[scenario.name] = run_scenario(driver, scenario, args.iterations, args.warmup, engine)
+    finally:
+        if args.server:
+            driver.close()
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failed = False
+    print(f"\n{'cenário':34} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5} {'KiB':>8}")
+    for name, r in results.items():
+        line = (f"{name:34} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+                f"{r['queries']:5g} {r['alloc_kb']:8.0f}")
+        base = (baseline or {}).get('routes', {}).get(name)
+        if r['unexpected_status']:
+            failed = True
+            line += f"  FALHOU: status inesperado {r['unexpected_status']}"
+        elif base:
+            problems = compare(name, r, base, args)
+            if problems:
+                failed = True
+                line += '  FALHOU: ' + '; '.join(problems)
+        print(line)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'meta': {
+                    'mode': 'server' if args.server else 'test_client',
+                    'iterations': args.iterations,
+                    'dataset': dataset,
+                    'python': platform.python_version(),
+                    'database': engine.url.get_backend_name(),
+                    'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                },
+                'routes': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline gravado em {args.baseline}")
+    elif baseline is None:
+        print(f"\nSem baseline em {args.baseline} (use --save-baseline).")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(ARGS))
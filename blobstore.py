@@ -0,0 +1,103 @@
+# blobstore.py - Armazenamento de arquivos endereçado por conteúdo
+#
+# Cada arquivo é gravado em <root>/<aa>/<bb>/<sha256> e identificado pelo
+# próprio hash: o mesmo conteúdo enviado duas vezes ocupa espaço uma vez só,
+# e a URL /media/<hash> nunca muda de conteúdo (pode ser cacheada para sempre).
+import hashlib
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# assinaturas dos formatos de imagem aceitos
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class BlobError(Exception):
+    """Arquivo recusado pelo blob store (tamanho ou formato)."""
+
+
+def sniff_image_type(head):
+    """Content-type pela assinatura dos primeiros bytes, ou None."""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return None
+
+
+def is_valid_hash(value):
+    return bool(value) and bool(HASH_RE.match(value))
+
+
+class LocalBlobStore:
+    """Backend em disco local."""
+
+    def __init__(self, root, max_size=8 * 1024 * 1024):
+        self.root = root
+        self.max_size = max_size
+
+    def path(self, blob_hash):
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def exists(self, blob_hash):
+        return is_valid_hash(blob_hash) and os.path.exists(self.path(blob_hash))
+
+    def save(self, stream, images_only=True):
+        """Grava o stream em blocos, calculando o hash no caminho.
+
+        Nunca carrega o arquivo inteiro em memória. Retorna o hash sha256.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise BlobError('Arquivo maior que o permitido.')
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            if size == 0:
+                raise BlobError('Arquivo vazio.')
+            if images_only and sniff_image_type(head) is None:
+                raise BlobError('Formato de imagem não suportado.')
+
+            blob_hash = digest.hexdigest()
+            final = self.path(blob_hash)
+            if os.path.exists(final):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(tmp_path, final)
+            return blob_hash
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def content_type(self, blob_hash):
+        with open(self.path(blob_hash), 'rb') as f:
+            return sniff_image_type(f.read(16)) or 'application/octet-stream'
+
+    def delete(self, blob_hash):
+        if self.exists(blob_hash):
+            os.remove(self.path(blob_hash))
@@ -0,0 +1,254 @@
+# cache.py - Caches em processo
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU com expiração por item, seguro para uso entre threads.
+
+    `get` devolve `default` quando a chave não existe ou já expirou; o item
+    menos usado é descartado quando `maxsize` é atingido.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --------------------------
+# VERSÕES DE DADOS
+# --------------------------
+# Cada conjunto de dados cacheável tem um nome ("categories", ...) e um
+# contador na tabela cache_versions. Gravações nos models rastreados
+# incrementam o contador na mesma transação (after_flush), então todos os
+# processos percebem a mudança na próxima checagem de versão.
+_tracked = {}                 # Model -> {nome de versão: colunas ou None}
+_tracked_changes = {}         # idem, só para UPDATE/DELETE
+_local_generation = {}        # nome -> nº de commits deste processo que o alteraram
+_local_lock = threading.Lock()
+
+
+def track_versions(model, *names, inserts=True, columns=None):
+    """Gravações em `model` passam a incrementar as versões `names`.
+
+    Com inserts=False só alterações e exclusões contam (linhas novas não
+    mudam nada que já esteja em cache, ex.: o cadastro de outro usuário).
+    Com `columns`, um UPDATE só conta se mudar uma dessas colunas (ex.: o
+    que aparece nos cards; o rehash da senha no login não invalida nada).
+    """
+    target = (_tracked if inserts else _tracked_changes).setdefault(model, {})
+    for name in names:
+        if name in target:
+            previous = target[name]
+            target[name] = None if previous is None or columns is None else previous | frozenset(columns)
+        else:
+            target[name] = None if columns is None else frozenset(columns)
+
+
+def _names_for(obj, *registries, updated=False):
+    names = set()
+    for registry in registries:
+        for model, model_names in registry.items():
+            if not isinstance(obj, model):
+                continue
+            for name, columns in model_names.items():
+                if not updated or columns is None or _columns_changed(obj, columns):
+                    names.add(name)
+    return names
+
+
+def _columns_changed(obj, columns):
+    attrs = inspect(obj).attrs
+    return any(attrs[column].history.has_changes() for column in columns)
+
+
+def versions_for(*models, columns=None):
+    """Nomes de versão que gravações (de qualquer tipo) nos models afetam.
+
+    Com `columns`, só os que contam um UPDATE dessas colunas (ver track_versions).
+    """
+    names = set()
+    for registry in (_tracked, _tracked_changes):
+        for model, model_names in registry.items():
+            if not any(issubclass(m, model) for m in models):
+                continue
+            for name, tracked in model_names.items():
+                if columns is None or tracked is None or tracked & set(columns):
+                    names.add(name)
+    return names
+
+
+def bump_session_versions(session, names):
+    """bump_versions na transação da sessão; vale para este processo no commit.
+
+    Para gravações em massa (Core/query.delete) que não passam pelo flush.
+    """
+    if not names:
+        return
+    bump_versions(session.connection(), names)
+    session.info.setdefault('bumped_versions', set()).update(names)
+    counts = session.info.setdefault('bump_counts', {})
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+
+
+def bump_versions(connection, names):
+    """Incrementa as versões na transação de `connection` (cria se não existir)."""
+    from models import CacheVersion
+    table = CacheVersion.__table__
+    for name in names:
+        result = connection.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+
+
+def read_version(name):
+    """Versão atual no banco, lida fora da transação da sessão."""
+    from database import db
+    from models import CacheVersion
+    with db.engine.connect() as connection:
+        return connection.execute(
+            select(CacheVersion.version).where(CacheVersion.name == name)
+        ).scalar() or 0
+
+
+def committed_bumps(session, name):
+    """Quantas vezes o último commit da sessão incrementou `name`.
+
+    Válido nos listeners after_commit registrados depois deste módulo (quem
+    importa cache.py): com isso dá para saber se a versão nova no banco é
+    só deste commit (anterior + bumps) ou se outro processo também mudou.
+    """
+    return session.info.get('committed_bumps', {}).get(name, 0)
+
+
+def local_generation(name):
+    with _local_lock:
+        return _local_generation.get(name, 0)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_tracked_versions(session, flush_context):
+    names = set()
+    for obj in session.new:
+        names |= _names_for(obj, _tracked)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            names |= _names_for(obj, _tracked, _tracked_changes, updated=True)
+    for obj in session.deleted:
+        names |= _names_for(obj, _tracked, _tracked_changes)
+    bump_session_versions(session, names)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_local_bumps(session):
+    names = session.info.pop('bumped_versions', None)
+    session.info['committed_bumps'] = session.info.pop('bump_counts', {})
+    if names:
+        with _local_lock:
+            for name in names:
+                _local_generation[name] = _local_generation.get(name, 0) + 1
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_local_bumps(session):
+    session.info.pop('bumped_versions', None)
+    session.info.pop('bump_counts', None)
+
+
+_version_seen = {}  # nome -> (checado_em, versão, geração local)
+
+
+def current_version(name, check_interval=2.0):
+    """Versão de `name`, relida do banco no máximo a cada `check_interval` s.
+
+    Commits deste processo que alteraram `name` forçam a releitura na hora.
+    Retorna None se a tabela não existir (o chamador não deve cachear).
+    """
+    now = time.monotonic()
+    generation = local_generation(name)
+    with _local_lock:
+        seen = _version_seen.get(name)
+    if seen and seen[2] == generation and now - seen[0] < check_interval:
+        return seen[1]
+    try:
+        version = read_version(name)
+    except Exception:
+        return None
+    with _local_lock:
+        _version_seen[name] = (now, version, generation)
+    return version
+
+
+class VersionedCache:
+    """Cache read-through de um valor inteiro, invalidado por versão.
+
+    `loader()` monta o valor (deve devolver objetos desligados da sessão,
+    ex.: tuplas). A versão no banco é consultada no máximo a cada
+    `check_interval` segundos; mudanças feitas neste processo valem na hora.
+    """
+
+    def __init__(self, name, loader, check_interval=2.0):
+        self.name = name
+        self.loader = loader
+        self.check_interval = check_interval
+        self._value = _MISSING
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = current_version(self.name, self.check_interval)
+        with self._lock:
+            # version None = tabela ausente: recarrega sempre
+            if version is None or self._value is _MISSING or version != self._version:
+                self._value = self.loader()
+                self._version = version
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = _MISSING
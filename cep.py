@@ -0,0 +1,227 @@
+# cep.py - Resolução de CEP em camadas
+#
+# Ordem de consulta (a primeira que responder encerra):
+#   1. faixas offline (data/cep_garanhuns.csv): CEP fora de todas as faixas
+#      é recusado sem rede; faixa com bairro/logradouro responde direto
+#   2. LRU em processo com TTL (positivos e negativos)
+#   3. tabela cep_cache no banco (positivos e negativos, com validade)
+#   4. upstream plugável (ViaCEP por padrão) - o resultado alimenta 2 e 3
+#
+# A tabela cep_cache é lida e gravada numa sessão própria (Session(db.engine)),
+# nunca na db.session da requisição: a validação roda no meio de views e não
+# pode fazer commit nem rollback do que a view tem pendente.
+import bisect
+import csv
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import db
+from http_client import HttpClientError, default_client
+from models import CepCache
+
+
+class CepUpstreamError(Exception):
+    """Falha de transporte no upstream (timeout, 5xx, JSON inválido)."""
+
+
+# --------------------------
+# UPSTREAM
+# --------------------------
+class ViaCepUpstream:
+    """Consulta o ViaCEP. Retorna dict normalizado, None se o CEP não existe.
+
+    Usa o cliente HTTP compartilhado (pool, timeouts curtos e circuit breaker,
+    ver http_client.py); com o circuito aberto falha na hora.
+    """
+
+    def __init__(self, base_url="https://viacep.com.br/ws", client=None):
+        self.base_url = base_url.rstrip('/')
+        self.client = client or default_client
+
+    def __call__(self, cep_digits):
+        try:
+            r = self.client.get(f"{self.base_url}/{cep_digits}/json/")
+        except HttpClientError as e:
+            raise CepUpstreamError(str(e)) from e
+        if r.status_code == 400:
+            return None
+        if not r.ok:
+            raise CepUpstreamError(f"HTTP {r.status_code}")
+        try:
+            data = r.json()
+        except ValueError as e:
+            raise CepUpstreamError("resposta inválida") from e
+        if 'erro' in data:
+            return None
+        return {
+            'cep': cep_digits,
+            'address': data.get('logradouro', '') or '',
+            'neighborhood': data.get('bairro', '') or '',
+            'city': data.get('localidade', '') or '',
+            'state': data.get('uf', '') or ''
+        }
+
+
+# --------------------------
+# FAIXAS OFFLINE
+# --------------------------
+class CepRanges:
+    """Faixas de CEP conhecidas localmente, com busca por bisect."""
+
+    def __init__(self, rows=()):
+        self._rows = sorted(rows, key=lambda r: r['cep_start'])
+        self._starts = [r['cep_start'] for r in self._rows]
+
+    @classmethod
+    def load(cls, path):
+        rows = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                rows.append({
+                    'cep_start': row['cep_start'].strip(),
+                    'cep_end': (row.get('cep_end') or row['cep_start']).strip(),
+                    'city': (row.get('city') or '').strip(),
+                    'state': (row.get('state') or '').strip(),
+                    'neighborhood': (row.get('neighborhood') or '').strip(),
+                    'address': (row.get('address') or '').strip(),
+                })
+        return cls(rows)
+
+    def find(self, cep_digits):
+        """Faixa mais específica que contém o CEP, ou None."""
+        i = bisect.bisect_right(self._starts, cep_digits)
+        best = None
+        # faixas podem se sobrepor (uma rua dentro da faixa da cidade)
+        for row in reversed(self._rows[:i]):
+            if row['cep_end'] >= cep_digits:
+                if best is None or row['cep_end'] < best['cep_end']:
+                    best = row
+        return best
+
+    def __len__(self):
+        return len(self._rows)
+
+
+# --------------------------
+# RESOLVER
+# --------------------------
+def normalize_cep(cep):
+    digits = re.sub(r'\D', '', cep or '')
+    return digits if len(digits) == 8 else None
+
+
+class CepResolver:
+    POSITIVE_TTL = timedelta(days=30)
+    NEGATIVE_TTL = timedelta(days=1)
+
+    def __init__(self, upstream=None, ranges=None, memory=None, offline_fallback=True):
+        self.upstream = upstream or ViaCepUpstream()
+        self.ranges = ranges
+        self.memory = memory or TTLCache(maxsize=4096, ttl=3600)
+        # com o upstream fora do ar, aceita o CEP com cidade/UF da faixa
+        self.offline_fallback = offline_fallback
+
+    def resolve(self, cep):
+        """Dict {'cep', 'address', 'neighborhood', 'city', 'state'} ou None."""
+        digits = normalize_cep(cep)
+        if not digits:
+            return None
+
+        rng = self.ranges.find(digits) if self.ranges is not None else None
+        if self.ranges is not None and rng is None:
+            return None
+        if rng and rng['neighborhood']:
+            return self._from_range(digits, rng)
+
+        hit = self.memory.get(digits, False)
+        if hit is not False:
+            return hit
+
+        stored, fresh = self._load(digits)
+        if fresh:
+            self.memory.set(digits, stored)
+            return stored
+
+        try:
+            data = self.upstream(digits)
+        except CepUpstreamError:
+            # upstream indisponível: serve o que houver, mesmo vencido
+            if stored is not False:
+                return stored
+            if rng and self.offline_fallback:
+                return self._from_range(digits, rng)
+            return None
+
+        if data and rng and (data['city'] != rng['city'] or data['state'] != rng['state']):
+            data = None
+        self._store(digits, data)
+        self.memory.set(digits, data)
+        return data
+
+    @staticmethod
+    def _from_range(digits, rng):
+        return {
+            'cep': digits,
+            'address': rng['address'],
+            'neighborhood': rng['neighborhood'],
+            'city': rng['city'],
+            'state': rng['state']
+        }
+
+    def _load(self, digits):
+        """(resultado salvo, ainda_válido); resultado é dict, None ou False se não houver."""
+        try:
+            with Session(db.engine) as session:
+                row = session.get(CepCache, digits)
+                if row is None:
+                    return False, False
+                ttl = self.POSITIVE_TTL if row.found else self.NEGATIVE_TTL
+                fresh = row.fetched_at is not None and row.fetched_at + ttl >= datetime.utcnow()
+                return (row.as_dict() if row.found else None), fresh
+        except Exception:
+            return False, False
+
+    def _store(self, digits, data):
+        data = data or {}
+        try:
+            with Session(db.engine) as session, session.begin():
+                session.merge(CepCache(
+                    cep=digits,
+                    found=bool(data),
+                    address=data.get('address'),
+                    neighborhood=data.get('neighborhood'),
+                    city=data.get('city'),
+                    state=data.get('state'),
+                    fetched_at=datetime.utcnow()
+                ))
+        except Exception:
+            # cache é opcional: falha ao gravar não impede a validação
+            pass
+
+
+def import_ceps(path):
+    """Grava no cep_cache os CEPs de um CSV (cep,address,neighborhood,city,state).
+
+    Retorna quantos foram importados. Não faz commit.
+    """
+    count = 0
+    now = datetime.utcnow()
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            digits = normalize_cep(row.get('cep'))
+            if not digits:
+                continue
+            db.session.merge(CepCache(
+                cep=digits,
+                found=True,
+                address=(row.get('address') or '').strip(),
+                neighborhood=(row.get('neighborhood') or '').strip(),
+                city=(row.get('city') or '').strip(),
+                state=(row.get('state') or '').strip(),
+                fetched_at=now
+            ))
+            count += 1
+    return count
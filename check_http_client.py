@@ -0,0 +1,126 @@
+# check_http_client.py - Verifica o circuit breaker e o prazo do http_client
+#
+# - com o breaker em half-open, uma chamada recusada pelo limite de
+#   concorrência ou interrompida por uma exceção que não é de rede não pode
+#   prender a vaga de teste: a chamada seguinte precisa chegar ao host;
+# - com o host esgotando todos os timeouts, a soma deles não passa do
+#   `deadline` do cliente.
+# Não usa rede (session.request é substituído). Falha (exit code 1) se algum
+# caso não se comportar assim.
+#
+#   python check_http_client.py
+import sys
+
+import types
+
+import requests
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, ConcurrencyLimitError, HttpClient, HttpClientError
+
+URL = "http://upstream.test/ws"
+HOST = "upstream.test"
+
+
+class FakeResponse:
+    status_code = 200
+
+
+def half_open_client():
+    """Cliente com 1 vaga por host e o breaker do host já em half-open."""
+    client = HttpClient(max_per_host=1, failure_threshold=1, reset_timeout=0, acquire_timeout=0.01)
+    client.session.request = lambda *args, **kwargs: FakeResponse()
+    breaker = client.breaker(HOST)
+    breaker.record_failure()
+    return client, breaker
+
+
+def check_concurrency_limit():
+    client, breaker = half_open_client()
+    semaphore = client._host(HOST)["semaphore"]
+    semaphore.acquire()
+    try:
+        client.get(URL)
+    except ConcurrencyLimitError:
+        pass
+    else:
+        return ["chamada passou com o limite de concorrência lotado"]
+    finally:
+        semaphore.release()
+    return _reaches_host(client, breaker)
+
+
+def check_local_exception():
+    client, breaker = half_open_client()
+
+    def broken(*args, **kwargs):
+        raise ValueError("erro local")
+
+    client.session.request = broken
+    try:
+        client.get(URL)
+    except ValueError:
+        pass
+    client.session.request = lambda *args, **kwargs: FakeResponse()
+    return _reaches_host(client, breaker)
+
+
+def _reaches_host(client, breaker):
+    if breaker.state != CircuitBreaker.HALF_OPEN:
+        return [f"breaker deveria seguir em half-open, está {breaker.state}"]
+    try:
+        client.get(URL)
+    except CircuitOpenError:
+        return ["vaga de teste do half-open ficou presa: breaker aberto de vez"]
+    if breaker.state != CircuitBreaker.CLOSED:
+        return [f"sucesso não fechou o breaker ({breaker.state})"]
+    return []
+
+
+def check_deadline():
+    # relógio falso: cada tentativa "demora" o timeout inteiro que recebeu
+    clock = [0.0]
+    fake_time = types.SimpleNamespace(monotonic=lambda: clock[0], perf_counter=lambda: clock[0])
+    client = HttpClient()
+    granted = []
+
+    def slow(*args, timeout, **kwargs):
+        granted.append(timeout)
+        clock[0] += sum(timeout)
+        raise requests.Timeout("lento")
+
+    client.session.request = slow
+    real_time, http_client.time = http_client.time, fake_time
+    try:
+        client.get(URL)
+    except HttpClientError:
+        pass
+    finally:
+        http_client.time = real_time
+    if clock[0] > client.deadline + 1e-6:
+        return [f"tentativas somam {clock[0]:.2f}s, acima do prazo de {client.deadline}s: {granted}"]
+    if len(granted) != len(client.timeouts):
+        return [f"esperava {len(client.timeouts)} tentativas dentro do prazo, houve {len(granted)}"]
+    return []
+
+
+CHECKS = {
+    "half-open + limite de concorrência": check_concurrency_limit,
+    "half-open + exceção local": check_local_exception,
+    "timeouts dentro do prazo total": check_deadline,
+}
+
+
+def main():
+    failed = False
+    for name, check in CHECKS.items():
+        problems = check()
+        failed = failed or bool(problems)
+        print(f"{'FALHOU' if problems else 'ok':7} {name}")
+        for problem in problems:
+            print(f"        {problem}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
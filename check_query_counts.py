@@ -0,0 +1,133 @@
+# check_query_counts.py - Verifica se o nº de SQL por rota cresce com o nº de resultados
+#
+# Roda as rotas contra um banco SQLite em memória com duas massas de dados
+# (pequena e grande) e falha (exit code 1) se alguma rota emitir mais
+# statements na massa grande - sinal de N+1 por lazy load.
+#
+#   python check_query_counts.py
+import os
+import sys
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["PAGE_CACHE_BACKEND"] = "none"  # mede a view, não o cache de páginas
+
+from app import app, db  # noqa: E402
+from models import User, Professional, ServiceCategory, ServiceRequest  # noqa: E402
+import cache  # noqa: E402
+import profile_data  # noqa: E402
+import queries  # noqa: E402
+
+SMALL = 3
+LARGE = 30
+
+
+def seed(n):
+    db.drop_all()
+    db.create_all()
+
+    categories = [ServiceCategory(name=f"Categoria {i}") for i in range(3)]
+    db.session.add_all(categories)
+
+    client = User(name="Cliente", cpf="000.000.000-00", email="cliente@example.com",
+                  password_hash="x", user_type="client", city="Garanhuns", state="PE")
+    db.session.add(client)
+    db.session.flush()
+
+    first_prof = None
+    for i in range(n):
+        user = User(name=f"Profissional {i}", cpf=f"p{i}", email=f"p{i}@example.com",
+                    password_hash="x", user_type="professional",
+                    neighborhood="Centro", city="Garanhuns", state="PE")
+        db.session.add(user)
+        db.session.flush()
+        prof = Professional(user_id=user.id, category_id=categories[i % 3].id,
+                            starting_price=50 + i)
+        profile_data.set_services(prof, ["Instalação", f"Serviço {i}"])
+        profile_data.set_tags(prof, f"rápido, tag {i}")
+        db.session.add(prof)
+        db.session.flush()
+        first_prof = first_prof or prof
+        db.session.add(ServiceRequest(client_id=client.id, professional_id=prof.id,
+                                      title=f"Pedido {i}"))
+        # pedidos recebidos pelo primeiro profissional, de clientes distintos
+        other = User(name=f"Cliente {i}", cpf=f"c{i}", email=f"c{i}@example.com",
+                     password_hash="x", user_type="client")
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(ServiceRequest(client_id=other.id, professional_id=first_prof.id,
+                                      title=f"Pedido recebido {i}"))
+
+    db.session.commit()
+    return client.id, first_prof.id, first_prof.user_id
+
+
+def count_route(path, user_id=None):
+    client = app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+    # estado de cache igual nas duas massas: toda medição parte do zero
+    cache._version_seen.clear()
+    queries.categories_cache.invalidate()
+    with queries.count_queries() as counter:
+        resp = client.get(path)
+    if resp.status_code != 200:
+        raise RuntimeError(f"{path} respondeu {resp.status_code}")
+    return counter["count"]
+
+
+def count_dashboard_client(client_id):
+    # Os templates de dashboard apontam para endpoints que ainda não existem
+    # (professional_profile, update_request_status), então a página não
+    # renderiza com pedidos; aqui se acessa o que o template acessa.
+    db.session.expunge_all()
+    with queries.count_queries() as counter:
+        for req in queries.client_dashboard_requests(client_id).all():
+            (req.professional.user.name, req.professional.category.name)
+    return counter["count"]
+
+
+def count_dashboard_professional(prof_user_id):
+    db.session.expunge_all()
+    with queries.count_queries() as counter:
+        prof = queries.professional_for_user(prof_user_id)
+        prof.category.name
+        for req in queries.professional_dashboard_requests(prof.id).all():
+            req.client.name
+    return counter["count"]
+
+
+CHECKS = {
+    "/": lambda ids: count_route("/"),
+    "/search": lambda ids: count_route("/search"),
+    "/categorias/1": lambda ids: count_route("/categorias/1"),
+    "/search?category=1&min_price=10": lambda ids: count_route("/search?category=1&min_price=10"),
+    "/search?name=Prof&neighborhood=Centro": lambda ids: count_route("/search?name=Prof&neighborhood=Centro"),
+    "/search?service=Instalação&tag=rápido": lambda ids: count_route("/search?service=Instalação&tag=rápido"),
+    "dashboard (cliente)": lambda ids: count_dashboard_client(ids[0]),
+    "dashboard (profissional)": lambda ids: count_dashboard_professional(ids[2]),
+}
+
+
+def main():
+    results = {}
+    with app.app_context():
+        for size in (SMALL, LARGE):
+            ids = seed(size)
+            for name, check in CHECKS.items():
+                results.setdefault(name, []).append(check(ids))
+
+    failed = False
+    for name, (small, large) in results.items():
+        status = "ok"
+        if large > small:
+            status = "FALHOU"
+            failed = True
+        print(f"{status:7} {name:45} {small:3} queries (n={SMALL})  {large:3} queries (n={LARGE})")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
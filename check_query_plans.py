@@ -0,0 +1,139 @@
+# check_query_plans.py - Verifica se as consultas quentes usam os índices
+#
+# Aplica as migrações num SQLite em memória, popula uma massa de dados,
+# roda ANALYZE e confere o EXPLAIN QUERY PLAN de cada consulta: falha
+# (exit code 1) se a tabela principal for lida por varredura completa
+# (SCAN sem índice), pelo índice errado, ou se a ordenação precisar de
+# uma B-tree temporária onde o índice já devia entregar a ordem.
+#
+#   python check_query_plans.py
+import os
+import sys
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["PAGE_CACHE_BACKEND"] = "none"
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import User, Professional, ServiceCategory, ServiceRequest, Review  # noqa: E402
+import migrations  # noqa: E402
+import profile_data  # noqa: E402
+import queries  # noqa: E402
+
+N_PROFESSIONALS = 200
+
+
+def seed():
+    migrations.upgrade()
+    categories = [ServiceCategory(name=f"Categoria {i}") for i in range(10)]
+    db.session.add_all(categories)
+    db.session.flush()
+
+    clients = []
+    for i in range(N_PROFESSIONALS):
+        clients.append(User(name=f"Cliente {i}", cpf=f"c{i}", email=f"c{i}@example.com",
+                            password_hash="x", user_type="client"))
+    db.session.add_all(clients)
+    db.session.flush()
+
+    for i in range(N_PROFESSIONALS):
+        user = User(name=f"Profissional {i}", cpf=f"p{i}", email=f"p{i}@example.com",
+                    password_hash="x", user_type="professional", neighborhood="Centro")
+        db.session.add(user)
+        db.session.flush()
+        prof = Professional(user_id=user.id, category_id=categories[i % 10].id,
+                            starting_price=50 + i)
+        profile_data.set_services(prof, [f"Serviço {i % 25}", f"Serviço {(i + 7) % 25}"])
+        profile_data.set_tags(prof, f"tag {i % 30}, tag {(i + 11) % 30}")
+        db.session.add(prof)
+        db.session.flush()
+        for client in clients[i % 7::37]:
+            req = ServiceRequest(client_id=client.id, professional_id=prof.id, title="Pedido")
+            db.session.add(req)
+            db.session.flush()
+            db.session.add(Review(request_id=req.id, professional_id=prof.id,
+                                  client_id=client.id, rating=1 + i % 5))
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+def explain(query):
+    statement = getattr(query, "statement", query)
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return [row[-1] for row in rows]
+
+
+# nome -> (consulta, tabela, índice esperado, ordem vem do índice?)
+CHECKS = {
+    "dashboard (profissional)": (
+        lambda: queries.professional_dashboard_requests(1),
+        "service_requests", "ix_service_requests_professional_created", True,
+    ),
+    "dashboard (cliente)": (
+        lambda: queries.client_dashboard_requests(1),
+        "service_requests", "ix_service_requests_client_created", True,
+    ),
+    "busca por categoria + preço": (
+        lambda: queries.search_query(
+            queries.parse_search_filters({"category": "3", "min_price": "60", "max_price": "120"}),
+            "price",
+        )[0],
+        "professionals", "ix_professionals_category_price", False,
+    ),
+    "busca por serviço": (
+        lambda: queries.search_query(queries.parse_search_filters({"service": "Serviço 3"}), "relevance")[0],
+        "professional_services", "ix_professional_services_key", False,
+    ),
+    "busca por tag": (
+        lambda: queries.search_query(queries.parse_search_filters({"tag": "Tag 4"}), "relevance")[0],
+        "professional_tags", "ix_professional_tags_tag", False,
+    ),
+    "avaliações do profissional": (
+        lambda: Review.query.filter(Review.professional_id == 1).order_by(Review.created_at.desc()),
+        "reviews", "ix_reviews_professional_created", True,
+    ),
+    "avaliações do cliente": (
+        lambda: Review.query.filter(Review.client_id == 1),
+        "reviews", "ix_reviews_client", False,
+    ),
+}
+
+
+def check(plan, table, index, ordered):
+    """Lista de problemas encontrados no plano (vazia = ok)."""
+    problems = []
+    lines = [line for line in plan if f" {table} " in f" {line} "]
+    if not lines:
+        return [f"{table} não aparece no plano"]
+    for line in lines:
+        if line.startswith("SCAN") and "INDEX" not in line:
+            problems.append(f"varredura completa: {line}")
+        elif index not in line:
+            problems.append(f"índice inesperado: {line}")
+    if ordered and any("TEMP B-TREE FOR ORDER BY" in line for line in plan):
+        problems.append("ordenação fora do índice (TEMP B-TREE)")
+    return problems
+
+
+def main():
+    failed = False
+    with app.app_context():
+        seed()
+        for name, (build, table, index, ordered) in CHECKS.items():
+            plan = explain(build())
+            problems = check(plan, table, index, ordered)
+            failed = failed or bool(problems)
+            print(f"{'FALHOU' if problems else 'ok':7} {name}")
+            for problem in problems:
+                print(f"        {problem}")
+            if problems:
+                for line in plan:
+                    print(f"          | {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# check_ratelimit.py - Verifica o limite de requisições por IP atrás do proxy
+#
+# - dois clientes com X-Forwarded-For diferentes (mesmo IP de proxy) têm
+#   baldes separados no login: esgotar um não barra o outro;
+# - uma requisição barrada por uma regra não gasta as fichas das demais.
+# Falha (exit code 1) se algum caso não se comportar assim.
+#
+#   python check_ratelimit.py
+import os
+import sys
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["PAGE_CACHE_BACKEND"] = "none"
+os.environ["RATELIMIT_BACKEND"] = "memory"
+os.environ["PROXY_FIX_X_FOR"] = "1"
+
+from app import LOGIN_LIMITS, app, db, limiter  # noqa: E402
+from ratelimit import MemoryStore, RateLimiter, TokenBucket  # noqa: E402
+
+PROXY_ADDR = "10.0.0.1"
+
+
+def login_status(client, forwarded_for):
+    resp = client.post(
+        "/login", data={"cpf": "", "password": "x"},
+        headers={"X-Forwarded-For": forwarded_for},
+        environ_base={"REMOTE_ADDR": PROXY_ADDR},
+    )
+    return resp.status_code
+
+
+def check_separate_buckets():
+    limiter.store.clear()
+    client = app.test_client()
+    burst = LOGIN_LIMITS[0].burst
+    first = [login_status(client, "203.0.113.10") for _ in range(burst + 1)]
+    other = login_status(client, "203.0.113.20")
+    problems = []
+    if 429 in first[:burst]:
+        problems.append(f"cliente A barrado antes de {burst} tentativas: {first}")
+    if first[-1] != 429:
+        problems.append(f"cliente A não foi barrado após {burst} tentativas: {first}")
+    if other == 429:
+        problems.append("cliente B barrado pelo balde do cliente A (IP do proxy compartilhado)")
+    return problems
+
+
+def check_no_consume_on_deny():
+    store = MemoryStore()
+    limiter_ = RateLimiter(store=store)
+    wide = TokenBucket("wide", rate=1e-6, burst=2, key=lambda: "k")
+    narrow = TokenBucket("narrow", rate=1e-6, burst=1, key=lambda: "k")
+    problems = []
+    if limiter_.check((wide, narrow)):
+        problems.append("primeira requisição barrada")
+    if not limiter_.check((wide, narrow)):
+        problems.append("segunda requisição passou pela regra estreita")
+    # a negada acima não pode ter gastado a segunda ficha da regra larga
+    if limiter_.check((wide,)):
+        problems.append("a requisição barrada gastou ficha da outra regra")
+    return problems
+
+
+CHECKS = {
+    "X-Forwarded-For diferentes, baldes separados": check_separate_buckets,
+    "regra que barra não gasta as demais": check_no_consume_on_deny,
+}
+
+
+def main():
+    failed = False
+    with app.app_context():
+        db.create_all()
+        for name, check in CHECKS.items():
+            problems = check()
+            failed = failed or bool(problems)
+            print(f"{'FALHOU' if problems else 'ok':7} {name}")
+            for problem in problems:
+                print(f"        {problem}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,126 @@
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
\ No newline at end of file
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+db = SQLAlchemy()
+
+
+# --------------------------
+# PERFIS DE ENGINE
+# --------------------------
+# DB_PROFILE escolhe a configuração da engine:
+#   auto   - sqlite para URLs sqlite://, server para as demais (padrão)
+#   sqlite - WAL, synchronous=NORMAL, mmap, busy_timeout e foreign_keys em
+#            cada conexão
+#   server - pool dimensionado, pre-ping, recycle e timeout de statement
+#   none   - padrões do SQLAlchemy (só para comparação no teste de carga)
+PROFILES = ('auto', 'sqlite', 'server', 'none')
+
+SQLITE_DEFAULTS = {
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_CACHE_SIZE_KB': 16 * 1024,
+}
+
+SERVER_DEFAULTS = {
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 10,
+    'DB_POOL_RECYCLE': 300,
+    'DB_STATEMENT_TIMEOUT_MS': 5000,
+}
+
+
+def normalize_uri(uri):
+    """postgres:// (Heroku/Replit) -> postgresql://, que o SQLAlchemy 2 exige."""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def resolve_profile(uri, requested='auto'):
+    requested = (requested or 'auto').lower()
+    if requested not in PROFILES:
+        raise ValueError(f"DB_PROFILE inválido: {requested!r} (use {', '.join(PROFILES)})")
+    is_sqlite = make_url(uri).get_backend_name() == 'sqlite'
+    if requested == 'auto':
+        return 'sqlite' if is_sqlite else 'server'
+    if requested == 'sqlite' and not is_sqlite:
+        raise ValueError("DB_PROFILE=sqlite exige uma DATABASE_URL sqlite://")
+    return requested
+
+
+def _setting(env, defaults, name):
+    value = env.get(name)
+    default = defaults[name]
+    if value in (None, ''):
+        return default
+    return type(default)(value)
+
+
+def engine_options(uri, env):
+    """(perfil, SQLALCHEMY_ENGINE_OPTIONS, pragmas) para a URI e o ambiente."""
+    profile = resolve_profile(uri, env.get('DB_PROFILE'))
+
+    if profile == 'sqlite':
+        pragmas = {
+            'journal_mode': 'WAL',
+            'synchronous': _setting(env, SQLITE_DEFAULTS, 'SQLITE_SYNCHRONOUS'),
+            'busy_timeout': _setting(env, SQLITE_DEFAULTS, 'SQLITE_BUSY_TIMEOUT_MS'),
+            'mmap_size': _setting(env, SQLITE_DEFAULTS, 'SQLITE_MMAP_SIZE'),
+            # negativo = tamanho em KiB, não em páginas
+            'cache_size': -_setting(env, SQLITE_DEFAULTS, 'SQLITE_CACHE_SIZE_KB'),
+            'temp_store': 'MEMORY',
+            # o SQLite só aplica as FKs (e o ON DELETE CASCADE) com isto ligado
+            'foreign_keys': 'ON',
+        }
+        return profile, {}, pragmas
+
+    if profile == 'server':
+        options = {
+            'pool_size': _setting(env, SERVER_DEFAULTS, 'DB_POOL_SIZE'),
+            'max_overflow': _setting(env, SERVER_DEFAULTS, 'DB_MAX_OVERFLOW'),
+            'pool_timeout': _setting(env, SERVER_DEFAULTS, 'DB_POOL_TIMEOUT'),
+            'pool_recycle': _setting(env, SERVER_DEFAULTS, 'DB_POOL_RECYCLE'),
+            'pool_pre_ping': True,
+        }
+        timeout_ms = _setting(env, SERVER_DEFAULTS, 'DB_STATEMENT_TIMEOUT_MS')
+        backend = make_url(uri).get_backend_name()
+        if timeout_ms and backend == 'postgresql':
+            options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+        elif timeout_ms and backend == 'mysql':
+            options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={timeout_ms}'}
+        return profile, options, {}
+
+    return profile, {}, {}
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Executa os PRAGMAs em toda conexão nova da engine."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def init_app(app, env):
+    """db.init_app com o perfil de engine escolhido pelo ambiente `env`."""
+    uri = normalize_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    profile, options, pragmas = engine_options(uri, env)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['DB_PROFILE'] = profile
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).update(options)
+
+    db.init_app(app)
+
+    if pragmas:
+        with app.app_context():
+            install_sqlite_pragmas(db.engine, pragmas)
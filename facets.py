@@ -0,0 +1,82 @@
+# facets.py - Contagens por categoria, bairro e faixa de preço da busca
+#
+# Uma única consulta agrupada por (categoria, bairro, faixa de preço) sobre
+# o conjunto filtrado; as três contagens saem somando essas linhas em
+# Python. O filtro de categoria fica fora do SQL e é aplicado na soma: a
+# contagem por categoria mostra quantos resultados cada categoria teria com
+# os demais filtros, e bairro/preço respeitam a categoria escolhida. A
+# contagem por bairro é pelo valor exato de User.neighborhood, então o link
+# de cada bairro usa o filtro exato `bairro` (o `neighborhood` do formulário
+# casa por trecho: "Heliópolis" também traria "Novo Heliópolis").
+#
+# O resultado fica em cache pela chave dos filtros normalizados + versão
+# "catalog" dos dados (a mesma do cache de páginas): qualquer gravação em
+# profissional/usuário/avaliação/categoria invalida todas as entradas.
+from sqlalchemy import case, func
+
+from cache import TTLCache, current_version
+from models import Professional, User
+from page_cache import DATA_VERSION
+import queries
+
+# (chave, rótulo, mínimo, máximo) - mínimo incluso, máximo exclusivo
+PRICE_BUCKETS = (
+    ('0-50', 'Até R$ 50', None, 50),
+    ('50-100', 'R$ 50 a R$ 100', 50, 100),
+    ('100-200', 'R$ 100 a R$ 200', 100, 200),
+    ('200-500', 'R$ 200 a R$ 500', 200, 500),
+    ('500-', 'Acima de R$ 500', 500, None),
+)
+NO_PRICE = 'sem-preco'
+TOP_NEIGHBORHOODS = 12
+
+_price_bucket = case(
+    (Professional.starting_price.is_(None), NO_PRICE),
+    *[(Professional.starting_price < high, key) for key, _, _, high in PRICE_BUCKETS if high is not None],
+    else_=PRICE_BUCKETS[-1][0],
+)
+
+_facets = TTLCache(maxsize=1024, ttl=600)
+
+
+def _grouped_rows(filters):
+    query, _ = queries.search_query(dict(filters, category=None), queries.DEFAULT_SEARCH_SORT)
+    return (
+        query.order_by(None)
+        .with_entities(Professional.category_id, User.neighborhood, _price_bucket, func.count())
+        .group_by(Professional.category_id, User.neighborhood, _price_bucket)
+        .all()
+    )
+
+
+def compute(filters):
+    category = filters.get('category')
+    categories, neighborhoods, prices = {}, {}, {}
+    total = 0
+    for category_id, neighborhood, bucket, count in _grouped_rows(filters):
+        categories[category_id] = categories.get(category_id, 0) + count
+        if category is not None and category_id != category:
+            continue
+        total += count
+        if neighborhood:
+            neighborhoods[neighborhood] = neighborhoods.get(neighborhood, 0) + count
+        prices[bucket] = prices.get(bucket, 0) + count
+    return {
+        'total': total,
+        'categories': categories,
+        'neighborhoods': sorted(neighborhoods.items(), key=lambda item: (-item[1], item[0]))[:TOP_NEIGHBORHOODS],
+        'prices': [(key, label, low, high, prices[key]) for key, label, low, high in PRICE_BUCKETS if prices.get(key)],
+    }
+
+
+def facet_counts(filters):
+    """Contagens da busca para os filtros normalizados (ver queries.parse_search_filters)."""
+    version = current_version(DATA_VERSION)
+    if version is None:
+        return compute(filters)
+    key = (version, tuple(sorted((k, v) for k, v in filters.items() if k not in ('near', 'radius'))))
+    result = _facets.get(key)
+    if result is None:
+        result = compute(filters)
+        _facets.set(key, result)
+    return result
@@ -0,0 +1,154 @@
+# geo.py - Localização aproximada dos usuários e busca por proximidade
+#
+# Não há geocodificação externa: cada usuário recebe, no cadastro, as
+# coordenadas do centróide do seu CEP (se houver no arquivo), senão do
+# bairro, senão da cidade (data/garanhuns_centroids.csv, GEO_CENTROIDS_FILE;
+# os centróides de bairro são aproximados). Junto vai o geohash (precisão
+# 7, ~150 m), indexado em users.geohash.
+#
+# Busca "perto de mim": as células de geohash que cobrem o quadrado em volta
+# do raio viram faixas `geohash >= prefixo AND geohash < prefixo + '~'`
+# (usam o índice); a distância (haversine) só é calculada para os
+# candidatos dessas células, que são então filtrados pelo raio e ordenados.
+import csv
+import math
+import os
+
+from sqlalchemy import and_, bindparam, or_, select
+
+from models import User
+from search_index import fold
+
+DEFAULT_CENTROIDS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'garanhuns_centroids.csv')
+GEOHASH_PRECISION = 7
+MAX_CELLS = 64
+EARTH_RADIUS_KM = 6371.0
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+# --------------------------
+# GEOHASH
+# --------------------------
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, rng = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if target >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(altura, largura) da célula em graus."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def distance_km(a, b):
+    """Distância haversine entre dois pontos (lat, lon)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Prefixos de geohash cujas células cobrem o círculo (sem sobras grandes).
+
+    Usa a precisão mais fina cuja célula tenha ao menos metade do raio, desde
+    que o quadrado do raio caiba em até MAX_CELLS células.
+    """
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * max(math.cos(math.radians(latitude)), 0.01))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if min(height, width * math.cos(math.radians(latitude))) * 111.32 < radius_km / 2:
+            continue
+        rows = math.ceil(2 * dlat / height) + 1
+        cols = math.ceil(2 * dlon / width) + 1
+        if rows * cols > MAX_CELLS:
+            continue
+        cells = set()
+        for i in range(rows + 1):
+            lat = min(latitude + dlat, latitude - dlat + i * height)
+            for j in range(cols + 1):
+                lon = min(longitude + dlon, longitude - dlon + j * width)
+                cells.add(encode(lat, lon, precision))
+        return sorted(cells)
+    return ['']
+
+
+def cells_filter(column, cells):
+    """Condição SQL: a coluna de geohash começa com algum dos prefixos (por faixa)."""
+    return or_(*[and_(column >= cell, column < cell + '~') for cell in cells])
+
+
+# --------------------------
+# CENTRÓIDES
+# --------------------------
+class Centroids:
+    def __init__(self, rows=()):
+        self.ceps, self.neighborhoods, self.cities = {}, {}, {}
+        for kind, key, latitude, longitude in rows:
+            point = (float(latitude), float(longitude))
+            if kind == 'cep':
+                self.ceps[key.replace('-', '')] = point
+            elif kind == 'neighborhood':
+                self.neighborhoods[fold(key)] = point
+            elif kind == 'city':
+                self.cities[fold(key)] = point
+
+    @classmethod
+    def load(cls, path=DEFAULT_CENTROIDS_FILE):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, newline='', encoding='utf-8') as f:
+            return cls((r['kind'], r['key'], r['latitude'], r['longitude']) for r in csv.DictReader(f))
+
+    def locate(self, cep=None, neighborhood=None, city=None, state=None):
+        """(lat, lon) do CEP, do bairro ou da cidade, nessa ordem; None se nenhum."""
+        digits = (cep or '').replace('-', '')
+        if digits in self.ceps:
+            return self.ceps[digits]
+        if neighborhood and fold(neighborhood) in self.neighborhoods:
+            return self.neighborhoods[fold(neighborhood)]
+        if city:
+            return self.cities.get(fold(f'{city}/{state}' if state else city))
+        return None
+
+    def coordinates(self, cep=None, neighborhood=None, city=None, state=None):
+        """Colunas latitude/longitude/geohash para gravar no User."""
+        point = self.locate(cep, neighborhood, city, state)
+        if point is None:
+            return {'latitude': None, 'longitude': None, 'geohash': None}
+        return {'latitude': point[0], 'longitude': point[1], 'geohash': encode(*point)}
+
+
+def geocode_users(connection, centroids, only_missing=False):
+    """Recalcula as coordenadas dos usuários a partir de CEP/bairro/cidade."""
+    u = User.__table__.c
+    stmt = select(u.id, u.cep, u.neighborhood, u.city, u.state)
+    if only_missing:
+        stmt = stmt.where(u.geohash.is_(None))
+    rows = connection.execute(stmt).all()
+    updates = [{'_id': row.id, **centroids.coordinates(row.cep, row.neighborhood, row.city, row.state)}
+               for row in rows]
+    if updates:
+        connection.execute(
+            User.__table__.update().where(u.id == bindparam('_id')),
+            updates,
+        )
+    return len(updates)
@@ -0,0 +1,292 @@
+# http_client.py - Cliente HTTP compartilhado para chamadas externas
+#
+# - pool de conexões keep-alive (requests.Session + HTTPAdapter)
+# - limite de requisições simultâneas por host (falha rápido se lotado)
+# - tentativas com timeout curto primeiro e um pouco maior depois, todas
+#   dentro de um prazo total (`deadline`): a última tentativa recebe só o
+#   que sobrou dele, e não começa se sobrar menos que MIN_ATTEMPT_SECONDS
+# - circuit breaker por host: após N falhas seguidas, abre e recusa na hora
+#   por `reset_timeout` segundos; depois deixa uma tentativa passar
+# - métricas: histograma de latência, contadores e estado do breaker
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpClientError(Exception):
+    """Falha ao falar com o host externo."""
+
+
+class CircuitOpenError(HttpClientError):
+    """O circuit breaker do host está aberto."""
+
+
+class ConcurrencyLimitError(HttpClientError):
+    """Limite de requisições simultâneas para o host atingido."""
+
+
+# --------------------------
+# CIRCUIT BREAKER
+# --------------------------
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """True se a chamada pode seguir; em half-open libera só uma por vez."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Devolve a vaga de teste do half-open sem sucesso nem falha (ex.: exceção local)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# --------------------------
+# MÉTRICAS
+# --------------------------
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class HostMetrics:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # último = +Inf
+        self.count = 0
+        self.total_seconds = 0.0
+        self.errors = 0
+        self.rejected = 0  # breaker aberto ou limite de concorrência
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            i = 0
+            while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+                i += 1
+            self.buckets[i] += 1
+            self.count += 1
+            self.total_seconds += seconds
+            if error:
+                self.errors += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+
+# --------------------------
+# CLIENTE
+# --------------------------
+MIN_ATTEMPT_SECONDS = 0.2  # menos que isso do prazo não vale uma tentativa
+
+
+class HttpClient:
+    """Sessão HTTP compartilhada com as proteções descritas no topo do módulo.
+
+    `timeouts` é a sequência de (connect, read) por tentativa: a primeira é
+    curta para não prender o worker quando o host está lento. `deadline`
+    limita a soma de tudo (espera pela vaga e tentativas), em segundos.
+    """
+
+    def __init__(self, pool_size=10, max_per_host=4, timeouts=((1.0, 1.5), (2.0, 3.0)), deadline=5.0,
+                 failure_threshold=5, reset_timeout=30, acquire_timeout=0.1):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.max_per_host = max_per_host
+        self.timeouts = tuple(timeouts)
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.acquire_timeout = acquire_timeout
+        # chamados com (host, segundos, erro) ao fim de cada request(), na
+        # thread de quem chamou - ex.: o profiler por requisição
+        self.listeners = []
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = {
+                    'semaphore': threading.BoundedSemaphore(self.max_per_host),
+                    'breaker': CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                    'metrics': HostMetrics(),
+                }
+            return self._hosts[host]
+
+    def breaker(self, url_or_host):
+        host = urlsplit(url_or_host).netloc or url_or_host
+        return self._host(host)['breaker']
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Faz a requisição; levanta HttpClientError se nenhuma tentativa der certo.
+
+        Respostas 5xx contam como falha (para o breaker e para nova tentativa);
+        4xx são devolvidas normalmente ao chamador.
+        """
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        error = True
+        try:
+            response = self._request(host, method, url, **kwargs)
+            error = False
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            for listener in self.listeners:
+                listener(host, elapsed, error)
+
+    def _request(self, host, method, url, **kwargs):
+        entry = self._host(host)
+        breaker, metrics = entry['breaker'], entry['metrics']
+        deadline_at = time.monotonic() + self.deadline
+
+        # a vaga do semáforo vem antes da do breaker: recusada pelo limite de
+        # concorrência, a chamada não chega a ocupar a tentativa do half-open
+        if not entry['semaphore'].acquire(timeout=self.acquire_timeout):
+            metrics.reject()
+            raise ConcurrencyLimitError(f"limite de conexões simultâneas para {host}")
+        try:
+            if not breaker.allow():
+                metrics.reject()
+                raise CircuitOpenError(f"circuito aberto para {host}")
+            return self._attempts(breaker, metrics, deadline_at, method, url, **kwargs)
+        finally:
+            entry['semaphore'].release()
+
+    def _attempts(self, breaker, metrics, deadline_at, method, url, **kwargs):
+        settled = False
+        try:
+            last_error = None
+            for timeout in self.timeouts:
+                timeout = _within(timeout, deadline_at - time.monotonic())
+                if timeout is None:
+                    last_error = last_error or HttpClientError("prazo esgotado")
+                    break
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except requests.RequestException as e:
+                    metrics.observe(time.perf_counter() - started, error=True)
+                    last_error = e
+                    continue
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 500:
+                    metrics.observe(elapsed, error=True)
+                    last_error = HttpClientError(f"HTTP {response.status_code}")
+                    continue
+                metrics.observe(elapsed)
+                settled = True
+                breaker.record_success()
+                return response
+
+            settled = True
+            breaker.record_failure()
+            raise HttpClientError(str(last_error)) from last_error
+        finally:
+            # exceção fora de RequestException: sem veredito sobre o host,
+            # mas a vaga do half-open não pode ficar presa
+            if not settled:
+                breaker.release_trial()
+
+    def metrics(self):
+        """Snapshot das métricas por host (dict serializável)."""
+        with self._lock:
+            hosts = dict(self._hosts)
+        snapshot = {}
+        for host, entry in hosts.items():
+            m = entry['metrics']
+            snapshot[host] = {
+                'state': entry['breaker'].state,
+                'count': m.count,
+                'errors': m.errors,
+                'rejected': m.rejected,
+                'total_seconds': m.total_seconds,
+                'buckets': dict(zip([*map(str, LATENCY_BUCKETS), '+Inf'], m.buckets)),
+            }
+        return snapshot
+
+    def prometheus_lines(self):
+        """Métricas no formato texto do Prometheus, cada família sob sua linha TYPE."""
+        families = {
+            'http_client_request_seconds': ('histogram', []),
+            'http_client_errors_total': ('counter', []),
+            'http_client_rejected_total': ('counter', []),
+            'http_client_circuit_open': ('gauge', []),
+        }
+        for host, m in self.metrics().items():
+            label = f'host="{host}"'
+            histogram = families['http_client_request_seconds'][1]
+            cumulative = 0
+            for le, n in m['buckets'].items():
+                cumulative += n
+                histogram.append(f'http_client_request_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            histogram.append(f'http_client_request_seconds_sum{{{label}}} {m["total_seconds"]:.6f}')
+            histogram.append(f'http_client_request_seconds_count{{{label}}} {m["count"]}')
+            families['http_client_errors_total'][1].append(f'http_client_errors_total{{{label}}} {m["errors"]}')
+            families['http_client_rejected_total'][1].append(f'http_client_rejected_total{{{label}}} {m["rejected"]}')
+            families['http_client_circuit_open'][1].append(
+                f'http_client_circuit_open{{{label}}} {0 if m["state"] == CircuitBreaker.CLOSED else 1}'
+            )
+        lines = []
+        for family, (kind, samples) in families.items():
+            lines.append(f'# TYPE {family} {kind}')
+            lines.extend(samples)
+        return lines
+
+
+def _within(timeout, remaining):
+    """(connect, read) reduzido proporcionalmente para caber em `remaining`; None se não couber."""
+    if remaining < MIN_ATTEMPT_SECONDS:
+        return None
+    connect, read = timeout
+    scale = min(1.0, remaining / (connect + read))
+    return connect * scale, read * scale
+
+
+# cliente padrão do processo (compartilha o pool entre todos os usos)
+default_client = HttpClient()
@@ -0,0 +1,84 @@
+# identity.py - Usuário logado sem consulta ao banco a cada requisição
+#
+# O user_loader do Flask-Login busca o User (com o perfil profissional e a
+# categoria) uma vez e guarda uma cópia desligada da sessão num cache em
+# processo, por alguns segundos. Nas requisições seguintes a cópia entra na
+# sessão com merge(load=False), sem SQL; a partir daí o identity map da
+# sessão (por requisição) atende `User.query.get(current_user.id)` e
+# `current_user.professional_profile` sem novas consultas.
+#
+# A chave inclui a versão "identity" (ver cache.track_versions), que muda
+# quando um usuário/perfil é alterado ou excluído: edições de perfil e
+# exclusões de conta valem na hora neste processo e em até 2 s nos demais.
+# Os agregados de avaliação do perfil (rating_*) não vão para a cópia: ficam
+# adiados e são lidos do banco se a requisição usá-los, então uma avaliação
+# nova não invalida a identidade de todos os usuários logados.
+from sqlalchemy import select
+from sqlalchemy.orm import Session, defer, joinedload
+
+from cache import TTLCache, current_version, track_versions
+from database import db
+from models import Professional, User
+
+IDENTITY_VERSION = 'identity'
+
+# colunas de Professional mantidas por eventos de Review (models.py)
+RATING_COLUMNS = tuple(c for c in Professional.__table__.columns.keys() if c.startswith('rating_'))
+PROFILE_COLUMNS = tuple(c for c in Professional.__table__.columns.keys() if c not in RATING_COLUMNS)
+
+track_versions(User, IDENTITY_VERSION, inserts=False)
+track_versions(Professional, IDENTITY_VERSION, columns=PROFILE_COLUMNS)
+
+_users = TTLCache(maxsize=10000, ttl=30)
+
+
+def configure(ttl=None, maxsize=None):
+    if ttl is not None:
+        _users.ttl = ttl
+    if maxsize is not None:
+        _users.maxsize = maxsize
+
+
+def _fetch_detached(user_id):
+    """User + perfil + categoria numa sessão própria, já desligados dela."""
+    with Session(db.engine) as session:
+        user = session.execute(
+            select(User)
+            .options(
+                joinedload(User.professional_profile).options(
+                    joinedload(Professional.category),
+                    *[defer(getattr(Professional, c)) for c in RATING_COLUMNS],
+                )
+            )
+            .where(User.id == user_id)
+        ).unique().scalar_one_or_none()
+        session.expunge_all()
+    return user
+
+
+def load_user(user_id):
+    """user_loader: o User na sessão da requisição, do cache quando possível."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    # já carregado nesta requisição (ex.: login_user acabou de rodar)
+    user = db.session.identity_map.get(db.session.identity_key(User, user_id))
+    if user is not None:
+        return user
+
+    version = current_version(IDENTITY_VERSION)
+    if version is None:
+        return db.session.get(User, user_id)
+
+    key = (user_id, version)
+    cached = _users.get(key)
+    if cached is None:
+        cached = _fetch_detached(user_id)
+        if cached is None:
+            return None
+        _users.set(key, cached)
+    # a cópia em cache não é alterada: merge copia o estado para a sessão
+    return db.session.merge(cached, load=False)
+
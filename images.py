@@ -0,0 +1,130 @@
+# images.py - Derivados (miniaturas) das fotos de perfil e portfólio
+#
+# O upload grava só o original no blob store; a geração das versões
+# thumb/card/full em WEBP roda num pool de threads em segundo plano e, ao
+# terminar, grava os hashes ao lado do original (no Professional ou na linha
+# de portfolio_photos). Enquanto os derivados não existem, os templates usam
+# o original.
+#
+# Depende do Pillow (extra "images" no pyproject). Sem ele, o pipeline fica
+# desligado e só os originais são servidos.
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow é opcional
+    Image = None
+
+from cache import bump_session_versions, versions_for
+from database import db
+from models import PortfolioPhoto, Professional
+
+log = logging.getLogger(__name__)
+
+# nome -> maior lado em pixels (a imagem nunca é ampliada)
+DERIVATIVES = {
+    'thumb': 96,
+    'card': 320,
+    'full': 1280,
+}
+DERIVATIVE_FORMAT = 'WEBP'
+DERIVATIVE_QUALITY = 80
+
+
+def available():
+    return Image is not None
+
+
+def make_derivatives(store, original_hash):
+    """Gera e grava os derivados de um original. Retorna {nome: hash}."""
+    with open(store.path(original_hash), 'rb') as f:
+        source = Image.open(f)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+    variants = {}
+    for name, size in DERIVATIVES.items():
+        image = source.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY, method=4)
+        buffer.seek(0)
+        variants[name] = store.save(buffer)
+    return variants
+
+
+class ImagePipeline:
+    """Pool de workers que gera derivados e atualiza o Professional."""
+
+    def __init__(self, app, store, workers=2):
+        self.app = app
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+
+    def submit_profile_photo(self, professional_id, original_hash):
+        if not available():
+            return None
+        return self.executor.submit(self._run, self._save_profile_photo, professional_id, original_hash)
+
+    def submit_portfolio_photo(self, professional_id, original_hash):
+        if not available():
+            return None
+        return self.executor.submit(self._run, self._save_portfolio_photo, professional_id, original_hash)
+
+    def _run(self, save, professional_id, original_hash):
+        try:
+            variants = make_derivatives(self.store, original_hash)
+        except Exception:
+            log.exception("Falha ao gerar derivados de %s", original_hash)
+            return None
+        # cada gravação é um UPDATE de uma linha, condicionado ao original:
+        # jobs simultâneos não se sobrescrevem, sem trava entre eles
+        with self.app.app_context():
+            try:
+                save(professional_id, original_hash, variants)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                log.exception("Falha ao salvar derivados de %s", original_hash)
+                return None
+        return variants
+
+    @staticmethod
+    def _save_profile_photo(professional_id, original_hash, variants):
+        # só aplica se a foto não foi trocada enquanto o job rodava
+        result = db.session.execute(
+            Professional.__table__.update()
+            .where(Professional.__table__.c.id == professional_id)
+            .where(Professional.__table__.c.profile_photo == original_hash)
+            .values(profile_photo_variants=json.dumps(variants))
+        )
+        if result.rowcount:
+            # UPDATE do Core não passa pelo flush: invalida os cards em cache aqui
+            bump_session_versions(db.session, versions_for(Professional, columns=('profile_photo_variants',)))
+
+    @staticmethod
+    def _save_portfolio_photo(professional_id, original_hash, variants):
+        photos = PortfolioPhoto.__table__
+        result = db.session.execute(
+            photos.update()
+            .where(photos.c.professional_id == professional_id)
+            .where(photos.c.original == original_hash)
+            .values(variants=json.dumps(variants))
+        )
+        if result.rowcount:
+            bump_session_versions(db.session, versions_for(PortfolioPhoto, columns=('variants',)))
+
+
+# --------------------------
+# TEMPLATES
+# --------------------------
+def srcset_entries(variants):
+    """[(hash, largura)] dos derivados disponíveis, do menor para o maior."""
+    if not variants:
+        return []
+    return [(variants[name], width) for name, width in DERIVATIVES.items() if variants.get(name)]
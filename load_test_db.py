@@ -0,0 +1,118 @@
+# load_test_db.py - Teste de carga de escritas concorrentes no banco
+#
+# Várias threads gravam ao mesmo tempo, cada uma com sua conexão, imitando
+# as escritas do app: cadastro (INSERT em users), pedido de orçamento e
+# avaliação (que atualiza a mesma linha de agregados do profissional - o
+# pior caso de disputa). Falha (exit code 1) se alguma escrita der erro,
+# ex.: "database is locked".
+#
+#   python load_test_db.py                          # SQLite temporário, perfil auto
+#   python load_test_db.py --profile none           # sem WAL/busy_timeout, para comparar
+#   DATABASE_URL=postgresql://... python load_test_db.py --threads 32
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=50, help='escritas por thread')
+    parser.add_argument('--profile', default=None, help='DB_PROFILE (auto, sqlite, server, none)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if 'DATABASE_URL' not in os.environ:
+        tmpdir = tempfile.mkdtemp(prefix='load-test-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'load.db')
+    if args.profile:
+        os.environ['DB_PROFILE'] = args.profile
+    os.environ.setdefault('PAGE_CACHE_BACKEND', 'none')
+
+    from app import app, db
+    from models import User, Professional, ServiceCategory, ServiceRequest, Review
+    import migrations
+
+    with app.app_context():
+        migrations.upgrade()
+        category = ServiceCategory(name=f'Carga {time.time()}')
+        owner = User(name='Profissional carga', cpf=f'carga-{time.time()}',
+                     email=f'carga-{time.time()}@example.com', password_hash='x',
+                     user_type='professional')
+        db.session.add_all([category, owner])
+        db.session.flush()
+        prof = Professional(user_id=owner.id, category_id=category.id, starting_price=100)
+        db.session.add(prof)
+        db.session.commit()
+        prof_id = prof.id
+        run_id = int(time.time() * 1000)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(args.threads)
+
+    def worker(n):
+        with app.app_context():
+            start_gate.wait()
+            for i in range(args.ops):
+                began = time.perf_counter()
+                try:
+                    # cadastro
+                    client = User(name=f'Cliente {n}-{i}', cpf=f'{run_id}-{n}-{i}',
+                                  email=f'{run_id}-{n}-{i}@example.com', password_hash='x')
+                    db.session.add(client)
+                    db.session.commit()
+                    # pedido + avaliação (atualiza os agregados do mesmo profissional)
+                    req = ServiceRequest(client_id=client.id, professional_id=prof_id, title='Carga')
+                    db.session.add(req)
+                    db.session.flush()
+                    db.session.add(Review(request_id=req.id, professional_id=prof_id,
+                                          client_id=client.id, rating=1 + i % 5))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e).splitlines()[0])
+                    continue
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - began
+
+    with app.app_context():
+        rating_count = db.session.get(Professional, prof_id).rating_count
+        reviews = Review.query.filter_by(professional_id=prof_id).count()
+        consistent = rating_count == reviews
+        backend = db.engine.url.get_backend_name()
+
+    total = args.threads * args.ops
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    print(f"perfil: {app.config['DB_PROFILE']}  banco: {backend}")
+    print(f"{len(latencies)}/{total} operações ok em {wall:.2f}s ({len(latencies) / wall:.0f} ops/s)")
+    print(f"latência p50 {pct(0.50):.1f} ms  p95 {pct(0.95):.1f} ms  p99 {pct(0.99):.1f} ms")
+    print(f"agregados consistentes: {'sim' if consistent else 'NÃO'} ({rating_count} x {reviews} avaliações)")
+    if errors:
+        print(f"{len(errors)} erros, ex.: {errors[0]}")
+    return 1 if errors or not consistent else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# load_test_signup.py - Vazão de cadastros concorrentes (POST /registro)
+#
+# N usuários se cadastram ao mesmo tempo, cada um com seu cliente (cookie de
+# sessão próprio) e um CEP diferente. O ViaCEP é substituído por um falso
+# com latência configurável (--cep-latency), para o teste não depender da rede.
+#
+# Roda dois modos, em sequência, no mesmo banco:
+# - "inline":   como antes - sem a consulta antecipada do CEP e com o hash
+#               de senha na thread da requisição (HASH_WORKERS=0);
+# - "pipeline": como o formulário faz - GET /api/validar-cep ao sair do
+#               campo (não entra na medida, o usuário ainda está digitando),
+#               depois POST /registro com o hash no pool limitado.
+# Mede só o POST /registro. Falha (exit code 1) se algum cadastro não
+# redirecionar (302) ou se houver respostas 503 sem --allow-503.
+#
+#   python load_test_signup.py                         # 32 cadastros, 16 simultâneos
+#   python load_test_signup.py --signups 200 --concurrency 64 --workers 8 --queue 16
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--signups', type=int, default=32, help='cadastros por modo')
+    parser.add_argument('--concurrency', type=int, default=16, help='cadastros simultâneos')
+    parser.add_argument('--workers', type=int, default=None, help='HASH_WORKERS do modo pipeline')
+    parser.add_argument('--queue', type=int, default=None, help='HASH_QUEUE do modo pipeline')
+    parser.add_argument('--cep-latency', type=float, default=0.08, help='segundos do ViaCEP falso')
+    parser.add_argument('--allow-503', action='store_true', help='não falha com respostas 503')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if 'DATABASE_URL' not in os.environ:
+        tmpdir = tempfile.mkdtemp(prefix='load-signup-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'signup.db')
+    os.environ.setdefault('PAGE_CACHE_BACKEND', 'none')
+    os.environ.setdefault('SERVER_TIMING', '0')
+    os.environ.setdefault('RATELIMIT_BACKEND', 'none')  # todos os cadastros saem do mesmo IP
+
+    import app as app_module
+    import migrations
+    import seed_bulk
+    from app import app
+    from workers import BoundedExecutor
+
+    with app.app_context():
+        migrations.upgrade()
+
+    def upstream(digits):
+        time.sleep(args.cep_latency)
+        return {'cep': digits, 'address': 'Rua do Sol', 'neighborhood': 'Centro',
+                'city': 'Garanhuns', 'state': 'PE'}
+    app_module.cep_resolver.upstream = upstream
+
+    run_id = int(time.time()) % 100000
+    counter = iter(range(10 ** 6))
+    counter_lock = threading.Lock()
+
+    def signup(prefetch):
+        with counter_lock:
+            n = next(counter)
+        # CEPs diferentes: cada cadastro precisa de uma consulta ao ViaCEP
+        cep = f'5529{n % 10000:04d}'
+        client = app.test_client()
+        if prefetch:
+            client.get(f'/api/validar-cep/{cep}')
+        began = time.perf_counter()
+        response = client.post('/registro', data={
+            'name': f'Carga {n}', 'email': f'signup-{run_id}-{n}@example.com',
+            'cpf': seed_bulk.cpf_for(run_id * 10000 + n), 'password': 'senha123',
+            'user_type': 'client', 'phone': '', 'cep': cep,
+        })
+        return response.status_code, time.perf_counter() - began
+
+    def run(mode, pool, prefetch):
+        app_module.hash_pool = pool
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            began = time.perf_counter()
+            results = list(executor.map(lambda _: signup(prefetch), range(args.signups)))
+            wall = time.perf_counter() - began
+        latencies = sorted(t for status, t in results if status == 302)
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+        print(f"{mode:<9} {len(latencies)}/{args.signups} ok em {wall:.2f}s "
+              f"({len(latencies) / wall:.1f} cadastros/s)  "
+              f"p50 {pct(0.50):.0f} ms  p95 {pct(0.95):.0f} ms  p99 {pct(0.99):.0f} ms  "
+              f"status {dict(sorted(statuses.items()))}")
+        return statuses
+
+    workers = args.workers if args.workers is not None else app.config['HASH_WORKERS']
+    queue = args.queue if args.queue is not None else app.config['HASH_QUEUE']
+    print(f"{args.signups} cadastros, {args.concurrency} simultâneos, ViaCEP falso {args.cep_latency * 1000:.0f} ms, "
+          f"pool {workers} workers / fila {queue}")
+    failed = False
+    for mode, pool, prefetch in (
+        ('inline', BoundedExecutor(0), False),
+        ('pipeline', BoundedExecutor(workers, queue, name='hash'), True),
+    ):
+        statuses = run(mode, pool, prefetch)
+        unexpected = {s: c for s, c in statuses.items() if s != 302 and not (s == 503 and args.allow_503)}
+        failed = failed or bool(unexpected)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
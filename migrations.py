@@ -0,0 +1,225 @@
+# migrations.py - Migrações de esquema versionadas
+#
+# Cada migração é uma função registrada com @migration('NNNN', 'descrição')
+# e roda uma única vez por banco, na sua própria transação; as já aplicadas
+# ficam na tabela schema_migrations. Aplicar: `flask db-upgrade`;
+# ver pendentes: `flask db-status`.
+#
+# A 0001 cria as tabelas que faltam a partir dos models atuais, então um
+# banco novo já nasce com as colunas/índices de hoje e as migrações
+# seguintes precisam ser idempotentes (checar antes de criar/alterar).
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from database import db
+from models import (
+    PROFILE_CHILDREN, Professional, ProfessionalRanking, Review, ServiceCategory, ServiceRequest, User,
+    reconcile_ratings,
+)
+import geo
+import profile_data
+import rankings
+import search_index
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+_migrations = []  # [(id, descrição, função)] em ordem de id
+
+
+def migration(migration_id, description):
+    def register(fn):
+        _migrations.append((migration_id, description, fn))
+        _migrations.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# --------------------------
+# HELPERS
+# --------------------------
+def add_missing_columns(connection, table):
+    """ALTER TABLE ADD COLUMN para as colunas do model que o banco não tem.
+
+    Retorna os nomes adicionados. Colunas NOT NULL precisam de server_default.
+    """
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(column.name)
+    return added
+
+
+def create_indexes(connection, table):
+    """Cria os índices declarados no model que ainda não existem."""
+    existing = {ix['name'] for ix in inspect(connection).get_indexes(table.name)}
+    created = []
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(connection)
+            created.append(index.name)
+    return created
+
+
+def cascade_foreign_keys(connection, table):
+    """Recria com ON DELETE do model as FKs que o banco tem sem ele.
+
+    SQLite não altera constraints sem recriar a tabela: lá fica como está
+    (bancos novos já nascem com o ON DELETE do create_all).
+    """
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        return []
+    existing = inspect(connection).get_foreign_keys(table.name)
+    changed = []
+    for fk in table.foreign_key_constraints:
+        if not fk.ondelete:
+            continue
+        columns = [c.name for c in fk.columns]
+        current = next((e for e in existing if e['constrained_columns'] == columns), None)
+        if current is None or not current['name'] or (current.get('options') or {}).get('ondelete', '').upper() == fk.ondelete.upper():
+            continue
+        name = current['name']
+        drop = 'DROP FOREIGN KEY' if dialect == 'mysql' else 'DROP CONSTRAINT'
+        referred = fk.elements[0].column
+        connection.execute(text(f"ALTER TABLE {table.name} {drop} {name}"))
+        connection.execute(text(
+            f"ALTER TABLE {table.name} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)})"
+            f" REFERENCES {referred.table.name} ({referred.name}) ON DELETE {fk.ondelete}"
+        ))
+        changed.append(name)
+    return changed
+
+
+# --------------------------
+# MIGRAÇÕES
+# --------------------------
+@migration('0001', 'tabelas iniciais (create_all)')
+def _create_tables(connection):
+    db.metadata.create_all(connection, checkfirst=True)
+
+
+@migration('0002', 'colunas novas: agregados de avaliação, image_hash, variantes de fotos')
+def _add_new_columns(connection):
+    add_missing_columns(connection, ServiceCategory.__table__)
+    added = add_missing_columns(connection, Professional.__table__)
+    if 'rating_count' in added:
+        # bancos antigos: preenche os agregados a partir das avaliações existentes
+        reconcile_ratings()
+
+
+@migration('0003', 'índice de texto dos profissionais')
+def _search_index(connection):
+    search_index.rebuild(connection)
+
+
+@migration('0004', 'índices compostos das buscas e dashboards')
+def _hot_path_indexes(connection):
+    for model in (Professional, ServiceRequest, Review):
+        create_indexes(connection, model.__table__)
+
+
+@migration('0005', 'FKs de usuário/profissional/pedido com ON DELETE CASCADE')
+def _cascade_foreign_keys(connection):
+    for model in (Professional, ServiceRequest, Review):
+        cascade_foreign_keys(connection, model.__table__)
+
+
+@migration('0006', 'coordenadas e geohash dos usuários (busca por proximidade)')
+def _user_coordinates(connection):
+    added = add_missing_columns(connection, User.__table__)
+    create_indexes(connection, User.__table__)
+    if 'geohash' in added:
+        geo.geocode_users(connection, geo.Centroids.load())
+
+
+@migration('0007', 'destaques pré-calculados por categoria (professional_rankings)')
+def _professional_rankings(connection):
+    ProfessionalRanking.__table__.create(connection, checkfirst=True)
+    rankings.refresh_all(connection)
+
+
+@migration('0008', 'portfólio, serviços, tags e disponibilidade em tabelas filhas')
+def _profile_children(connection):
+    for model in PROFILE_CHILDREN:
+        model.__table__.create(connection, checkfirst=True)
+    # as colunas antigas de professionals ficam no banco, sem uso
+    counts = profile_data.migrate_legacy_columns(connection)
+    if counts['services'] or counts['tags']:
+        search_index.reindex_professionals(connection, None)
+    return counts
+
+
+@migration('0009', 'disponibilidade não interpretável preservada em availability_note')
+def _availability_note(connection):
+    add_missing_columns(connection, Professional.__table__)
+    # textos que a 0008 não conseguiu transformar em faixas
+    return {'availability_notes': profile_data.migrate_availability_notes(connection)}
+
+
+@migration('0010', 'destaques com reserva e média a priori gravada (atualização incremental)')
+def _rankings_reserve(connection):
+    add_missing_columns(connection, ProfessionalRanking.__table__)
+    rankings.refresh_all(connection)
+
+
+# --------------------------
+# EXECUÇÃO
+# --------------------------
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        " id VARCHAR(20) PRIMARY KEY,"
+        " description VARCHAR(200),"
+        " applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_migrations():
+    connection = db.session.connection()
+    _ensure_migrations_table(connection)
+    rows = connection.execute(text(f"SELECT id, applied_at FROM {MIGRATIONS_TABLE}"))
+    applied = {row.id: row.applied_at for row in rows}
+    db.session.commit()
+    return applied
+
+
+def status():
+    """[(id, descrição, aplicada_em ou None)] de todas as migrações."""
+    applied = applied_migrations()
+    return [(mid, description, applied.get(mid)) for mid, description, _ in _migrations]
+
+
+def upgrade(report=None):
+    """Aplica as migrações pendentes, em ordem. Retorna os ids aplicados.
+
+    Requer contexto de aplicação. Cada migração é commitada junto com seu
+    registro em schema_migrations; uma falha desfaz só a migração corrente.
+    Migrações que devolvem contagens as passam a `report(id, contagens)`.
+    """
+    applied = applied_migrations()
+    done = []
+    for migration_id, description, fn in _migrations:
+        if migration_id in applied:
+            continue
+        try:
+            connection = db.session.connection()
+            result = fn(connection)
+            connection.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (id, description, applied_at)"
+                     " VALUES (:id, :description, :applied_at)"),
+                {'id': migration_id, 'description': description, 'applied_at': datetime.utcnow()},
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        done.append(migration_id)
+        if result and report is not None:
+            report(migration_id, result)
+    return done
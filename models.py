@@ -3,12 +3,18 @@ from flask_login import UserMixin
 from datetime import datetime
 import json
 
+from sqlalchemy import event, case, func, select, inspect
+
 
 # =====================================================
 # USER
 # =====================================================
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        # busca por proximidade: faixas de prefixo de geohash
+        db.Index("ix_users_geohash", "geohash"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -27,6 +33,11 @@ class User(db.Model, UserMixin):
     city = db.Column(db.String(120))
     state = db.Column(db.String(2))
 
+    # Localização aproximada (centróide do CEP/bairro, ver geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relacionamentos
@@ -65,7 +76,9 @@ class ServiceCategory(db.Model):
     name = db.Column(db.String(140), unique=True, nullable=False)
     description = db.Column(db.Text)
 
-    image = db.Column(db.Text)  # <-- FALTAVA! AGORA A IMAGEM É SALVA AQUI
+    # legado: imagem em base64; carregada só sob demanda (ver migrate-category-images)
+    image = db.deferred(db.Column(db.Text))
+    image_hash = db.Column(db.String(64))  # arquivo no blob store, servido em /media/<hash>
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -85,9 +98,13 @@ class ServiceCategory(db.Model):
 # =====================================================
 class Professional(db.Model):
     __tablename__ = "professionals"
+    __table_args__ = (
+        # busca: filtro por categoria + faixa/ordem de preço
+        db.Index("ix_professionals_category_price", "category_id", "starting_price"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey("service_categories.id"))
 
     bio = db.Column(db.Text)
@@ -95,14 +112,25 @@ class Professional(db.Model):
     starting_price = db.Column(db.Float)
 
     # NOVAS FUNCIONALIDADES
-    profile_photo = db.Column(db.String(255))            
-    portfolio_photos = db.Column(db.Text)                # JSON
-    services_offered = db.Column(db.Text)                # JSON
-    tags = db.Column(db.String(255))                     
-    availability = db.Column(db.String(255))             
+    profile_photo = db.Column(db.String(255))            # hash no blob store (ou URL legado)
+    profile_photo_variants = db.Column(db.Text)          # JSON {thumb|card|full: hash}
+    # portfólio, serviços, tags e disponibilidade: tabelas filhas (ver abaixo);
+    # as colunas JSON/texto antigas ficam no banco só como legado (migração 0008)
 
     verified = db.Column(db.Boolean, default=False)
     response_time = db.Column(db.String(50), default="24 horas (estimado)")
+    # disponibilidade em texto livre que não virou faixas ("Sob consulta");
+    # exibida quando o perfil não tem faixas (ver profile_data.py)
+    availability_note = db.Column(db.Text)
+
+    # Agregados de avaliação (mantidos pelos eventos de Review, ver abaixo)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -119,43 +147,178 @@ class Professional(db.Model):
         cascade="all, delete-orphan"
     )
 
-    # Helpers JSON
+    portfolio = db.relationship(
+        "PortfolioPhoto",
+        order_by="PortfolioPhoto.position",
+        cascade="all, delete-orphan"
+    )
+
+    services = db.relationship(
+        "ProfessionalService",
+        order_by="ProfessionalService.position",
+        cascade="all, delete-orphan"
+    )
+
+    tag_rows = db.relationship(
+        "ProfessionalTag",
+        order_by="ProfessionalTag.position",
+        cascade="all, delete-orphan"
+    )
+
+    availability_slots = db.relationship(
+        "ProfessionalAvailability",
+        order_by="(ProfessionalAvailability.weekday, ProfessionalAvailability.start_minute)",
+        cascade="all, delete-orphan"
+    )
+
+    # Leitura no formato antigo (gravação: ver profile_data.py)
     def get_portfolio_photos(self):
+        return [{"original": p.original, "variants": p.get_variants()} for p in self.portfolio]
+
+    def get_profile_photo_variants(self):
         try:
-            return json.loads(self.portfolio_photos or "[]")
+            return json.loads(self.profile_photo_variants or "{}")
         except:
-            return []
+            return {}
+
+    def profile_photo_for(self, size):
+        """Derivado `size` (thumb/card/full) da foto; o original enquanto não existir."""
+        return self.get_profile_photo_variants().get(size) or self.profile_photo
 
     def get_services(self):
-        try:
-            return json.loads(self.services_offered or "[]")
-        except:
-            return []
+        return [s.name for s in self.services]
+
+    @property
+    def tag_list(self):
+        return [t.label for t in self.tag_rows]
 
-    # Propriedades úteis
+    @property
+    def tags(self):
+        return ", ".join(self.tag_list)
+
+    @property
+    def availability(self):
+        from profile_data import format_availability
+        return format_availability(
+            (s.weekday, s.start_minute, s.end_minute) for s in self.availability_slots
+        ) or (self.availability_note or "")
+
+    # Propriedades úteis (lidas das colunas agregadas, sem carregar reviews)
     @property
     def average_rating(self):
-        if not self.reviews:
+        if not self.rating_count:
             return 0
-        return sum(r.rating for r in self.reviews) / len(self.reviews)
+        return self.rating_sum / self.rating_count
 
     @property
     def review_count(self):
-        return len(self.reviews)
+        return self.rating_count or 0
+
+    @property
+    def rating_histogram(self):
+        """Quantidade de avaliações por nota: {1: n, ..., 5: n}."""
+        return {n: getattr(self, f"rating_{n}_count") or 0 for n in RATING_VALUES}
 
     def __repr__(self):
         return f"<Professional {self.id} - User {self.user_id}>"
 
 
+# =====================================================
+# DADOS DO PERFIL (tabelas filhas de Professional, ver profile_data.py)
+# =====================================================
+class PortfolioPhoto(db.Model):
+    __tablename__ = "portfolio_photos"
+    __table_args__ = (
+        db.Index("ix_portfolio_photos_professional", "professional_id", "position"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    original = db.Column(db.String(255), nullable=False)  # hash no blob store (ou URL legado)
+    variants = db.Column(db.Text)                         # JSON {thumb|card|full: hash}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_variants(self):
+        try:
+            return json.loads(self.variants or "{}")
+        except ValueError:
+            return {}
+
+    def __repr__(self):
+        return f"<PortfolioPhoto {self.id} prof={self.professional_id}>"
+
+
+class ProfessionalService(db.Model):
+    __tablename__ = "professional_services"
+    __table_args__ = (
+        # busca: profissionais que oferecem o serviço X
+        db.Index("ix_professional_services_key", "name_key", "professional_id"),
+        db.Index("ix_professional_services_professional", "professional_id", "position"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    name = db.Column(db.String(120), nullable=False)
+    name_key = db.Column(db.String(120), nullable=False)  # minúsculo, sem acento
+
+    def __repr__(self):
+        return f"<ProfessionalService {self.name!r} prof={self.professional_id}>"
+
+
+class ProfessionalTag(db.Model):
+    __tablename__ = "professional_tags"
+    __table_args__ = (
+        # busca: profissionais com a tag X
+        db.Index("ix_professional_tags_tag", "tag", "professional_id"),
+    )
+
+    professional_id = db.Column(
+        db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag = db.Column(db.String(60), primary_key=True)       # minúsculo, sem acento
+    label = db.Column(db.String(60), nullable=False)       # como o profissional escreveu
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProfessionalTag {self.tag!r} prof={self.professional_id}>"
+
+
+class ProfessionalAvailability(db.Model):
+    __tablename__ = "professional_availability"
+    __table_args__ = (
+        db.Index("ix_professional_availability_professional", "professional_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)        # 0 = segunda ... 6 = domingo
+    start_minute = db.Column(db.Integer)                   # minutos desde 0h; NULL = dia todo
+    end_minute = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"<ProfessionalAvailability prof={self.professional_id} dia={self.weekday}>"
+
+
+# filhas apagadas junto com o perfil (exclusão em massa: accounts.py)
+PROFILE_CHILDREN = (PortfolioPhoto, ProfessionalService, ProfessionalTag, ProfessionalAvailability)
+
+
 # =====================================================
 # SERVICE REQUEST
 # =====================================================
 class ServiceRequest(db.Model):
     __tablename__ = "service_requests"
+    __table_args__ = (
+        # dashboards: pedidos de um profissional/cliente, mais recentes primeiro
+        db.Index("ix_service_requests_professional_created", "professional_id", "created_at"),
+        db.Index("ix_service_requests_client_created", "client_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    client_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id"), nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False)
 
     title = db.Column(db.String(200))
     description = db.Column(db.Text)
@@ -183,16 +346,175 @@ class ServiceRequest(db.Model):
 # =====================================================
 class Review(db.Model):
     __tablename__ = "reviews"
+    __table_args__ = (
+        db.Index("ix_reviews_professional_created", "professional_id", "created_at"),
+        db.Index("ix_reviews_client", "client_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
-    request_id = db.Column(db.Integer, db.ForeignKey("service_requests.id"), nullable=False)
-    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id"), nullable=False)
-    client_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    request_id = db.Column(db.Integer, db.ForeignKey("service_requests.id", ondelete="CASCADE"), nullable=False)
+    # active_history: o valor antigo é carregado ao alterar, para o ajuste dos agregados
+    professional_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False),
+        active_history=True
+    )
+    client_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
-    rating = db.Column(db.Integer, nullable=False)
+    rating = db.column_property(db.Column(db.Integer, nullable=False), active_history=True)
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f"<Review {self.id} rating={self.rating}>"
+
+
+# =====================================================
+# RANKING (destaques por categoria, mantidos por rankings.py)
+# =====================================================
+class ProfessionalRanking(db.Model):
+    __tablename__ = "professional_rankings"
+    __table_args__ = (
+        # lista de uma categoria (NULL = geral) em ordem
+        db.Index("ix_professional_rankings_category_position", "category_id", "position"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey("service_categories.id", ondelete="CASCADE"))
+    position = db.Column(db.Integer, nullable=False)
+    professional_id = db.Column(db.Integer, db.ForeignKey("professionals.id", ondelete="CASCADE"), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    prior_mean = db.Column(db.Float)  # média a priori usada no cálculo da lista
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Ranking {self.category_id}#{self.position} prof={self.professional_id}>"
+
+
+# =====================================================
+# CEP (cache persistente das consultas de CEP)
+# =====================================================
+class CepCache(db.Model):
+    __tablename__ = "cep_cache"
+
+    cep = db.Column(db.String(8), primary_key=True)
+    found = db.Column(db.Boolean, nullable=False, default=True)  # False = resultado negativo
+
+    address = db.Column(db.String(200))
+    neighborhood = db.Column(db.String(120))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(2))
+
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def as_dict(self):
+        return {
+            'cep': self.cep,
+            'address': self.address or '',
+            'neighborhood': self.neighborhood or '',
+            'city': self.city or '',
+            'state': self.state or ''
+        }
+
+    def __repr__(self):
+        return f"<CepCache {self.cep} found={self.found}>"
+
+
+# =====================================================
+# CACHE VERSION (versão dos dados em cache, compartilhada entre processos)
+# =====================================================
+class CacheVersion(db.Model):
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(60), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
+
+
+# =====================================================
+# AGREGADOS DE AVALIAÇÃO
+# =====================================================
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def _rating_delta_values(rating, sign):
+    """Valores do UPDATE incremental para somar/subtrair uma nota."""
+    p = Professional.__table__.c
+    values = {
+        "rating_sum": p.rating_sum + sign * rating,
+        "rating_count": p.rating_count + sign,
+    }
+    if rating in RATING_VALUES:
+        col = f"rating_{rating}_count"
+        values[col] = p[col] + sign
+    return values
+
+
+def _apply_rating_delta(connection, professional_id, rating, sign):
+    if professional_id is None or rating is None:
+        return
+    connection.execute(
+        Professional.__table__.update()
+        .where(Professional.__table__.c.id == professional_id)
+        .values(**_rating_delta_values(rating, sign))
+    )
+
+
+@event.listens_for(Review, "after_insert")
+def _review_inserted(mapper, connection, target):
+    _apply_rating_delta(connection, target.professional_id, target.rating, +1)
+
+
+@event.listens_for(Review, "after_delete")
+def _review_deleted(mapper, connection, target):
+    _apply_rating_delta(connection, target.professional_id, target.rating, -1)
+
+
+@event.listens_for(Review, "after_update")
+def _review_updated(mapper, connection, target):
+    state = inspect(target)
+    rating_hist = state.attrs.rating.history
+    prof_hist = state.attrs.professional_id.history
+    if not rating_hist.has_changes() and not prof_hist.has_changes():
+        return
+
+    old_rating = rating_hist.deleted[0] if rating_hist.deleted else target.rating
+    old_prof = prof_hist.deleted[0] if prof_hist.deleted else target.professional_id
+
+    _apply_rating_delta(connection, old_prof, old_rating, -1)
+    _apply_rating_delta(connection, target.professional_id, target.rating, +1)
+
+
+def reconcile_ratings(professional_ids=None):
+    """Recalcula os agregados a partir da tabela reviews.
+
+    Serve de backfill para bancos antigos e de correção após exclusões em
+    massa (query.delete), que não disparam os eventos do ORM. Roda como um
+    único UPDATE com subconsultas correlacionadas. Não faz commit.
+    """
+    r = Review.__table__.c
+    p = Professional.__table__
+
+    def total(expr):
+        return (
+            select(func.coalesce(func.sum(expr), 0))
+            .where(r.professional_id == p.c.id)
+            .scalar_subquery()
+        )
+
+    values = {
+        "rating_sum": total(r.rating),
+        "rating_count": total(1),
+    }
+    for n in RATING_VALUES:
+        values[f"rating_{n}_count"] = total(case((r.rating == n, 1), else_=0))
+
+    stmt = p.update().values(**values)
+    if professional_ids is not None:
+        ids = list(professional_ids)
+        if not ids:
+            return 0
+        stmt = stmt.where(p.c.id.in_(ids))
+    return db.session.execute(stmt).rowcount
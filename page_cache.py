@@ -0,0 +1,259 @@
+# page_cache.py - Cache de páginas e fragmentos para visitantes anônimos
+#
+# A chave combina endpoint + parâmetros normalizados + versão dos dados
+# ("catalog", incrementada por gravações em Professional, Review,
+# ServiceCategory e User - ver cache.track_versions). Depois de uma gravação
+# a chave muda e a página é refeita; sem gravações, a entrada vale por
+# `fresh` segundos e, por mais `stale` segundos, é servida vencida enquanto
+# uma thread em segundo plano a regenera (stale-while-revalidate).
+#
+# Backends: memória (LRU), disco ou Redis (pacote `redis`, opcional),
+# escolhidos por PAGE_CACHE_BACKEND = memory | disk | redis (none desliga).
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from cache import TTLCache, current_version
+
+log = logging.getLogger(__name__)
+
+DATA_VERSION = 'catalog'
+
+
+# --------------------------
+# BACKENDS
+# --------------------------
+class MemoryBackend:
+    def __init__(self, maxsize=512):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, entry, ttl):
+        self._cache.set(key, entry, ttl=ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DiskBackend:
+    """Um arquivo pickle por chave; compartilhado entre os workers da máquina."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, entry = pickle.load(f)
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        if expires <= time.time():
+            return None
+        return entry
+
+    def set(self, key, entry, ttl):
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + ttl, entry), f)
+        os.replace(tmp, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+
+class RedisBackend:
+    """Qualquer servidor que fale o protocolo Redis (Redis, Valkey, KeyDB...)."""
+
+    def __init__(self, url, prefix='page:'):
+        import redis  # opcional: só é exigido quando este backend é usado
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw else None
+
+    def set(self, key, entry, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(entry), ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class NullBackend:
+    """Não guarda nada (PAGE_CACHE_BACKEND=none): desliga o cache."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, entry, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+def backend_from_config(config):
+    kind = config.get('PAGE_CACHE_BACKEND', 'memory')
+    if kind == 'none':
+        return NullBackend()
+    if kind == 'disk':
+        return DiskBackend(config['PAGE_CACHE_DIR'])
+    if kind == 'redis':
+        return RedisBackend(config['PAGE_CACHE_URL'])
+    return MemoryBackend()
+
+
+# --------------------------
+# CACHE DE PÁGINAS
+# --------------------------
+def _cacheable_request():
+    """Só GET anônimo e sem mensagens flash pendentes (que mudam o HTML)."""
+    return (
+        request.method == 'GET'
+        and not current_user.is_authenticated
+        and '_flashes' not in session
+    )
+
+
+def _normalized_args():
+    args = urlencode(sorted((k, v) for k, v in request.args.items(multi=True) if v != ''))
+    if request.view_args:
+        # rotas com parâmetro no caminho (/categorias/<id>): uma entrada por valor
+        return urlencode(sorted(request.view_args.items())) + '?' + args
+    return args
+
+
+class PageCache:
+    def __init__(self, app=None, backend=None, fresh=30, stale=300, workers=2):
+        self.backend = backend
+        self.fresh = fresh
+        self.stale = stale
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='page-cache')
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.backend is None:
+            self.backend = backend_from_config(app.config)
+        app.jinja_env.globals['cache_fragment'] = self.fragment
+
+    def _key(self, kind, name, extra=''):
+        version = current_version(DATA_VERSION)
+        if version is None:
+            return None
+        return f"{kind}:{name}:v{version}:{extra}"
+
+    def cached(self, view):
+        """Decorator de view: cache da resposta inteira com ETag/304 e SWR."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable_request():
+                return view(*args, **kwargs)
+            key = self._key('page', request.endpoint, _normalized_args())
+            if key is None:
+                return view(*args, **kwargs)
+
+            entry = self.backend.get(key)
+            if entry is not None:
+                age = time.time() - entry['created']
+                if age > self.fresh:
+                    self._refresh_in_background(key, view, args, kwargs)
+                return self._respond(entry, hit='STALE' if age > self.fresh else 'HIT')
+
+            entry, response = self._render(view, args, kwargs)
+            if entry is None:
+                return response
+            self.backend.set(key, entry, self.fresh + self.stale)
+            return self._respond(entry, hit='MISS')
+        return wrapper
+
+    def _render(self, view, args, kwargs):
+        """(entrada de cache ou None se não cacheável, resposta original)."""
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return None, response
+        body = response.get_data()
+        headers = [(k, v) for k, v in response.headers.items()
+                   if k.lower() not in ('set-cookie', 'content-length', 'etag')]
+        entry = {
+            'body': body,
+            'headers': headers,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'created': time.time(),
+        }
+        return entry, response
+
+    def _respond(self, entry, hit):
+        response = current_app.response_class(entry['body'], headers=entry['headers'])
+        response.set_etag(entry['etag'])
+        # o navegador revalida sempre (a página muda ao fazer login), via 304
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Cookie'
+        response.headers['X-Page-Cache'] = hit
+        return response.make_conditional(request)
+
+    def _refresh_in_background(self, key, view, args, kwargs):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        app = current_app._get_current_object()
+        path, query = request.path, request.query_string
+
+        def refresh():
+            try:
+                with app.test_request_context(path, query_string=query):
+                    entry, _ = self._render(view, args, kwargs)
+                if entry is not None:
+                    self.backend.set(key, entry, self.fresh + self.stale)
+            except Exception:
+                log.exception("Falha ao regenerar %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self.executor.submit(refresh)
+
+    # --------------------------
+    # FRAGMENTOS
+    # --------------------------
+    def fragment(self, name, *parts, ttl=300, caller=None):
+        """Uso no template:
+
+            {% call cache_fragment('home-categories') %} ... {% endcall %}
+
+        O HTML do bloco é guardado por `ttl` segundos e pela versão dos dados.
+        """
+        key = self._key('fragment', name, ':'.join(map(str, parts)))
+        if key is None:
+            return caller()
+        html = self.backend.get(key)
+        if html is None:
+            html = str(caller())
+            self.backend.set(key, html, ttl)
+        return Markup(html)
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,105 @@
+# pagination.py - Paginação por cursor (keyset)
+#
+# Em vez de OFFSET, cada página pede "os próximos N depois da última chave
+# vista": WHERE (k1, k2, ..., id) > (v1, v2, ..., vid) na ordem escolhida.
+# O custo de uma página não depende de quantas vieram antes.
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_
+
+
+class Page:
+    """Uma página de resultados e o token para a próxima (ou None)."""
+
+    def __init__(self, items, next_token=None):
+        self.items = items
+        self.next_token = next_token
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# --------------------------
+# TOKENS OPACOS
+# --------------------------
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def _serializer(salt):
+    return URLSafeSerializer(current_app.secret_key, salt=salt)
+
+
+def encode_token(payload, salt):
+    """Assina e serializa o estado da página (filtros, ordem, última chave)."""
+    payload = dict(payload)
+    if 'after' in payload:
+        payload['after'] = [_dump_value(v) for v in payload['after']]
+    return _serializer(salt).dumps(payload)
+
+
+def decode_token(token, salt):
+    """Devolve o payload do token, ou None se ausente/adulterado."""
+    if not token:
+        return None
+    try:
+        payload = _serializer(salt).loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if 'after' in payload:
+        payload['after'] = [_load_value(v) for v in payload['after']]
+    return payload
+
+
+# --------------------------
+# KEYSET
+# --------------------------
+def _after_clause(keys, values):
+    """(k1, k2, ...) "depois de" (v1, v2, ...) respeitando asc/desc de cada chave."""
+    clauses = []
+    for i, (expr, descending) in enumerate(keys):
+        equal_prefix = [k == v for (k, _), v in zip(keys[:i], values[:i])]
+        step = expr < values[i] if descending else expr > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def paginate_keyset(query, keys, after=None, per_page=20):
+    """Executa uma página da query ordenada por `keys`.
+
+    `keys` é uma lista de (expressão, descending); a última deve ser única
+    (normalmente o id) para servir de desempate estável. Retorna
+    (itens, valores da última chave ou None se não houver próxima página).
+    """
+    if after is not None and len(after) == len(keys):
+        query = query.filter(_after_clause(keys, after))
+
+    order = [expr.desc() if descending else expr.asc() for expr, descending in keys]
+    labels = [expr.label(f'_k{i}') for i, (expr, _) in enumerate(keys)]
+    rows = query.add_columns(*labels).order_by(*order).limit(per_page + 1).all()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    items = [row[0] for row in rows]
+    last = list(rows[-1][1:]) if (rows and has_next) else None
+    return items, last
+
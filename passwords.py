@@ -0,0 +1,128 @@
+# passwords.py - Hash de senha com custo configurável
+#
+# O método segue o formato do Werkzeug ("scrypt:N:r:p" ou
+# "pbkdf2:sha256:iterações") e vem de PASSWORD_HASH_METHOD; o padrão é o
+# do Werkzeug. `flask calibrate-password-hash --target-ms 250` mede a
+# máquina e sugere o método que chega perto do tempo desejado.
+#
+# Hashes gravados com outro método (custo antigo ou outro algoritmo)
+# continuam válidos: `check_password` confere com os parâmetros gravados
+# no próprio hash e, se a senha estiver certa, devolve um hash novo no
+# método atual para o login gravar.
+import time
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+# abaixo disso o calibrador avisa (recomendações da OWASP)
+MINIMUM = {'scrypt': 2 ** 15, 'pbkdf2': 600_000}
+
+_method = DEFAULT_METHOD
+_dummy_hash = None
+
+
+def normalize_method(method):
+    """Método com todos os parâmetros explícitos (ex.: 'scrypt' -> 'scrypt:32768:8:1')."""
+    name, *args = (method or '').split(':')
+    if name == 'scrypt':
+        if not args:
+            return DEFAULT_METHOD
+        n, r, p = map(int, args)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        if len(args) > 2:
+            raise ValueError(f"Método de hash inválido: {method!r}")
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Método de hash inválido: {method!r}")
+
+
+def configure(method=None):
+    global _method, _dummy_hash
+    if method:
+        _method = normalize_method(method)
+        _dummy_hash = None
+
+
+def current_method():
+    return _method
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=_method)
+
+
+def needs_rehash(pwhash):
+    """True se o hash foi gerado com método/custo diferente do atual."""
+    try:
+        return normalize_method((pwhash or '').split('$', 1)[0]) != _method
+    except ValueError:
+        return True
+
+
+def check_password(pwhash, password):
+    """(senha confere, hash novo para gravar ou None).
+
+    Sem usuário (pwhash None) confere contra um hash fixo, para a resposta
+    levar o mesmo tempo e não revelar quais CPFs estão cadastrados.
+    """
+    global _dummy_hash
+    if not pwhash:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password('senha-inexistente')
+        check_password_hash(_dummy_hash, password)
+        return False, None
+    if not check_password_hash(pwhash, password):
+        return False, None
+    return True, (hash_password(password) if needs_rehash(pwhash) else None)
+
+
+# --------------------------
+# CALIBRAÇÃO
+# --------------------------
+def time_method(method, rounds=3):
+    """Mediana, em segundos, de `rounds` hashes com o método."""
+    timings = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        generate_password_hash('calibracao', method=method)
+        timings.append(time.perf_counter() - began)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(target_seconds, algorithm='scrypt', rounds=3):
+    """[(método, segundos)] medidos e o método escolhido: o mais caro que não passa do alvo."""
+    measured = []
+    if algorithm == 'scrypt':
+        # custo em potências de 2 (N); r=8, p=1. Memória = 128 * N * r
+        n = 2 ** 12
+        while n <= 2 ** 20:
+            method = f'scrypt:{n}:8:1'
+            seconds = time_method(method, rounds)
+            measured.append((method, seconds))
+            if seconds > target_seconds:
+                break
+            n *= 2
+    elif algorithm == 'pbkdf2':
+        # tempo é linear nas iterações: mede, extrapola e corrige uma vez
+        iterations = 100_000
+        for _ in range(3):
+            method = f'pbkdf2:sha256:{iterations}'
+            seconds = time_method(method, rounds)
+            measured.append((method, seconds))
+            iterations = max(10_000, int(iterations * target_seconds / seconds) // 10_000 * 10_000)
+        method = measured[-1][0]
+        return measured, method
+    else:
+        raise ValueError(f"Algoritmo desconhecido: {algorithm!r}")
+
+    within = [(m, s) for m, s in measured if s <= target_seconds]
+    chosen = within[-1][0] if within else measured[0][0]
+    return measured, chosen
+
+
+def below_minimum(method):
+    name, *args = normalize_method(method).split(':')
+    cost = int(args[0]) if name == 'scrypt' else int(args[1])
+    return cost < MINIMUM[name]
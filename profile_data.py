@@ -0,0 +1,371 @@
+# profile_data.py - Portfólio, serviços, tags e disponibilidade dos profissionais
+#
+# Antes eram colunas de Professional: JSON em texto (portfolio_photos,
+# services_offered) e texto livre (tags, availability), relidos a cada
+# acesso e impossíveis de filtrar ou indexar. Agora cada item é uma linha de
+# uma tabela filha (models.py); serviços e tags guardam também a forma
+# dobrada (minúscula, sem acento), indexada, usada pelos filtros da busca.
+#
+# A disponibilidade vira faixas por dia da semana, interpretadas do texto
+# ("Seg a Sex, 8h às 18h", "Noites e fins de semana", "Todos os dias").
+# Texto que não dá para interpretar ("Horário comercial", "Sob consulta")
+# não gera faixas (parse devolve None) e fica, como foi escrito, em
+# Professional.availability_note, exibido no lugar das faixas.
+import json
+import re
+
+from sqlalchemy import bindparam, column, inspect, select, table
+
+from models import (
+    PortfolioPhoto, ProfessionalAvailability, ProfessionalService, ProfessionalTag,
+)
+from search_index import fold
+
+MAX_TAGS = 20
+MAX_SERVICES = 30
+
+
+def key(value, size=60):
+    """Forma indexada de serviço/tag: 'Instalação  Elétrica' -> 'instalacao eletrica'."""
+    return ' '.join(fold(value).split())[:size]
+
+
+# --------------------------
+# TAGS E SERVIÇOS
+# --------------------------
+def split_tags(raw):
+    """Tags de um texto separado por vírgulas (ou lista), sem repetidas."""
+    items = raw.split(',') if isinstance(raw, str) else (raw or [])
+    tags, seen = [], set()
+    for item in items:
+        label = ' '.join(str(item).split())[:60]
+        if label and key(label) not in seen:
+            seen.add(key(label))
+            tags.append(label)
+    return tags[:MAX_TAGS]
+
+
+def service_names(raw):
+    """Nomes dos serviços no formato JSON antigo (lista de textos ou de dicts)."""
+    try:
+        services = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        services = [raw]
+    if not services:
+        return []
+    if not isinstance(services, list):
+        services = [services]
+    names, seen = [], set()
+    for service in services:
+        if isinstance(service, dict):
+            service = service.get('name') or service.get('title') or ' '.join(map(str, service.values()))
+        name = ' '.join(str(service).split())[:120]
+        if name and key(name, 120) not in seen:
+            seen.add(key(name, 120))
+            names.append(name)
+    return names[:MAX_SERVICES]
+
+
+def set_tags(prof, raw):
+    current = {t.tag: t for t in prof.tag_rows}
+    rows = []
+    for position, label in enumerate(split_tags(raw)):
+        row = current.get(key(label)) or ProfessionalTag(tag=key(label))
+        row.label, row.position = label, position
+        rows.append(row)
+    prof.tag_rows = rows
+
+
+def set_services(prof, names):
+    current = {s.name_key: s for s in prof.services}
+    rows = []
+    for position, name in enumerate(service_names(names)):
+        row = current.get(key(name, 120)) or ProfessionalService(name_key=key(name, 120))
+        row.name, row.position = name, position
+        rows.append(row)
+    prof.services = rows
+
+
+def add_portfolio_photos(prof, hashes):
+    start = len(prof.portfolio)
+    for offset, original in enumerate(hashes):
+        prof.portfolio.append(PortfolioPhoto(original=original, position=start + offset))
+
+
+# --------------------------
+# DISPONIBILIDADE
+# --------------------------
+WEEKDAYS = ('seg', 'ter', 'qua', 'qui', 'sex', 'sab', 'dom')
+WEEKDAY_LABELS = ('Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom')
+ALL_DAYS = frozenset(range(7))
+
+# chaves já sem as palavras de FILLER ("fins de semana" -> "fins semana")
+DAY_GROUPS = {
+    'todos os dias': ALL_DAYS,
+    'diariamente': ALL_DAYS,
+    'fins semana': frozenset({5, 6}),
+    'fim semana': frozenset({5, 6}),
+    'dias uteis': frozenset(range(5)),
+    'dias semana': frozenset(range(5)),
+}
+PERIODS = {
+    'manha': (8 * 60, 12 * 60), 'manhas': (8 * 60, 12 * 60),
+    'tarde': (13 * 60, 18 * 60), 'tardes': (13 * 60, 18 * 60),
+    'noite': (18 * 60, 22 * 60), 'noites': (18 * 60, 22 * 60),
+}
+FILLER = {'das', 'de', 'dos', 'aos', 'nas', 'na', 'no', 'em', 'partir'}
+
+_SEGMENTS = re.compile(r'[,;]|\s+e\s+')
+_HOURS = re.compile(
+    r'(\d{1,2})(?:[h:](\d{2})?)?\s*(?:as|a|ate|-)\s*(\d{1,2})(?:[h:](\d{2})?)?\s*h?'
+)
+_DAY = r'(seg|ter|qua|qui|sex|sab|dom)\w*(?:-feira)?'
+_DAYS = re.compile(rf'^{_DAY}(?:\s*(?:a|ate|-)\s*{_DAY})?$')
+
+
+def _minutes(hour, minute):
+    hour, minute = int(hour), int(minute or 0)
+    if hour > 24 or minute > 59:
+        raise ValueError
+    return hour * 60 + minute
+
+
+def _segment(text):
+    """(dias ou None, (início, fim) ou None) de um trecho; ValueError se não entender."""
+    hours = None
+    match = _HOURS.search(text)
+    if match:
+        hours = (_minutes(match[1], match[2]), _minutes(match[3], match[4]))
+        if hours[0] >= hours[1]:
+            raise ValueError
+        text = text[:match.start()] + ' ' + text[match.end():]
+    words = []
+    for word in text.split():
+        if word in PERIODS:
+            hours = hours or PERIODS[word]
+        elif word not in FILLER:
+            words.append(word)
+    # "a" sobrando nas pontas ("a partir das 8h às 12h"); no meio é "seg a sex"
+    while words and words[0] == 'a':
+        words.pop(0)
+    while words and words[-1] == 'a':
+        words.pop()
+    text = ' '.join(words)
+    if not text:
+        return None, hours
+    if text in DAY_GROUPS:
+        return DAY_GROUPS[text], hours
+    match = _DAYS.match(text)
+    if not match:
+        raise ValueError
+    first = WEEKDAYS.index(match[1])
+    last = WEEKDAYS.index(match[2]) if match[2] else first
+    if last < first:
+        raise ValueError
+    return frozenset(range(first, last + 1)), hours
+
+
+def parse_availability(raw):
+    """[(dia, início, fim)] (minutos; None = dia todo) ou None se não interpretável."""
+    text = fold(raw or '').strip()
+    if not text:
+        return []
+    slots, pending, last = set(), set(), None
+    try:
+        for segment in filter(None, (s.strip() for s in _SEGMENTS.split(text))):
+            days, hours = _segment(segment)
+            if days and hours:
+                slots |= {(d, *hours) for d in days}
+                last = days
+            elif days:
+                pending |= days
+            elif hours:
+                # "Seg a Sex, 8h às 12h e 14h às 18h": o horário vale para os
+                # dias anteriores (ou os do horário anterior; sem nenhum, todos)
+                last = pending or last or ALL_DAYS
+                slots |= {(d, *hours) for d in last}
+                pending = set()
+    except ValueError:
+        return None
+    slots |= {(d, None, None) for d in pending}
+    whole = {d for d, start, _ in slots if start is None}
+    return sorted(
+        ((d, start, end) for d, start, end in slots if start is None or d not in whole),
+        key=lambda s: (s[0], s[1] or 0),
+    )
+
+
+def _hour(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{hour}h{minute:02d}" if minute else f"{hour}h"
+
+
+def format_availability(slots):
+    """Texto de exibição das faixas: 'Seg a Sex, 8h às 18h; Sáb e Dom'."""
+    by_day = {}
+    for day, start, end in slots:
+        by_day.setdefault(day, []).append(None if start is None else (start, end))
+    if not by_day:
+        return ''
+    if set(by_day) == ALL_DAYS and all(v == [None] for v in by_day.values()):
+        return 'Todos os dias'
+    runs = []
+    for day in sorted(by_day):
+        ranges = tuple(sorted(by_day[day], key=lambda r: r or (0, 0)))
+        if runs and runs[-1][1] == day - 1 and runs[-1][2] == ranges:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day, ranges])
+    parts = []
+    for first, last, ranges in runs:
+        if first == last:
+            days = WEEKDAY_LABELS[first]
+        elif last == first + 1:
+            days = f"{WEEKDAY_LABELS[first]} e {WEEKDAY_LABELS[last]}"
+        else:
+            days = f"{WEEKDAY_LABELS[first]} a {WEEKDAY_LABELS[last]}"
+        hours = ' e '.join(f"{_hour(r[0])} às {_hour(r[1])}" for r in ranges if r)
+        parts.append(f"{days}, {hours}" if hours else days)
+    return '; '.join(parts)
+
+
+def availability_note(raw):
+    """O texto como veio, se não for interpretável (vai para availability_note); senão None."""
+    text = (raw or '').strip()
+    return text if text and parse_availability(text) is None else None
+
+
+def set_availability(prof, raw):
+    """Grava as faixas do texto; False se não for interpretável (aí guarda o texto)."""
+    slots = parse_availability(raw) or []
+    prof.availability_slots = [
+        ProfessionalAvailability(weekday=d, start_minute=start, end_minute=end) for d, start, end in slots
+    ]
+    prof.availability_note = availability_note(raw)
+    return prof.availability_note is None
+
+
+# --------------------------
+# GRAVAÇÃO EM MASSA (Core) E MIGRAÇÃO DAS COLUNAS ANTIGAS
+# --------------------------
+def child_rows(professional_id, photos=(), services=(), tags=(), availability=None):
+    """Linhas das tabelas filhas de um perfil: {tabela: [dict]}. Para executemany."""
+    rows = {
+        PortfolioPhoto.__table__: [],
+        ProfessionalService.__table__: [],
+        ProfessionalTag.__table__: [],
+        ProfessionalAvailability.__table__: [],
+    }
+    for position, photo in enumerate(photos or ()):
+        if isinstance(photo, dict):
+            original, variants = photo.get('original'), photo.get('variants')
+        else:
+            original, variants = photo, None  # entradas antigas: só a URL/hash do original
+        if original:
+            rows[PortfolioPhoto.__table__].append({
+                'professional_id': professional_id, 'position': position, 'original': original,
+                'variants': json.dumps(variants) if variants else None,
+            })
+    for position, name in enumerate(service_names(list(services or ()))):
+        rows[ProfessionalService.__table__].append({
+            'professional_id': professional_id, 'position': position, 'name': name, 'name_key': key(name, 120),
+        })
+    for position, label in enumerate(split_tags(tags)):
+        rows[ProfessionalTag.__table__].append({
+            'professional_id': professional_id, 'tag': key(label), 'label': label, 'position': position,
+        })
+    for day, start, end in parse_availability(availability) or ():
+        rows[ProfessionalAvailability.__table__].append({
+            'professional_id': professional_id, 'weekday': day, 'start_minute': start, 'end_minute': end,
+        })
+    return rows
+
+
+def insert_child_rows(connection, rows):
+    for target, values in rows.items():
+        if values:
+            connection.execute(target.insert(), values)
+
+
+LEGACY_COLUMNS = ('portfolio_photos', 'services_offered', 'tags', 'availability')
+
+
+def _json_list(raw):
+    try:
+        value = json.loads(raw or '[]')
+    except ValueError:
+        return [raw]
+    return value if isinstance(value, list) else [value]
+
+
+def migrate_legacy_columns(connection, batch=1000):
+    """Copia as colunas JSON/texto antigas de professionals para as tabelas filhas.
+
+    Perfis que já têm linhas numa tabela filha são pulados nela (pode rodar de
+    novo). As colunas antigas ficam no banco. Retorna as contagens.
+    """
+    existing = {c['name'] for c in inspect(connection).get_columns('professionals')}
+    legacy = [name for name in LEGACY_COLUMNS if name in existing]
+    counts = dict.fromkeys(('professionals', 'photos', 'services', 'tags', 'slots', 'unparsed_availability'), 0)
+    if not legacy:
+        return counts
+
+    done = {
+        model.__table__: set(connection.execute(select(model.professional_id).distinct()).scalars())
+        for model in (PortfolioPhoto, ProfessionalService, ProfessionalTag, ProfessionalAvailability)
+    }
+    professionals = table('professionals', column('id'), *[column(name) for name in legacy])
+    everything = connection.execute(select(professionals).order_by(professionals.c.id)).all()
+    for start in range(0, len(everything), batch):
+        chunk = everything[start:start + batch]
+        batch_rows = {target: [] for target in done}
+        for row in chunk:
+            values = row._mapping
+            availability = values.get('availability')
+            rows = child_rows(
+                row.id,
+                photos=_json_list(values.get('portfolio_photos')),
+                services=service_names(values.get('services_offered') or '[]'),
+                tags=values.get('tags'),
+                availability=availability,
+            )
+            if availability and availability.strip() and parse_availability(availability) is None:
+                counts['unparsed_availability'] += 1
+            for target, values_list in rows.items():
+                if row.id not in done[target]:
+                    batch_rows[target].extend(values_list)
+            counts['professionals'] += 1
+        insert_child_rows(connection, batch_rows)
+        counts['photos'] += len(batch_rows[PortfolioPhoto.__table__])
+        counts['services'] += len(batch_rows[ProfessionalService.__table__])
+        counts['tags'] += len(batch_rows[ProfessionalTag.__table__])
+        counts['slots'] += len(batch_rows[ProfessionalAvailability.__table__])
+    return counts
+
+
+def migrate_availability_notes(connection):
+    """Copia para availability_note a disponibilidade antiga que não virou faixas.
+
+    Só perfis sem faixas e sem nota (pode rodar de novo). Retorna quantos.
+    """
+    existing = {c['name'] for c in inspect(connection).get_columns('professionals')}
+    if 'availability' not in existing:
+        return 0
+    professionals = table('professionals', column('id'), column('availability'), column('availability_note'))
+    with_slots = select(ProfessionalAvailability.professional_id)
+    rows = connection.execute(
+        select(professionals.c.id, professionals.c.availability)
+        .where(professionals.c.availability_note.is_(None), professionals.c.id.not_in(with_slots))
+    ).all()
+    updates = []
+    for prof_id, raw in rows:
+        note = availability_note(raw)
+        if note:
+            updates.append({'_id': prof_id, 'note': note})
+    if updates:
+        connection.execute(
+            professionals.update().where(professionals.c.id == bindparam('_id'))
+            .values(availability_note=bindparam('note')),
+            updates,
+        )
+    return len(updates)
@@ -0,0 +1,288 @@
+# profiling.py - Instrumentação por requisição
+#
+# Para cada requisição mede o tempo total e quanto dele foi gasto em SQL
+# (nº de statements e tempo, via eventos da engine), renderização de
+# templates (sinais do Flask), chamadas HTTP externas (listeners do
+# http_client) e trechos marcados com `span('nome')` (ex.: hash de senha).
+#
+# Saídas:
+# - cabeçalho Server-Timing em toda resposta (SERVER_TIMING=0 desliga)
+# - /metrics no formato texto do Prometheus, por endpoint, mais as métricas
+#   do cliente HTTP e de `metric_sources`. Fechado por padrão: só com o
+#   Bearer METRICS_TOKEN ou para um admin logado; sem token configurado, os
+#   demais recebem 404 (com token, 401)
+# - opcional: uma fração PROFILE_SAMPLE_RATE das requisições roda sob
+#   cProfile (ou pyinstrument, se PROFILER=pyinstrument e instalado); as que
+#   passarem de PROFILE_SLOW_MS são gravadas em PROFILE_DIR
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Response, abort, g, has_request_context, request, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+
+from database import db
+
+log = logging.getLogger(__name__)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SEGMENTS = ('sql', 'template', 'http')
+
+
+def _current():
+    """Medições da requisição corrente, ou None (fora de requisição/sem profiler)."""
+    if not has_request_context():
+        return None
+    return g.get('_profile')
+
+
+@contextmanager
+def span(name):
+    """Soma o tempo do bloco ao segmento `name` da requisição corrente."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current = _current()
+        if current is not None:
+            spans = current['spans']
+            spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+# --------------------------
+# MÉTRICAS AGREGADAS
+# --------------------------
+class EndpointMetrics:
+    def __init__(self):
+        self.buckets = [0] * (len(REQUEST_BUCKETS) + 1)  # último = +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_count = 0
+        self.segments = {}  # nome -> segundos
+
+    def observe(self, seconds, sql_count, segments):
+        i = 0
+        while i < len(REQUEST_BUCKETS) and seconds > REQUEST_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.sql_count += sql_count
+        for name, value in segments.items():
+            self.segments[name] = self.segments.get(name, 0.0) + value
+
+
+def _halt(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class RequestProfiler:
+    def __init__(self, app=None, http_clients=()):
+        self.http_clients = list(http_clients)
+        self.metric_sources = []  # funções extras -> linhas do /metrics
+        self._metrics = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('SERVER_TIMING', os.environ.get('SERVER_TIMING', '1') != '0')
+        config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('PROFILE_SAMPLE_RATE', '0')))
+        config.setdefault('PROFILE_SLOW_MS', float(os.environ.get('PROFILE_SLOW_MS', '500')))
+        config.setdefault('PROFILE_DIR', os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles')))
+        config.setdefault('PROFILER', os.environ.get('PROFILER', 'cprofile'))
+        self.app = app
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._sql_started)
+            event.listen(db.engine, 'after_cursor_execute', self._sql_finished)
+            event.listen(db.engine, 'handle_error', self._sql_failed)
+        for client in self.http_clients:
+            client.listeners.append(self._http_finished)
+
+    # --------------------------
+    # COLETA
+    # --------------------------
+    def _start(self):
+        g._profile = {
+            'started': time.perf_counter(),
+            'sql_count': 0,
+            'spans': dict.fromkeys(SEGMENTS, 0.0),
+            'template_stack': [],
+            'profiler': self._maybe_start_profiler() if request.endpoint != 'metrics' else None,
+        }
+
+    def _sql_started(self, conn, cursor, statement, parameters, context, executemany):
+        current = _current()
+        if current is not None:
+            conn.info.setdefault('_profile_sql_started', []).append(time.perf_counter())
+
+    def _sql_finished(self, conn, cursor, statement, parameters, context, executemany):
+        current = _current()
+        starts = conn.info.get('_profile_sql_started')
+        if current is None or not starts:
+            return
+        current['sql_count'] += 1
+        current['spans']['sql'] += time.perf_counter() - starts.pop()
+
+    def _sql_failed(self, context):
+        # statement com erro não chega ao after_cursor_execute: tira o início
+        # da pilha da conexão, senão ela cresce e desalinha as próximas medidas
+        connection = context.connection
+        starts = connection.info.get('_profile_sql_started') if connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _template_started(self, sender, template, context, **extra):
+        current = _current()
+        if current is not None:
+            current['template_stack'].append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        current = _current()
+        if current is not None and current['template_stack']:
+            current['spans']['template'] += time.perf_counter() - current['template_stack'].pop()
+
+    def _http_finished(self, host, seconds, error):
+        current = _current()
+        if current is not None:
+            current['spans']['http'] += seconds
+
+    def _finish(self, response):
+        current = g.pop('_profile', None)
+        if current is None:
+            return response
+        total = time.perf_counter() - current['started']
+        profiler = current['profiler']
+        if profiler is not None:
+            self._stop_profiler(profiler, total)
+
+        endpoint = request.endpoint or 'unknown'
+        if endpoint != 'metrics':
+            with self._lock:
+                metrics = self._metrics.setdefault(endpoint, EndpointMetrics())
+                metrics.observe(total, current['sql_count'], current['spans'])
+
+        if self.app.config['SERVER_TIMING']:
+            parts = [f'sql;dur={current["spans"]["sql"] * 1000:.1f};desc="{current["sql_count"]} queries"']
+            parts += [f'{name};dur={seconds * 1000:.1f}'
+                      for name, seconds in current['spans'].items() if name != 'sql' and seconds]
+            parts.append(f'total;dur={total * 1000:.1f}')
+            response.headers.add('Server-Timing', ', '.join(parts))
+        return response
+
+    def _teardown(self, exc):
+        # exceção na view: after_request não roda, mas o profiler precisa parar
+        current = g.pop('_profile', None)
+        if current is not None and current['profiler'] is not None:
+            _halt(current['profiler'])
+
+    # --------------------------
+    # PROFILE AMOSTRADO
+    # --------------------------
+    def _maybe_start_profiler(self):
+        rate = self.app.config['PROFILE_SAMPLE_RATE']
+        if not rate or random.random() >= rate:
+            return None
+        if self.app.config['PROFILER'] == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler  # opcional
+            except ImportError:
+                pass
+            else:
+                profiler = Profiler()
+                profiler.start()
+                return profiler
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # outro profiler já ativo nesta thread
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler, total):
+        _halt(profiler)
+        is_cprofile = isinstance(profiler, cProfile.Profile)
+        if total * 1000 < self.app.config['PROFILE_SLOW_MS']:
+            return
+        directory = self.app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(directory, f'{stamp}-{name}-{total * 1000:.0f}ms')
+        try:
+            if is_cprofile:
+                profiler.dump_stats(path + '.prof')
+            else:
+                with open(path + '.html', 'w') as f:
+                    f.write(profiler.output_html())
+        except OSError:
+            log.exception("Falha ao gravar o profile em %s", path)
+
+    # --------------------------
+    # /metrics
+    # --------------------------
+    def prometheus_lines(self):
+        families = {
+            'app_request_duration_seconds': ('histogram', []),
+            'app_request_sql_queries_total': ('counter', []),
+            'app_request_segment_seconds_total': ('counter', []),
+        }
+        with self._lock:
+            snapshot = {k: (list(m.buckets), m.count, m.seconds, m.sql_count, dict(m.segments))
+                        for k, m in self._metrics.items()}
+        for endpoint, (buckets, count, seconds, sql_count, segments) in sorted(snapshot.items()):
+            label = f'endpoint="{_label(endpoint)}"'
+            histogram = families['app_request_duration_seconds'][1]
+            cumulative = 0
+            for le, n in zip([*map(str, REQUEST_BUCKETS), '+Inf'], buckets):
+                cumulative += n
+                histogram.append(f'app_request_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            histogram.append(f'app_request_duration_seconds_sum{{{label}}} {seconds:.6f}')
+            histogram.append(f'app_request_duration_seconds_count{{{label}}} {count}')
+            families['app_request_sql_queries_total'][1].append(f'app_request_sql_queries_total{{{label}}} {sql_count}')
+            for name, value in sorted(segments.items()):
+                families['app_request_segment_seconds_total'][1].append(
+                    f'app_request_segment_seconds_total{{{label},segment="{_label(name)}"}} {value:.6f}'
+                )
+        # cada família inteira sob sua linha TYPE, como o formato exige
+        lines = []
+        for family, (kind, samples) in families.items():
+            lines.append(f'# TYPE {family} {kind}')
+            lines.extend(samples)
+        for client in self.http_clients:
+            lines.extend(client.prometheus_lines())
+        for source in self.metric_sources:
+            lines.extend(source())
+        return lines
+
+    def metrics_view(self):
+        token = self.app.config['METRICS_TOKEN']
+        authorized = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+        if not authorized and getattr(current_user, 'user_type', None) != 'admin':
+            abort(401 if token else 404)
+        return Response('\n'.join(self.prometheus_lines()) + '\n',
+                        mimetype='text/plain; version=0.0.4')
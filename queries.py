@@ -0,0 +1,290 @@
+# queries.py - Consultas compartilhadas pelas views
+#
+# Cada função devolve uma query já com a estratégia de carregamento dos
+# relacionamentos que o template correspondente usa, para que a página
+# rode um número fixo de SELECTs (sem N+1 de lazy load por card/linha).
+import heapq
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import Float, case, cast, event, func, select
+from sqlalchemy.orm import contains_eager, joinedload
+
+from cache import VersionedCache, track_versions
+from database import db
+from models import (
+    User, Professional, ProfessionalRanking, ProfessionalService, ProfessionalTag, ServiceCategory, ServiceRequest,
+)
+import geo
+import profile_data
+import search_index
+
+
+# --------------------------
+# CATEGORIAS (dados de referência em cache)
+# --------------------------
+# Cópia leve e imutável de ServiceCategory: pode ser compartilhada entre
+# requisições sem ficar presa a uma sessão do SQLAlchemy.
+CategoryRef = namedtuple('CategoryRef', 'id name description image_hash')
+
+
+def _load_categories():
+    rows = (
+        db.session.query(
+            ServiceCategory.id, ServiceCategory.name,
+            ServiceCategory.description, ServiceCategory.image_hash,
+        )
+        .order_by(ServiceCategory.name)
+        .all()
+    )
+    return tuple(CategoryRef(*row) for row in rows)
+
+
+# qualquer gravação em ServiceCategory incrementa a versão "categories"
+track_versions(ServiceCategory, 'categories')
+categories_cache = VersionedCache('categories', _load_categories)
+
+
+def all_categories():
+    """Categorias ordenadas por nome, do cache (recarrega quando a versão muda)."""
+    return categories_cache.get()
+
+
+# --------------------------
+# PROFISSIONAIS (cards de index/search)
+# --------------------------
+def professional_cards_query():
+    """Professional + user + category no mesmo SELECT.
+
+    O JOIN com users é explícito (e reaproveitado via contains_eager) para
+    que os filtros por User.name/User.neighborhood usem a mesma junção.
+    A nota/contagem vêm das colunas agregadas, então reviews não é carregado.
+    """
+    return (
+        Professional.query
+        .join(Professional.user)
+        .options(
+            contains_eager(Professional.user),
+            joinedload(Professional.category),
+        )
+    )
+
+
+# --------------------------
+# FILTROS E ORDENAÇÃO DA BUSCA
+# --------------------------
+def _parse_price(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        # se preço inválido, ignora o filtro
+        return None
+
+
+NEAR_RADIUS_KM = 5.0
+NEAR_MAX_RADIUS_KM = 30.0
+
+
+def _parse_near(value):
+    """'me' (localização do usuário logado), um CEP de 8 dígitos ou ''."""
+    value = (value or '').strip().lower()
+    if value == 'me':
+        return value
+    digits = ''.join(c for c in value if c.isdigit())
+    return digits if len(digits) == 8 else ''
+
+
+def parse_search_filters(args):
+    """Normaliza os parâmetros da busca num dict simples (serializável)."""
+    category = (args.get('category') or '').strip()
+    filters = {
+        'name': (args.get('name') or '').strip(),
+        'category': int(category) if category.isdigit() else None,
+        'neighborhood': (args.get('neighborhood') or '').strip(),
+        # bairro exato (links da contagem por bairro, que agrupa pelo valor exato)
+        'bairro': (args.get('bairro') or '').strip(),
+        'min_price': _parse_price((args.get('min_price') or '').strip()),
+        'max_price': _parse_price((args.get('max_price') or '').strip()),
+        'near': _parse_near(args.get('near')),
+        # serviço/tag exatos, na forma dobrada (índices das tabelas filhas)
+        'service': profile_data.key(args.get('service') or '', 120),
+        'tag': profile_data.key(args.get('tag') or ''),
+    }
+    if filters['near']:
+        radius = _parse_price((args.get('radius') or '').strip()) or NEAR_RADIUS_KM
+        filters['radius'] = min(max(radius, 0.5), NEAR_MAX_RADIUS_KM)
+    return filters
+
+
+def apply_search_filters(query, filters, text_indexed=False):
+    """Aplica os filtros normalizados a uma query de professional_cards_query().
+
+    Com `text_indexed`, nome/bairro já foram resolvidos pelo índice de texto
+    (ver search_query) e o ILIKE é pulado.
+    """
+    if filters.get('name') and not text_indexed:
+        query = query.filter(User.name.ilike(f"%{filters['name']}%"))
+    if filters.get('category') is not None:
+        query = query.filter(Professional.category_id == filters['category'])
+    if filters.get('neighborhood') and not text_indexed:
+        query = query.filter(User.neighborhood.ilike(f"%{filters['neighborhood']}%"))
+    if filters.get('bairro'):
+        query = query.filter(User.neighborhood == filters['bairro'])
+    if filters.get('min_price') is not None:
+        query = query.filter(Professional.starting_price >= filters['min_price'])
+    if filters.get('max_price') is not None:
+        query = query.filter(Professional.starting_price <= filters['max_price'])
+    if filters.get('service'):
+        query = query.filter(Professional.id.in_(
+            select(ProfessionalService.professional_id).where(ProfessionalService.name_key == filters['service'])
+        ))
+    if filters.get('tag'):
+        query = query.filter(Professional.id.in_(
+            select(ProfessionalTag.professional_id).where(ProfessionalTag.tag == filters['tag'])
+        ))
+    return query
+
+
+# média calculada no banco a partir das colunas agregadas (0 sem avaliações)
+_average_rating = case(
+    (Professional.rating_count > 0,
+     cast(Professional.rating_sum, Float) / Professional.rating_count),
+    else_=0.0,
+)
+# sem preço informado vai para o fim da ordenação por preço
+_price = func.coalesce(Professional.starting_price, 1e12)
+
+# chaves de ordenação (expressão, descending); o id fecha como desempate
+SEARCH_SORTS = {
+    'relevance': [(_average_rating, True), (Professional.rating_count, True), (Professional.id, False)],
+    'price': [(_price, False), (Professional.id, False)],
+    'rating': [(_average_rating, True), (Professional.id, False)],
+    'newest': [(Professional.id, True)],
+}
+DEFAULT_SEARCH_SORT = 'relevance'
+
+
+def search_sort_keys(sort):
+    return SEARCH_SORTS.get(sort) or SEARCH_SORTS[DEFAULT_SEARCH_SORT]
+
+
+def search_query(filters, sort):
+    """Query filtrada da busca e suas chaves de ordenação.
+
+    O texto livre (`name`) e o bairro passam pelo índice de texto completo
+    quando ele existe; aí "relevância" passa a ser o rank do índice.
+    """
+    query = professional_cards_query()
+    match = search_index.text_match(
+        db.session.connection(), filters.get('name'), filters.get('neighborhood')
+    )
+    if match is not None:
+        query = query.join(match, match.c.professional_id == Professional.id)
+    query = apply_search_filters(query, filters, text_indexed=match is not None)
+
+    if match is not None and sort == 'relevance':
+        keys = [(match.c.rank, True), (Professional.id, False)]
+    else:
+        keys = search_sort_keys(sort)
+    return query, keys
+
+
+def nearby_professionals(filters, origin, radius_km, limit):
+    """Os `limit` profissionais mais próximos de `origin` (lat, lon) no raio: [(prof, km)].
+
+    Os demais filtros valem como na busca normal; o banco só devolve os
+    profissionais das células de geohash em volta do ponto (ver geo.py), e
+    só id + coordenadas: os cards são carregados depois, para os `limit`.
+    """
+    query, _ = search_query(filters, DEFAULT_SEARCH_SORT)
+    candidates = (
+        query.filter(geo.cells_filter(User.geohash, geo.covering_cells(*origin, radius_km)))
+        .with_entities(Professional.id, User.latitude, User.longitude)
+    )
+    ranked = []
+    for prof_id, latitude, longitude in candidates:
+        km = geo.distance_km(origin, (latitude, longitude))
+        if km <= radius_km:
+            ranked.append((km, prof_id))
+    nearest = heapq.nsmallest(limit, ranked)
+    if not nearest:
+        return []
+    cards = {p.id: p for p in professional_cards_query().filter(Professional.id.in_([i for _, i in nearest]))}
+    return [(cards[prof_id], km) for km, prof_id in nearest if prof_id in cards]
+
+
+def top_professionals(category_id=None, limit=6):
+    """Destaques pré-calculados (rankings.py) da categoria, ou gerais com None."""
+    rk = ProfessionalRanking
+    scope = rk.category_id.is_(None) if category_id is None else rk.category_id == category_id
+    return (
+        professional_cards_query()
+        .join(rk, rk.professional_id == Professional.id)
+        .filter(scope)
+        .order_by(rk.position)
+        .limit(limit)
+        .all()
+    )
+
+
+def professional_for_user(user_id):
+    """Perfil profissional do usuário com a categoria já carregada."""
+    return (
+        Professional.query
+        .options(joinedload(Professional.category))
+        .filter_by(user_id=user_id)
+        .first()
+    )
+
+
+# --------------------------
+# DASHBOARDS
+# --------------------------
+def professional_dashboard_requests(professional_id):
+    """Pedidos recebidos pelo profissional, com o cliente de cada um."""
+    return (
+        ServiceRequest.query
+        .options(joinedload(ServiceRequest.client))
+        .filter(ServiceRequest.professional_id == professional_id)
+        .order_by(ServiceRequest.created_at.desc())
+    )
+
+
+def client_dashboard_requests(client_id):
+    """Pedidos feitos pelo cliente, com profissional, usuário e categoria."""
+    prof = joinedload(ServiceRequest.professional)
+    return (
+        ServiceRequest.query
+        .options(
+            prof.joinedload(Professional.user),
+            prof.joinedload(Professional.category),
+        )
+        .filter(ServiceRequest.client_id == client_id)
+        .order_by(ServiceRequest.created_at.desc())
+    )
+
+
+# --------------------------
+# CONTAGEM DE SQL
+# --------------------------
+@contextmanager
+def count_queries(engine=None):
+    """Conta os statements executados no engine dentro do bloco.
+
+    Uso:
+        with count_queries() as counter:
+            client.get('/search')
+        print(counter['count'])
+    """
+    engine = engine or db.engine
+    counter = {'count': 0, 'statements': []}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+        counter['statements'].append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
@@ -0,0 +1,308 @@
+# rankings.py - "Profissionais em destaque" pré-calculados por categoria
+#
+# A home e as páginas de categoria mostram os profissionais mais bem
+# classificados; calcular isso por requisição passaria por todos os
+# profissionais e avaliações. Aqui a lista fica materializada na tabela
+# professional_rankings: TOP_N por categoria mais uma lista geral
+# (category_id NULL), lidas com um SELECT (queries.top_professionals).
+#
+# Pontuação: média bayesiana das notas (PRIOR_WEIGHT avaliações "fictícias"
+# com a média geral: um 5.0 com 1 avaliação não passa um 4.8 com 60) mais
+# um bônus de recência que cai pela metade a cada RECENCY_HALF_LIFE_DAYS
+# desde a última avaliação. Empates: mais avaliações, depois o mais novo.
+#
+# Listas: cada uma guarda LIST_SIZE = TOP_N + RESERVE posições (as telas
+# leem só TOP_N) e a média a priori usada no cálculo (prior_mean).
+#
+# Atualização:
+# - gravações de Review/Professional pelo ORM marcam os profissionais (e as
+#   categorias de onde saíram) na sessão; no commit update_professionals
+#   repontua só eles e os membros das listas em que entram, com a prior_mean
+#   gravada na lista, e reordena: trabalho limitado ao tamanho das listas,
+#   sem varrer a categoria. Quem cai abre vaga para a reserva; só quando a
+#   lista fica com menos de TOP_N e a categoria tem mais profissionais ela é
+#   recalculada inteira;
+# - a lista geral só é tocada quando algum profissional alterado está nela
+#   ou passa a pontuação do último colocado;
+# - exclusões em massa (accounts.py) chamam refresh_categories;
+# - `flask refresh-rankings` recalcula tudo (média a priori e recência
+#   incluídas). Agende (cron) diariamente: o bônus de recência muda com o
+#   tempo mesmo sem gravações.
+#
+# Concorrência: cada lista é reescrita sob a linha "rankings:<categoria>"
+# (ou "rankings:geral") de cache_versions (UPDATE = trava de linha até o
+# commit no PostgreSQL/MySQL; o SQLite já serializa escritas), sempre em
+# ordem de categoria e a geral por último, para não haver deadlock. Sem
+# isso, dois commits simultâneos em READ COMMITTED apagariam só as linhas
+# que enxergam e as duas inserções duplicariam a lista. Gravações em
+# categorias diferentes, fora da lista geral, não esperam umas pelas outras.
+#
+# A lista geral sai dos tops das categorias, mas com a pontuação recalculada
+# na hora (mesma média a priori e mesmo instante para todos): os scores
+# gravados nas categorias não recalculadas agora estariam defasados.
+import heapq
+from datetime import datetime
+
+from sqlalchemy import and_, delete, event, func, inspect, select, true
+from sqlalchemy.orm import Session, object_session
+
+from cache import bump_versions
+from models import Professional, ProfessionalRanking, Review, ServiceCategory
+
+TOP_N = 12
+RESERVE = 12                # posições além do TOP_N, para cobrir quem cai
+LIST_SIZE = TOP_N + RESERVE
+PRIOR_WEIGHT = 5
+DEFAULT_MEAN = 4.0          # média a priori enquanto não há avaliações
+RECENCY_WEIGHT = 0.5        # bônus máximo, em estrelas
+RECENCY_HALF_LIFE_DAYS = 90
+LOCK_NAME = 'rankings'      # prefixo das linhas de cache_versions usadas como trava
+
+
+def score(rating_sum, rating_count, last_review_at, prior_mean, now):
+    bayes = (PRIOR_WEIGHT * prior_mean + (rating_sum or 0)) / (PRIOR_WEIGHT + (rating_count or 0))
+    if last_review_at is None:
+        return bayes
+    days = max((now - last_review_at).total_seconds() / 86400, 0)
+    return bayes + RECENCY_WEIGHT * 0.5 ** (days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _rank_key(item):
+    # (score, nº de avaliações, id): maior primeiro
+    return item[1:]
+
+
+# --------------------------
+# CÁLCULO
+# --------------------------
+def prior_mean(connection):
+    p = Professional.__table__.c
+    total, count = connection.execute(select(func.sum(p.rating_sum), func.sum(p.rating_count))).one()
+    return total / count if count else DEFAULT_MEAN
+
+
+def _lock(connection, category_ids, overall=True):
+    """Trava as listas até o fim da transação (ver topo do módulo)."""
+    names = [f'{LOCK_NAME}:{category_id}' for category_id in sorted(category_ids)]
+    if overall:
+        names.append(f'{LOCK_NAME}:geral')
+    bump_versions(connection, names)
+
+
+def _scope(category_id):
+    rk = ProfessionalRanking.__table__.c
+    return rk.category_id.is_(None) if category_id is None else rk.category_id == category_id
+
+
+def _scored(connection, condition, mean, now):
+    """{category_id: [(professional_id, score, rating_count, id)]} dos profissionais."""
+    p, r = Professional.__table__.c, Review.__table__.c
+    last_review = (
+        select(func.max(r.created_at)).where(r.professional_id == p.id)
+        .scalar_subquery().label('last_review_at')
+    )
+    stmt = (
+        select(p.id, p.category_id, p.rating_sum, p.rating_count, last_review)
+        .where(p.category_id.isnot(None), condition)
+    )
+    groups = {}
+    for row in connection.execute(stmt):
+        value = score(row.rating_sum, row.rating_count, row.last_review_at, mean, now)
+        groups.setdefault(row.category_id, []).append((row.id, value, row.rating_count or 0, row.id))
+    return groups
+
+
+def _write(connection, category_id, ranked, mean, now):
+    rk = ProfessionalRanking.__table__
+    connection.execute(delete(rk).where(_scope(category_id)))
+    if ranked:
+        connection.execute(rk.insert(), [
+            {'category_id': category_id, 'position': position, 'professional_id': prof_id,
+             'score': value, 'prior_mean': mean, 'computed_at': now}
+            for position, (prof_id, value, _, _) in enumerate(ranked, start=1)
+        ])
+
+
+def _refresh_overall(connection, mean, now):
+    # cada profissional está em uma categoria: o top geral sai dos tops delas,
+    # repontuados agora para que todos sejam comparáveis
+    rk, p = ProfessionalRanking.__table__.c, Professional.__table__.c
+    candidates = select(rk.professional_id).where(rk.category_id.isnot(None))
+    groups = _scored(connection, p.id.in_(candidates), mean, now)
+    items = [item for group in groups.values() for item in group]
+    _write(connection, None, heapq.nlargest(LIST_SIZE, items, key=_rank_key), mean, now)
+
+
+def refresh_categories(connection, category_ids, now=None):
+    """Recalcula as listas das categorias informadas e a geral."""
+    ids = {c for c in category_ids if c is not None}
+    if not ids:
+        return 0
+    _lock(connection, ids)
+    now = now or datetime.utcnow()
+    mean = prior_mean(connection)
+    groups = _scored(connection, Professional.__table__.c.category_id.in_(list(ids)), mean, now)
+    for category_id in ids:
+        _write(connection, category_id, heapq.nlargest(LIST_SIZE, groups.get(category_id, []), key=_rank_key),
+               mean, now)
+    _refresh_overall(connection, mean, now)
+    return len(ids)
+
+
+def refresh_all(connection, now=None):
+    """Recalcula todas as listas (uso agendado/CLI). Retorna o nº de categorias."""
+    _lock(connection, connection.execute(select(ServiceCategory.__table__.c.id)).scalars().all())
+    now = now or datetime.utcnow()
+    mean = prior_mean(connection)
+    groups = _scored(connection, true(), mean, now)
+    connection.execute(delete(ProfessionalRanking.__table__))
+    for category_id, items in groups.items():
+        _write(connection, category_id, heapq.nlargest(LIST_SIZE, items, key=_rank_key), mean, now)
+    _refresh_overall(connection, mean, now)
+    return len(groups)
+
+
+def _members(connection, category_id):
+    """([professional_id] em ordem, prior_mean, menor score) da lista gravada."""
+    rk = ProfessionalRanking.__table__.c
+    rows = connection.execute(
+        select(rk.professional_id, rk.score, rk.prior_mean).where(_scope(category_id)).order_by(rk.position)
+    ).all()
+    if not rows:
+        return [], None, None
+    return [row.professional_id for row in rows], rows[0].prior_mean, rows[-1].score
+
+
+def _rerank(connection, category_id, ids, mean, now):
+    """Repontua `ids` (que sejam da lista) e regrava a lista. Devolve {id: score}."""
+    p = Professional.__table__.c
+    condition = p.id.in_(list(ids))
+    if category_id is not None:
+        condition = and_(condition, p.category_id == category_id)
+    items = [item for group in _scored(connection, condition, mean, now).values() for item in group]
+    ranked = heapq.nlargest(LIST_SIZE, items, key=_rank_key)
+    _write(connection, category_id, ranked, mean, now)
+    return len(ranked), {prof_id: value for prof_id, value, _, _ in items}
+
+
+def _short(connection, category_id, size):
+    # a reserva acabou: sobrou menos que TOP_N e há quem possa entrar?
+    if size >= TOP_N:
+        return False
+    p = Professional.__table__.c
+    condition = p.category_id.isnot(None) if category_id is None else p.category_id == category_id
+    return connection.execute(select(func.count()).where(condition)).scalar() > size
+
+
+def update_professionals(connection, professional_ids, category_ids=(), now=None):
+    """Reposiciona os profissionais alterados nas listas, sem recalcular as categorias.
+
+    `category_ids` são categorias de onde algum profissional saiu (troca de
+    categoria ou exclusão). Retorna o nº de listas reescritas.
+    """
+    changed = set(professional_ids) - {None}
+    categories = (set(category_ids) | categories_of(connection, changed)) - {None}
+    if not categories:
+        return 0
+    now = now or datetime.utcnow()
+    _lock(connection, categories, overall=False)
+    scores, short, mean = {}, [], None
+    for category_id in sorted(categories):
+        members, list_mean, _ = _members(connection, category_id)
+        if list_mean is None:
+            list_mean = mean = mean if mean is not None else prior_mean(connection)
+        size, fresh = _rerank(connection, category_id, set(members) | changed, list_mean, now)
+        scores.update(fresh)
+        if _short(connection, category_id, size):
+            short.append(category_id)
+    if short:
+        # recálculo completo dessas categorias, já com a lista geral
+        refresh_categories(connection, short, now)
+        return len(categories) + 1
+
+    members, list_mean, last = _members(connection, None)
+    touched = changed & set(members) or len(members) < LIST_SIZE or any(
+        value > last for prof_id, value in scores.items() if prof_id in changed
+    )
+    if not touched:
+        return len(categories)
+    _lock(connection, (), overall=True)
+    members, list_mean, _ = _members(connection, None)
+    if list_mean is None:
+        list_mean = mean if mean is not None else prior_mean(connection)
+    size, _ = _rerank(connection, None, set(members) | changed, list_mean, now)
+    if _short(connection, None, size):
+        _refresh_overall(connection, list_mean, now)
+    return len(categories) + 1
+
+
+def categories_of(connection, professional_ids):
+    ids = list(professional_ids)
+    if not ids:
+        return set()
+    p = Professional.__table__.c
+    return set(connection.execute(select(p.category_id).where(p.id.in_(ids)).distinct()).scalars())
+
+
+# --------------------------
+# ATUALIZAÇÃO INCREMENTAL
+# --------------------------
+def _pending(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault('rankings_pending', {'professionals': set(), 'categories': set()})
+
+
+@event.listens_for(Review, 'after_insert')
+@event.listens_for(Review, 'after_delete')
+def _review_written(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None:
+        pending['professionals'].add(target.professional_id)
+
+
+@event.listens_for(Review, 'after_update')
+def _review_changed(mapper, connection, target):
+    pending = _pending(target)
+    if pending is None:
+        return
+    state = inspect(target)
+    for attr in ('rating', 'professional_id', 'created_at'):
+        if state.attrs[attr].history.has_changes():
+            pending['professionals'].add(target.professional_id)
+            pending['professionals'].update(state.attrs.professional_id.history.deleted)
+            return
+
+
+@event.listens_for(Professional, 'after_insert')
+@event.listens_for(Professional, 'after_delete')
+def _professional_written(mapper, connection, target):
+    pending = _pending(target)
+    if pending is not None:
+        pending['professionals'].add(target.id)
+        pending['categories'].add(target.category_id)
+
+
+@event.listens_for(Professional, 'after_update')
+def _professional_changed(mapper, connection, target):
+    pending = _pending(target)
+    history = inspect(target).attrs.category_id.history
+    if pending is not None and history.has_changes():
+        pending['professionals'].add(target.id)
+        pending['categories'].update(history.deleted)
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_pending(session):
+    # uma vez por transação, não a cada flush: grava o que falta e reposiciona
+    session.flush()
+    pending = session.info.pop('rankings_pending', None)
+    if not pending:
+        return
+    update_professionals(session.connection(), pending['professionals'], pending['categories'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('rankings_pending', None)
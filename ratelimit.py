@@ -0,0 +1,255 @@
+# ratelimit.py - Limite de requisições por IP / por CPF
+#
+# Duas regras, ambas O(1) por checagem (um item de estado por chave):
+# - TokenBucket: `burst` fichas, repostas a `rate` por segundo; cada
+#   requisição gasta uma. Permite rajadas curtas e limita a média.
+# - SlidingWindow: no máximo `limit` requisições em `window` segundos,
+#   estimado com o contador da janela atual + o da anterior proporcional
+#   ao quanto dela ainda cai dentro da janela deslizante.
+#
+# O estado fica num store: memória do processo (padrão; LRU limitado) ou
+# Redis (pacote `redis`, opcional), que vale para todos os workers.
+# RATELIMIT_BACKEND = memory | redis | none (none desliga).
+#
+# Uso, abaixo do @app.route:
+#
+#     @limiter.limit(TokenBucket('login-ip', rate=10 / 60, burst=10, key=client_ip),
+#                    methods=('POST',), on_limit=...)
+#
+# Excedido o limite, a view não roda: a resposta é 429 com Retry-After
+# (corpo JSON, ou o que `on_limit` devolver). As regras são conferidas
+# antes de gastar: uma requisição barrada por uma regra não consome as demais.
+#
+# A chave por IP usa request.remote_addr: atrás de proxy, o app precisa do
+# ProxyFix (PROXY_FIX_X_FOR em app.py), senão todos os clientes dividem o
+# IP do proxy e o limite vira global.
+import math
+import re
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+from cache import TTLCache
+
+
+# --------------------------
+# CHAVES
+# --------------------------
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def form_cpf():
+    """Dígitos do CPF enviado no formulário (None se não houver: regra não se aplica)."""
+    digits = re.sub(r'\D', '', request.form.get('cpf') or '')
+    return digits or None
+
+
+# --------------------------
+# REGRAS
+# --------------------------
+class TokenBucket:
+    def __init__(self, name, rate, burst, key=client_ip):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+
+    def check(self, store, key, consume=True):
+        return store.take(f'{self.name}:{key}', self.rate, self.burst, consume)
+
+
+class SlidingWindow:
+    def __init__(self, name, limit, window, key=client_ip):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.key = key
+
+    def check(self, store, key, consume=True):
+        return store.hit(f'{self.name}:{key}', self.limit, self.window, consume)
+
+
+# --------------------------
+# STORES
+# --------------------------
+# take/hit devolvem 0 se a requisição passa, ou os segundos até poder tentar
+# de novo; com consume=False só conferem, sem gastar
+class MemoryStore:
+    def __init__(self, maxsize=100_000):
+        self._state = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, consume=True):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._state.get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            if not consume:
+                return 0
+            # depois de burst/rate segundos o balde está cheio: igual a não existir
+            self._state.set(key, (tokens - 1, now), ttl=burst / rate)
+        return 0
+
+    def hit(self, key, limit, window, consume=True):
+        now = time.time()
+        start = now - now % window
+        with self._lock:
+            current_start, current, previous = self._state.get(key) or (start, 0, 0)
+            if current_start != start:
+                previous = current if current_start == start - window else 0
+                current = 0
+            weight = 1 - (now - start) / window
+            if previous * weight + current + 1 > limit:
+                return _window_retry_after(now, start, window, limit, current, previous)
+            if not consume:
+                return 0
+            self._state.set(key, (start, current + 1, previous), ttl=2 * window)
+        return 0
+
+    def clear(self):
+        self._state.clear()
+
+
+def _window_retry_after(now, start, window, limit, current, previous):
+    if current + 1 > limit or not previous:
+        return start + window - now
+    # instante em que o peso da janela anterior cai o bastante
+    return max(0.0, start + window * (1 - (limit - 1 - current) / previous) - now)
+
+
+class RedisStore:
+    """Mesmas regras em scripts Lua (atômicos), compartilhadas entre workers."""
+
+    TAKE = """
+    local burst = tonumber(ARGV[2])
+    local rate = tonumber(ARGV[1])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 't', 'u')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    if tokens < 1 then return tostring((1 - tokens) / rate) end
+    if ARGV[4] == '0' then return '0' end
+    redis.call('HSET', KEYS[1], 't', tokens - 1, 'u', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate))
+    return '0'
+    """
+
+    HIT = """
+    local limit = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local start = now - math.fmod(now, window)
+    local current = tonumber(redis.call('GET', KEYS[1] .. ':' .. start)) or 0
+    local previous = tonumber(redis.call('GET', KEYS[1] .. ':' .. (start - window))) or 0
+    if previous * (1 - (now - start) / window) + current + 1 > limit then
+        return {'1', tostring(start), tostring(current), tostring(previous)}
+    end
+    if ARGV[4] == '0' then return {'0'} end
+    redis.call('INCR', KEYS[1] .. ':' .. start)
+    redis.call('EXPIRE', KEYS[1] .. ':' .. start, 2 * window)
+    return {'0'}
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis  # opcional: só é exigido quando este backend é usado
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(self.TAKE)
+        self._hit = self.client.register_script(self.HIT)
+
+    def take(self, key, rate, burst, consume=True):
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst, time.time(), int(consume)]))
+
+    def hit(self, key, limit, window, consume=True):
+        now = time.time()
+        result = self._hit(keys=[self.prefix + key], args=[limit, window, now, int(consume)])
+        if result[0] in (b'0', '0'):
+            return 0
+        start, current, previous = (float(v) for v in result[1:])
+        return _window_retry_after(now, start, window, limit, current, previous)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def store_from_config(config):
+    kind = config.get('RATELIMIT_BACKEND', 'memory')
+    if kind == 'none':
+        return None
+    if kind == 'redis':
+        return RedisStore(config['RATELIMIT_URL'])
+    return MemoryStore()
+
+
+# --------------------------
+# LIMITADOR
+# --------------------------
+class RateLimiter:
+    def __init__(self, app=None, store=None):
+        self.store = store
+        self.limited = {}  # regra -> nº de respostas 429
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.store is None:
+            self.store = store_from_config(app.config)
+
+    def check(self, rules):
+        """Segundos até liberar (a maior espera entre as regras violadas) ou 0.
+
+        Primeiro confere todas as regras sem gastar; só se todas deixam passar
+        a requisição é descontada de cada uma. Assim uma regra que barra (ex.:
+        o CPF) não gasta as fichas das outras (ex.: o IP).
+        """
+        keyed = [(rule, key) for rule in rules for key in (rule.key(),) if key is not None]
+        wait = self._denied(keyed, consume=False)
+        if not wait:
+            # entre a conferência e o gasto outra requisição pode ter passado
+            wait = self._denied(keyed, consume=True)
+        return wait
+
+    def _denied(self, keyed, consume):
+        wait = 0
+        for rule, key in keyed:
+            retry_after = rule.check(self.store, key, consume)
+            if retry_after:
+                with self._lock:
+                    self.limited[rule.name] = self.limited.get(rule.name, 0) + 1
+                wait = max(wait, retry_after)
+        return wait
+
+    def limit(self, *rules, methods=None, on_limit=None):
+        """Decorator de view: aplica as regras (todas) antes de chamar a view."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.store is None or (methods and request.method not in methods):
+                    return view(*args, **kwargs)
+                wait = self.check(rules)
+                if not wait:
+                    return view(*args, **kwargs)
+                if on_limit is not None:
+                    response = make_response(on_limit())
+                else:
+                    response = make_response(jsonify({'error': 'Muitas requisições. Tente novamente mais tarde.'}))
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+                return response
+            return wrapper
+        return decorator
+
+    def prometheus_lines(self):
+        lines = ['# TYPE app_ratelimit_limited_total counter']
+        with self._lock:
+            snapshot = sorted(self.limited.items())
+        lines += [f'app_ratelimit_limited_total{{rule="{name}"}} {count}' for name, count in snapshot]
+        return lines
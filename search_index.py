@@ -0,0 +1,248 @@
+# search_index.py - Índice de texto completo dos profissionais
+#
+# SQLite: tabela virtual FTS5 (professional_fts, rowid = professionals.id).
+# PostgreSQL: tabela professional_search com colunas tsvector e índice GIN.
+#
+# O texto é "dobrado" (minúsculo, sem acentos) antes de indexar e de buscar,
+# então "joao" encontra "João" nos dois bancos. O índice é atualizado pelos
+# eventos de Professional/User (e das tags/serviços do perfil) no mesmo
+# flush que grava o perfil; rode
+# `flask rebuild-search-index` para criar/popular em um banco existente.
+import re
+import unicodedata
+
+from sqlalchemy import Float, Integer, event, inspect, select, text
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models import User, Professional, ProfessionalService, ProfessionalTag
+
+FTS_TABLE = 'professional_fts'
+PG_TABLE = 'professional_search'
+
+
+# --------------------------
+# TEXTO
+# --------------------------
+def fold(value):
+    """Minúsculas e sem acentos: 'Conceição' -> 'conceicao'."""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(value):
+    return re.findall(r'\w+', fold(value))
+
+
+def _document(name, bio, extra):
+    return fold(' '.join(filter(None, [name, bio, extra])))
+
+
+# --------------------------
+# BACKEND
+# --------------------------
+def dialect_name(bind):
+    return bind.dialect.name
+
+
+# por engine, com validade: o índice pode ser criado por outro processo
+# (`flask rebuild-search-index`) com a aplicação no ar
+AVAILABLE_TTL = 60  # segundos
+_available = TTLCache(maxsize=16, ttl=AVAILABLE_TTL)
+
+
+def available(connection):
+    """True se a tabela do índice existe neste banco (memoizado por AVAILABLE_TTL)."""
+    engine = connection.engine
+    found = _available.get(engine)
+    if found is None:
+        table = PG_TABLE if dialect_name(connection) == 'postgresql' else FTS_TABLE
+        found = inspect(connection).has_table(table)
+        _available.set(engine, found)
+    return found
+
+
+def ensure_index(connection):
+    """Cria a estrutura do índice se não existir."""
+    if dialect_name(connection) == 'postgresql':
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            " professional_id INTEGER PRIMARY KEY REFERENCES professionals(id) ON DELETE CASCADE,"
+            " document TSVECTOR NOT NULL,"
+            " neighborhood TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{PG_TABLE}_document ON {PG_TABLE} USING GIN (document)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{PG_TABLE}_neighborhood ON {PG_TABLE} USING GIN (neighborhood)"
+        ))
+    else:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            " document, neighborhood, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    _available.set(connection.engine, True)
+
+
+# --------------------------
+# MANUTENÇÃO
+# --------------------------
+def _rows_for(connection, professional_ids):
+    p, u = Professional.__table__.c, User.__table__.c
+    stmt = (
+        select(p.id, u.name, u.neighborhood, p.bio)
+        .join_from(Professional.__table__, User.__table__, p.user_id == u.id)
+    )
+    if professional_ids is not None:
+        stmt = stmt.where(p.id.in_(list(professional_ids)))
+    return connection.execute(stmt).all()
+
+
+def _profile_texts(connection, professional_ids):
+    """{id do profissional: tags e serviços em um texto só}."""
+    texts = {}
+    for model, label in ((ProfessionalTag, ProfessionalTag.label), (ProfessionalService, ProfessionalService.name)):
+        stmt = select(model.professional_id, label)
+        if professional_ids is not None:
+            stmt = stmt.where(model.professional_id.in_(list(professional_ids)))
+        for prof_id, value in connection.execute(stmt):
+            texts.setdefault(prof_id, []).append(value)
+    return {prof_id: ' '.join(values) for prof_id, values in texts.items()}
+
+
+def remove_professionals(connection, professional_ids):
+    ids = list(professional_ids)
+    if not ids or not available(connection):
+        return
+    if dialect_name(connection) == 'postgresql':
+        stmt = text(f"DELETE FROM {PG_TABLE} WHERE professional_id = :id")
+    else:
+        stmt = text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id")
+    connection.execute(stmt, [{'id': i} for i in ids])
+
+
+def reindex_professionals(connection, professional_ids=None):
+    """(Re)indexa os profissionais informados (ou todos, com None)."""
+    if not available(connection):
+        return 0
+    rows = _rows_for(connection, professional_ids)
+    texts = _profile_texts(connection, professional_ids)
+    if professional_ids is None:
+        connection.execute(text(
+            f"DELETE FROM {PG_TABLE}" if dialect_name(connection) == 'postgresql' else f"DELETE FROM {FTS_TABLE}"
+        ))
+    else:
+        remove_professionals(connection, [r.id for r in rows])
+    if not rows:
+        return 0
+
+    params = [
+        {
+            'id': r.id,
+            'document': _document(r.name, r.bio, texts.get(r.id)),
+            'neighborhood': fold(r.neighborhood),
+        }
+        for r in rows
+    ]
+    if dialect_name(connection) == 'postgresql':
+        stmt = text(
+            f"INSERT INTO {PG_TABLE} (professional_id, document, neighborhood) VALUES "
+            "(:id, to_tsvector('portuguese', :document), to_tsvector('simple', :neighborhood))"
+        )
+    else:
+        stmt = text(f"INSERT INTO {FTS_TABLE} (rowid, document, neighborhood) VALUES (:id, :document, :neighborhood)")
+    connection.execute(stmt, params)
+    return len(params)
+
+
+def rebuild(connection):
+    ensure_index(connection)
+    return reindex_professionals(connection, None)
+
+
+INDEXED_FIELDS = ('user_id', 'bio')
+
+
+@event.listens_for(Professional, 'after_insert')
+def _professional_created(mapper, connection, target):
+    reindex_professionals(connection, [target.id])
+
+
+@event.listens_for(Professional, 'after_update')
+def _professional_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[f].history.has_changes() for f in INDEXED_FIELDS):
+        reindex_professionals(connection, [target.id])
+
+
+@event.listens_for(Professional, 'after_delete')
+def _professional_deleted(mapper, connection, target):
+    remove_professionals(connection, [target.id])
+
+
+@event.listens_for(Session, 'after_flush')
+def _profile_items_changed(session, flush_context):
+    # tags/serviços: um reindex por perfil, não por linha gravada
+    ids = {
+        obj.professional_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (ProfessionalTag, ProfessionalService))
+    }
+    ids.discard(None)
+    if ids:
+        reindex_professionals(session.connection(), ids)
+
+
+@event.listens_for(User, 'after_update')
+def _user_changed(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.name.history.has_changes() or state.attrs.neighborhood.history.has_changes()):
+        return
+    prof_id = connection.execute(
+        select(Professional.__table__.c.id).where(Professional.__table__.c.user_id == target.id)
+    ).scalar()
+    if prof_id is not None:
+        reindex_professionals(connection, [prof_id])
+
+
+# --------------------------
+# CONSULTA
+# --------------------------
+def text_match(connection, terms=None, neighborhood=None):
+    """Subquery (professional_id, rank) dos profissionais que casam com a busca.
+
+    `rank` cresce com a relevância nos dois bancos. Retorna None se não houver
+    termos ou se o índice não existir (o chamador cai no filtro ILIKE).
+    """
+    words = tokenize(terms)
+    places = tokenize(neighborhood)
+    if not (words or places) or not available(connection):
+        return None
+
+    if dialect_name(connection) == 'postgresql':
+        conditions, params = [], {}
+        if words:
+            conditions.append("document @@ to_tsquery('portuguese', :q)")
+            params['q'] = ' & '.join(f"{w}:*" for w in words)
+        if places:
+            conditions.append("neighborhood @@ to_tsquery('simple', :n)")
+            params['n'] = ' & '.join(f"{w}:*" for w in places)
+        rank = "ts_rank(document, to_tsquery('portuguese', :q))" if words else "0.0"
+        sql = (
+            f"SELECT professional_id, {rank} AS rank FROM {PG_TABLE} "
+            f"WHERE {' AND '.join(conditions)}"
+        )
+    else:
+        clauses = [f'document : "{w}"*' for w in words] + [f'neighborhood : "{w}"*' for w in places]
+        params = {'q': ' AND '.join(clauses)}
+        # bm25: menor = mais relevante; invertido para "maior = melhor"
+        sql = f"SELECT rowid AS professional_id, -bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"
+
+    return (
+        text(sql).bindparams(**params)
+        .columns(professional_id=Integer(), rank=Float())
+        .subquery('text_match')
+    )
@@ -0,0 +1,433 @@
+# seed_bulk.py - Gerador de massa de dados sintética para testes de carga
+#
+# Gera clientes, profissionais, pedidos e avaliações em volume de produção
+# (milhões de linhas) com distribuições plausíveis: bairros de Garanhuns
+# com pesos diferentes, preço por categoria em log-normal, poucos
+# profissionais concentrando a maioria dos pedidos e notas puxadas para 5.
+#
+# As linhas são geradas sob demanda e gravadas com INSERTs em lote
+# (executemany) em transações de --chunk linhas; nada é montado inteiro
+# em memória. Mesma --seed = mesmos dados. Como os INSERTs não passam pelo
+# ORM, ao final os agregados de avaliação, o índice de texto, os destaques
+# por categoria e as versões de cache são recalculados de uma vez.
+#
+#   python seed_bulk.py --clients 1000000 --professionals 50000 --requests 3000000
+#   python seed_bulk.py --reset --seed 7          # apaga tudo antes
+import argparse
+import math
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from app import app, db
+from models import Professional, Review, ServiceCategory, ServiceRequest, User, reconcile_ratings
+from cache import bump_versions
+import geo
+import migrations
+import profile_data
+import rankings
+import search_index
+
+# data de referência fixa: a mesma seed gera as mesmas datas
+BASE_DATE = datetime(2025, 1, 1)
+HISTORY_DAYS = 730
+
+# bairro -> peso (aprox. proporcional à população)
+NEIGHBORHOODS = {
+    'Heliópolis': 12, 'Boa Vista': 11, 'Centro': 10, 'Magano': 8,
+    'Aloísio Pinto': 8, 'José Maria Dourado': 6, 'Santo Antônio': 6,
+    'Severiano Moraes Filho': 5, 'Francisco Figueira': 5, 'São José': 5,
+    'Dom Hélder Câmara': 4, 'Novo Heliópolis': 4, 'Dom Thiago Postma': 3,
+    'Indiano': 3, 'Brasília': 3, 'Liberdade': 2, 'Parque Fênix': 2,
+    'Jardim Petrópolis': 2, 'Cohab I': 2, 'Cohab II': 2, 'Cohab III': 2,
+}
+
+STREETS = (
+    'Rua Dr. José Mariano', 'Avenida Santo Antônio', 'Rua Quinze de Novembro',
+    'Avenida Rui Barbosa', 'Rua Sete de Setembro', 'Avenida Caruaru',
+    'Rua Francisco Madeiros', 'Avenida Frei Caneca', 'Rua Dantas Barreto',
+    'Rua do Sol', 'Rua Padre Agobar Valença', 'Rua Joaquim Távora',
+)
+
+FIRST_NAMES = (
+    'Ana', 'Maria', 'José', 'João', 'Antônio', 'Francisco', 'Carlos', 'Paulo',
+    'Pedro', 'Lucas', 'Luiz', 'Marcos', 'Gabriel', 'Rafael', 'Daniel', 'Marcelo',
+    'Bruno', 'Eduardo', 'Felipe', 'Juliana', 'Mariana', 'Fernanda', 'Patrícia',
+    'Aline', 'Camila', 'Amanda', 'Bruna', 'Jéssica', 'Letícia', 'Larissa',
+    'Sandra', 'Cícero', 'Severino', 'Josefa', 'Luzia', 'Raimundo', 'Edvaldo',
+)
+
+SURNAMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira',
+    'Costa', 'Rodrigues', 'Almeida', 'Nascimento', 'Alves', 'Carvalho',
+    'Araújo', 'Ribeiro', 'Cavalcanti', 'Barbosa', 'Gomes', 'Tenório',
+    'Bezerra', 'Monteiro', 'Wanderley', 'Albuquerque', 'Siqueira',
+)
+
+# categoria -> (peso, preço mediano, serviços, tags)
+CATEGORIES = {
+    'Reformas e Reparos': (25, 150, ('Pintura', 'Alvenaria', 'Instalação elétrica', 'Encanamento', 'Reboco', 'Troca de piso'),
+                           ('pedreiro', 'pintor', 'eletricista', 'encanador')),
+    'Serviços Domésticos': (22, 90, ('Faxina', 'Passadoria', 'Jardinagem', 'Organização', 'Limpeza pós-obra'),
+                            ('diarista', 'faxina', 'jardineiro', 'limpeza')),
+    'Tecnologia': (10, 250, ('Formatação', 'Manutenção de notebook', 'Criação de site', 'Redes Wi-Fi'),
+                   ('informática', 'sites', 'suporte', 'redes')),
+    'Aulas Particulares': (12, 60, ('Reforço escolar', 'Inglês', 'Matemática', 'Violão', 'Redação ENEM'),
+                           ('professor', 'aulas', 'idiomas', 'música')),
+    'Beleza e Estética': (14, 70, ('Corte', 'Escova', 'Manicure', 'Maquiagem', 'Design de sobrancelha'),
+                          ('cabeleireira', 'manicure', 'maquiadora', 'estética')),
+    'Saúde e Bem-estar': (7, 120, ('Personal trainer', 'Massagem', 'Nutrição', 'Fisioterapia domiciliar'),
+                          ('personal', 'massagista', 'nutricionista', 'fisioterapia')),
+    'Eventos': (6, 400, ('Fotografia', 'Buffet', 'Som e iluminação', 'Decoração', 'Bolo de festa'),
+                ('fotógrafo', 'buffet', 'festas', 'decoração')),
+    'Transporte': (4, 180, ('Frete', 'Mudança', 'Motorista particular', 'Entrega expressa'),
+                   ('frete', 'mudança', 'motorista', 'carreto')),
+}
+
+AVAILABILITY = ('Seg a Sex, 8h às 18h', 'Seg a Sáb, 7h às 17h', 'Fins de semana', 'Todos os dias', 'Noites e fins de semana')
+RESPONSE_TIMES = ('1 hora', '2 horas', '12 horas', '24 horas', '48 horas')
+
+# status do pedido -> peso; só pedidos concluídos podem ser avaliados
+STATUSES = {'pendente': 15, 'aceito': 10, 'concluido': 65, 'recusado': 10}
+
+COMMENTS = {
+    1: ('Não compareceu no horário combinado.', 'Serviço mal feito, tive que refazer.'),
+    2: ('Demorou mais que o combinado.', 'Resultado abaixo do esperado.'),
+    3: ('Serviço ok, mas poderia ser mais caprichado.', 'Razoável.'),
+    4: ('Bom trabalho, recomendo!', 'Atencioso e pontual.'),
+    5: ('Excelente profissional! Muito pontual e trabalho de qualidade.', 'Superou as expectativas.', 'Nota 10!'),
+}
+
+
+# --------------------------
+# HELPERS
+# --------------------------
+def weighted(rng, options):
+    """Sorteador por peso: devolve uma função sem argumentos."""
+    values = list(options)
+    cum_weights = list(accumulate(options.values()))
+    total = cum_weights[-1]
+    return lambda: values[bisect(cum_weights, rng.random() * total)]
+
+
+def cpf_for(n):
+    """CPF válido e único derivado de n (com dígitos verificadores)."""
+    digits = [int(d) for d in f"{200_000_000 + n:09d}"]
+    for size in (9, 10):
+        total = sum(d * w for d, w in zip(digits, range(size + 1, 1, -1)))
+        digits.append(total * 10 % 11 % 10)
+    s = ''.join(map(str, digits))
+    return f"{s[:3]}.{s[3:6]}.{s[6:9]}-{s[9:]}"
+
+
+def cep_for(rng):
+    return f"{rng.randint(55290000, 55299999)}"
+
+
+def random_past(rng):
+    # mais recentes são mais frequentes (crescimento da base)
+    return BASE_DATE - timedelta(days=HISTORY_DAYS * rng.random() ** 1.6, seconds=rng.randrange(86400))
+
+
+def next_id(connection, model):
+    return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Progress:
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def add(self, n):
+        self.done += n
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        print(f"\r  {self.label}: {self.done:,}/{self.total:,} ({rate:,.0f} linhas/s)", end='', flush=True)
+
+    def finish(self):
+        print()
+
+
+# --------------------------
+# GERADORES
+# --------------------------
+class Generator:
+    def __init__(self, seed, password_hash):
+        self.rng = random.Random(seed)
+        self.password_hash = password_hash
+        self.neighborhood = weighted(self.rng, NEIGHBORHOODS)
+        self.category_name = weighted(self.rng, {name: c[0] for name, c in CATEGORIES.items()})
+        self.status = weighted(self.rng, STATUSES)
+        # gerador separado: as coordenadas não mudam o resto da massa de um seed
+        self.geo_rng = random.Random(seed + 1)
+        self.centroids = geo.Centroids.load()
+
+    def coordinates(self, neighborhood):
+        """Centróide do bairro com até ~500 m de desvio (endereços diferentes)."""
+        point = self.centroids.locate(neighborhood=neighborhood, city='Garanhuns', state='PE')
+        if point is None:
+            return {'latitude': None, 'longitude': None, 'geohash': None}
+        lat = point[0] + self.geo_rng.uniform(-0.0045, 0.0045)
+        lon = point[1] + self.geo_rng.uniform(-0.0045, 0.0045)
+        return {'latitude': lat, 'longitude': lon, 'geohash': geo.encode(lat, lon)}
+
+    def user(self, user_id, user_type):
+        rng = self.rng
+        first, last = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+        user = {
+            'id': user_id,
+            'name': f"{first} {rng.choice(SURNAMES)} {last}",
+            'cpf': cpf_for(user_id),
+            'email': f"{user_type[0]}{user_id}@example.com",
+            'phone': f"(87) 9{rng.randint(8000, 9999)}-{rng.randint(0, 9999):04d}",
+            'password_hash': self.password_hash,
+            'user_type': user_type,
+            'cep': cep_for(rng),
+            'address': f"{rng.choice(STREETS)}, {rng.randint(1, 2500)}",
+            'neighborhood': self.neighborhood(),
+            'city': 'Garanhuns',
+            'state': 'PE',
+            'created_at': random_past(rng),
+        }
+        user.update(self.coordinates(user['neighborhood']))
+        return user
+
+    def professional(self, prof_id, user_id, category_ids):
+        rng = self.rng
+        name = self.category_name()
+        _, median, services, tags = CATEGORIES[name]
+        price = rng.lognormvariate(math.log(median), 0.45)
+        offered = rng.sample(services, rng.randint(2, min(4, len(services))))
+        return name, {
+            'id': prof_id,
+            'user_id': user_id,
+            'category_id': category_ids[name],
+            'bio': f"Trabalho com {', '.join(s.lower() for s in offered)} em Garanhuns e região.",
+            'experience_years': min(40, int(rng.expovariate(1 / 8)) + 1),
+            'starting_price': max(20, round(price / 5) * 5),
+            # vão para as tabelas filhas (ver insert_professionals)
+            'services': offered,
+            'tags': rng.sample(tags, rng.randint(1, 3)),
+            'availability': rng.choice(AVAILABILITY),
+            'verified': rng.random() < 0.3,
+            'response_time': rng.choice(RESPONSE_TIMES),
+            'created_at': random_past(rng),
+        }
+
+    def rating(self, quality):
+        return max(1, min(5, round(self.rng.gauss(4.2 + quality, 1.0))))
+
+
+# --------------------------
+# ETAPAS
+# --------------------------
+def ensure_categories(connection):
+    table = ServiceCategory.__table__
+    existing = dict(connection.execute(select(table.c.name, table.c.id)).all())
+    missing = [{'name': name, 'description': ', '.join(c[2][:3])}
+               for name, c in CATEGORIES.items() if name not in existing]
+    if missing:
+        connection.execute(table.insert(), missing)
+        existing = dict(connection.execute(select(table.c.name, table.c.id)).all())
+    return existing
+
+
+def insert_clients(gen, count, chunk):
+    with db.engine.begin() as connection:
+        first = next_id(connection, User)
+    progress = Progress('clientes', count)
+    rows = (gen.user(first + i, 'client') for i in range(count))
+    for batch in chunks(rows, chunk):
+        with db.engine.begin() as connection:
+            connection.execute(User.__table__.insert(), batch)
+        progress.add(len(batch))
+    progress.finish()
+    return range(first, first + count)
+
+
+def insert_professionals(gen, count, chunk, category_ids):
+    """Usuários profissionais + perfis. Retorna [(prof_id, categoria, popularidade, qualidade)]."""
+    with db.engine.begin() as connection:
+        first_user = next_id(connection, User)
+        first_prof = next_id(connection, Professional)
+    progress = Progress('profissionais', count)
+    profiles = []
+    for start in range(0, count, chunk):
+        users, profs, children = [], [], {}
+        for i in range(start, min(count, start + chunk)):
+            users.append(gen.user(first_user + i, 'professional'))
+            category, prof = gen.professional(first_prof + i, first_user + i, category_ids)
+            availability = prof.pop('availability')
+            prof['availability_note'] = profile_data.availability_note(availability)
+            rows = profile_data.child_rows(
+                prof['id'], services=prof.pop('services'), tags=prof.pop('tags'),
+                availability=availability,
+            )
+            for target, values in rows.items():
+                children.setdefault(target, []).extend(values)
+            profs.append(prof)
+            # popularidade com cauda longa (Pareto) e qualidade individual
+            profiles.append((prof['id'], category, gen.rng.paretovariate(1.2), gen.rng.gauss(0, 0.6)))
+        with db.engine.begin() as connection:
+            connection.execute(User.__table__.insert(), users)
+            connection.execute(Professional.__table__.insert(), profs)
+            profile_data.insert_child_rows(connection, children)
+        progress.add(len(profs))
+    progress.finish()
+    return profiles
+
+
+def insert_requests(gen, count, chunk, clients, profiles, review_rate):
+    """Pedidos e, na mesma transação, as avaliações dos concluídos."""
+    rng = gen.rng
+    with db.engine.begin() as connection:
+        first_request = next_id(connection, ServiceRequest)
+        first_review = next_id(connection, Review)
+    cum_weights = list(accumulate(p[2] for p in profiles))
+    total_weight = cum_weights[-1]
+    progress = Progress('pedidos', count)
+    review_id = first_review
+    reviews_total = 0
+    for start in range(0, count, chunk):
+        requests, reviews = [], []
+        for i in range(start, min(count, start + chunk)):
+            prof_id, category, _, quality = profiles[bisect(cum_weights, rng.random() * total_weight)]
+            client_id = clients[rng.randrange(len(clients))]
+            created = random_past(rng)
+            status = gen.status()
+            _, median, services, _ = CATEGORIES[category]
+            requests.append({
+                'id': first_request + i,
+                'client_id': client_id,
+                'professional_id': prof_id,
+                'title': f"Orçamento: {rng.choice(services)}",
+                'description': 'Gostaria de um orçamento para o serviço.',
+                'budget': round(rng.lognormvariate(math.log(median), 0.5)),
+                'preferred_date': (created + timedelta(days=rng.randint(1, 20))).strftime('%d/%m/%Y'),
+                'status': status,
+                'created_at': created,
+                'updated_at': created + timedelta(hours=rng.randint(1, 72)),
+            })
+            if status == 'concluido' and rng.random() < review_rate:
+                rating = gen.rating(quality)
+                reviews.append({
+                    'id': review_id,
+                    'request_id': first_request + i,
+                    'professional_id': prof_id,
+                    'client_id': client_id,
+                    'rating': rating,
+                    'comment': rng.choice(COMMENTS[rating]) if rng.random() < 0.6 else None,
+                    'created_at': created + timedelta(days=rng.randint(1, 14)),
+                })
+                review_id += 1
+        with db.engine.begin() as connection:
+            connection.execute(ServiceRequest.__table__.insert(), requests)
+            if reviews:
+                connection.execute(Review.__table__.insert(), reviews)
+        reviews_total += len(reviews)
+        progress.add(len(requests))
+    progress.finish()
+    return reviews_total
+
+
+def fix_sequences(connection):
+    """PostgreSQL: os ids foram informados, então as sequences ficam para trás."""
+    if connection.dialect.name != 'postgresql':
+        return
+    for model in (User, Professional, ServiceRequest, Review, ServiceCategory):
+        table = model.__tablename__
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def finalize():
+    """Recalcula o que os eventos do ORM manteriam numa gravação normal."""
+    started = time.perf_counter()
+    updated = reconcile_ratings()
+    connection = db.session.connection()
+    indexed = search_index.rebuild(connection)
+    ranked = rankings.refresh_all(connection)
+    fix_sequences(connection)
+    bump_versions(connection, ['catalog', 'categories', 'identity', 'autocomplete'])
+    db.session.commit()
+    print(f"  agregados: {updated:,} profissionais, índice de texto: {indexed:,}, "
+          f"destaques: {ranked} categorias ({time.perf_counter() - started:.1f}s)")
+
+
+def reset():
+    # o índice de texto fica fora do metadata (e referencia professionals)
+    for table in (search_index.PG_TABLE, search_index.FTS_TABLE, migrations.MIGRATIONS_TABLE):
+        db.session.execute(text(f'DROP TABLE IF EXISTS {table}'))
+    db.session.commit()
+    db.drop_all()
+
+
+def generate(clients, professionals, requests, review_rate=0.7, seed=42, chunk=5_000, password='senha123'):
+    """Gera a massa no banco do app (requer contexto de aplicação)."""
+    migrations.upgrade()
+
+    # um único hash para todos: gerar milhões de hashes levaria horas
+    gen = Generator(seed, generate_password_hash(password))
+    with db.engine.begin() as connection:
+        category_ids = ensure_categories(connection)
+
+    print(f"Gerando dados (seed={seed}, lotes de {chunk:,})...")
+    client_ids = insert_clients(gen, clients, chunk)
+    profiles = insert_professionals(gen, professionals, chunk, category_ids)
+    reviews = insert_requests(gen, requests, chunk, client_ids, profiles, review_rate)
+    print(f"  avaliações: {reviews:,}")
+    finalize()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Gera massa de dados sintética (determinística por --seed).')
+    parser.add_argument('--clients', type=int, default=10_000)
+    parser.add_argument('--professionals', type=int, default=1_000)
+    parser.add_argument('--requests', type=int, default=50_000)
+    parser.add_argument('--review-rate', type=float, default=0.7,
+                        help='fração dos pedidos concluídos que recebem avaliação')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk', type=int, default=5_000, help='linhas por transação')
+    parser.add_argument('--password', default='senha123', help='senha de todos os usuários gerados')
+    parser.add_argument('--reset', action='store_true', help='apaga todas as tabelas antes')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.professionals < 1 or args.clients < 1:
+        print('--clients e --professionals precisam ser >= 1')
+        return 1
+
+    started = time.perf_counter()
+    with app.app_context():
+        if args.reset:
+            reset()
+        generate(args.clients, args.professionals, args.requests, args.review_rate,
+                 args.seed, args.chunk, args.password)
+
+    print(f"Concluído em {time.perf_counter() - started:.1f}s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from app import app, db
-from models import User, ServiceCategory, Professional, Review
+from models import User, ServiceCategory, Professional, ServiceRequest, Review
 from werkzeug.security import generate_password_hash
 
 def seed_database():
@@ -10,14 +10,14 @@ def seed_database():
         
         print("Criando categorias de serviços...")
         categories = [
-            ServiceCategory(name='Reformas e Reparos', icon='fa-hammer', description='Pedreiros, pintores, eletricistas, encanadores'),
-            ServiceCategory(name='Serviços Domésticos', icon='fa-home', description='Limpeza, jardinagem, organização'),
-            ServiceCategory(name='Tecnologia', icon='fa-laptop', description='Informática, sites, suporte técnico'),
-            ServiceCategory(name='Aulas Particulares', icon='fa-book', description='Professores de idiomas, matemática, música'),
-            ServiceCategory(name='Beleza e Estética', icon='fa-cut', description='Cabeleireiros, manicures, maquiadores'),
-            ServiceCategory(name='Saúde e Bem-estar', icon='fa-heartbeat', description='Personal trainers, nutricionistas, fisioterapeutas'),
-            ServiceCategory(name='Eventos', icon='fa-birthday-cake', description='Fotógrafos, músicos, buffet'),
-            ServiceCategory(name='Transporte', icon='fa-truck', description='Mudanças, entregas, motoristas'),
+            ServiceCategory(name='Reformas e Reparos', description='Pedreiros, pintores, eletricistas, encanadores'),
+            ServiceCategory(name='Serviços Domésticos', description='Limpeza, jardinagem, organização'),
+            ServiceCategory(name='Tecnologia', description='Informática, sites, suporte técnico'),
+            ServiceCategory(name='Aulas Particulares', description='Professores de idiomas, matemática, música'),
+            ServiceCategory(name='Beleza e Estética', description='Cabeleireiros, manicures, maquiadores'),
+            ServiceCategory(name='Saúde e Bem-estar', description='Personal trainers, nutricionistas, fisioterapeutas'),
+            ServiceCategory(name='Eventos', description='Fotógrafos, músicos, buffet'),
+            ServiceCategory(name='Transporte', description='Mudanças, entregas, motoristas'),
         ]
         
         for category in categories:
@@ -175,13 +175,19 @@ def seed_database():
         print("Adicionando avaliações de exemplo...")
         prof1 = Professional.query.first()
         
-        reviews = [
-            Review(professional_id=prof1.id, client_id=client.id, rating=5, comment='Excelente profissional! Muito pontual e trabalho de qualidade.'),
-            Review(professional_id=prof1.id, client_id=client.id, rating=4, comment='Bom trabalho, recomendo!')
+        reviews_data = [
+            (5, 'Excelente profissional! Muito pontual e trabalho de qualidade.'),
+            (4, 'Bom trabalho, recomendo!')
         ]
         
-        for review in reviews:
-            db.session.add(review)
+        # toda avaliação pertence a um pedido de serviço
+        for rating, comment in reviews_data:
+            service_request = ServiceRequest(client_id=client.id, professional_id=prof1.id,
+                                             title='Serviço de exemplo', status='concluido')
+            db.session.add(service_request)
+            db.session.flush()
+            db.session.add(Review(request_id=service_request.id, professional_id=prof1.id,
+                                  client_id=client.id, rating=rating, comment=comment))
         
         db.session.commit()
         print("Avaliações criadas!")
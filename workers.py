@@ -0,0 +1,71 @@
+# workers.py - Pool de workers limitado, com contrapressão
+#
+# Para trabalho caro dentro de uma requisição (ex.: hash de senha, que
+# solta o GIL): roda em até `max_workers` threads e aceita no máximo
+# `max_pending` tarefas entre executando e na fila. Acima disso `submit`
+# falha na hora com Overloaded, e a rota responde 503 em vez de empilhar
+# requisições esperando.
+#
+# max_workers=0 executa a tarefa na própria thread de quem chamou (útil
+# para comparar nos testes de carga).
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Fila do pool cheia: tente de novo mais tarde."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=4, max_pending=32, name='workers'):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name) if max_workers else None
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if self._executor is None:
+            return self._run_inline(fn, *args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded()
+        with self._lock:
+            self.submitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run_inline(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            self.submitted += 1
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    @property
+    def pending(self):
+        """Tarefas ocupando vaga (executando + na fila)."""
+        return self.max_pending - self._slots._value if self._executor else 0
+
+    def prometheus_lines(self, name):
+        return [
+            f'# TYPE {name}_submitted_total counter',
+            f'{name}_submitted_total {self.submitted}',
+            f'# TYPE {name}_rejected_total counter',
+            f'{name}_rejected_total {self.rejected}',
+            f'# TYPE {name}_pending gauge',
+            f'{name}_pending {self.pending}',
+        ]